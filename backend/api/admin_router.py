@@ -0,0 +1,84 @@
+# backend/api/admin_router.py
+# Operator endpoints (profiling, admission, caches, backends). Disabled unless
+# ADMIN_TOKEN is set; requests then need "Authorization: Bearer <ADMIN_TOKEN>".
+import secrets
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel, Field
+from backend.core.profiling import profiling_state
+from backend.core.admission import admission_stats
+from backend.services.ingest_cache import ingest_cache
+from backend.core import app_state
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def require_admin(request: Request):
+    """404 while the admin API is disabled, 401 without the configured token."""
+    token = app_state.config.admin_token
+    if not token:
+        raise HTTPException(status_code=404, detail="Admin API disabled (set ADMIN_TOKEN)")
+    scheme, _, credentials = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not secrets.compare_digest(credentials.strip().encode(), token.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin token", headers={"WWW-Authenticate": "Bearer"})
+
+
+admin_router = APIRouter(dependencies=[Depends(require_admin)])
+
+
+class ProfilingSwitch(BaseModel):
+    enabled: bool
+    interval_ms: Optional[float] = Field(None, gt=0)
+
+
+@admin_router.get("/profiling")
+async def get_profiling():
+    """Current profiling switch state."""
+    return {"enabled": profiling_state.enabled, "interval_ms": profiling_state.interval_ms}
+
+
+@admin_router.post("/profiling")
+async def set_profiling(req: ProfilingSwitch):
+    """Turn honouring of the X-Profile request header on or off."""
+    profiling_state.enabled = req.enabled
+    if req.interval_ms is not None:
+        profiling_state.interval_ms = req.interval_ms
+    logger.info(f"Request profiling enabled={profiling_state.enabled} (interval={profiling_state.interval_ms}ms)")
+    return await get_profiling()
+
+
+@admin_router.get("/profiles")
+async def list_profiles():
+    """Summaries of the most recent request profiles."""
+    return {"profiles": profiling_state.store.list()}
+
+
+@admin_router.get("/profiles/{profile_id}")
+async def get_profile(profile_id: str):
+    """Collapsed stacks (flamegraph.pl / speedscope input) for one profiled request."""
+    profile = profiling_state.store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(profile["collapsed"])
+
+
+@admin_router.get("/admission")
+async def get_admission():
+    """Per-backend LLM concurrency and queue statistics."""
+    return {"backends": admission_stats()}
+
+
+@admin_router.get("/ingest_cache")
+async def get_ingest_cache():
+    """Ingest cache size and hit/miss counts."""
+    return ingest_cache.stats()
+
+
+@admin_router.get("/backends")
+async def get_backends():
+    """Per-backend latency and failure statistics of a hedged (multi-backend) LLM."""
+    llm = app_state._llm
+    stats = getattr(llm, "stats", None)
+    return {"model": type(llm).__name__ if llm is not None else None, "backends": stats() if callable(stats) else []}
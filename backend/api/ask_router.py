@@ -0,0 +1,155 @@
+# backend/api/ask_router.py
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from backend.api.llm_router import acquire_slot, answer_prompt, build_optimized_prompt, rejection_response
+from backend.api.search_router import SearchFilters, embedding_executor, retrieve
+from backend.core.admission import AdmissionRejected, NoopSlot
+from backend.core.app_state import config
+from backend.core.metrics import registry
+from backend.core.profiling import current_timings, stage
+from backend.core.response_generator import is_coalesced
+from backend.core.streaming import NDJSON_MEDIA_TYPE, encode_event
+from backend.services.extractive import best_sentence
+from typing import Any, Dict, Literal, Optional
+from functools import partial
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+ask_router = APIRouter()
+
+# Separator between retrieved chunks in the prompt context
+CONTEXT_SEPARATOR = "\n\n---\n\n"
+
+EXTRACTIVE_ANSWERS = registry.counter(
+    "pdfchat_extractive_answers_total",
+    "Questions checked for an extractive answer, by whether it skipped the LLM.",
+    labelnames=("result",),
+)
+
+
+# ==============================
+# Request Model
+# ==============================
+class AskRequest(BaseModel):
+    key: str
+    question: str
+    top_k: int = 3
+    batch: bool = False
+    # Sections searched on hierarchical indices (defaults to HIERARCHY_FAN_OUT)
+    fan_out: Optional[int] = Field(None, gt=0)
+    # Restrict retrieval to matching chunks (pages, documents, ...)
+    filters: Optional[SearchFilters] = None
+    # Skip near-duplicate chunks via MMR (defaults to MMR_DIVERSITY; 0 = off)
+    diversity: Optional[float] = Field(None, ge=0.0, le=1.0)
+    # Answer confident lookups with a retrieved sentence (defaults to EXTRACTIVE_ANSWERS)
+    extractive: Optional[bool] = None
+    # "ndjson": structured events (see backend/core/streaming.py); "text": raw answer text
+    stream_format: Literal["ndjson", "text"] = "ndjson"
+
+
+def _discard_slot(slot_task: asyncio.Task):
+    """Give back a slot that is no longer needed, whether or not it was granted yet."""
+    if not slot_task.done():
+        slot_task.cancel()  # AdmissionController hands a just-granted slot on
+    elif not slot_task.cancelled() and slot_task.exception() is None:
+        slot_task.result().release()
+
+
+async def _extract(req: AskRequest, hits: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    The best retrieved sentence if it is confident enough to skip the LLM,
+    else None. Sentences are scored against the query vector of ``hits``
+    with the searched index's embedding model.
+    """
+    loop = asyncio.get_event_loop()
+    try:
+        with stage("extractive"):
+            extracted = await loop.run_in_executor(
+                embedding_executor,
+                partial(best_sentence, req.question, hits["matches"], hits["model_name"], qvec=hits["qvec"]),
+            )
+    except Exception as e:
+        logger.warning(f"Extractive answer failed, falling back to the LLM: {e}")
+        extracted = None
+    hit = extracted is not None and extracted["score"] >= config.extractive_threshold
+    EXTRACTIVE_ANSWERS.inc(result="hit" if hit else "miss")
+    if extracted is not None:
+        logger.info(f"Extractive answer score {extracted['score']:.3f} ({'used' if hit else 'below threshold'})")
+    return extracted if hit else None
+
+
+def _extractive_response(extracted: Dict[str, Any], extra: Dict[str, Any], events: bool):
+    """Same shapes as answer_prompt: JSON, or a stream when the LLM backend streams."""
+    answer = extracted["answer"]
+    extra = {**extra, "extractive": {"score": round(extracted["score"], 4), "chunk": extracted["chunk"]}}
+    if not config.stream_message:
+        return {"answer": answer, **extra}
+    if not events:
+        return StreamingResponse(iter([answer.encode("utf-8")]), media_type="text/plain; charset=utf-8")
+    timings = current_timings()
+
+    def event_stream():
+        yield encode_event("meta", **extra)
+        yield encode_event("delta", text=answer)
+        yield encode_event("done", chunks=1, timings=timings.as_dict() if timings else {})
+
+    return StreamingResponse(event_stream(), media_type=NDJSON_MEDIA_TYPE)
+
+
+# ==============================
+# Router Entry
+# ==============================
+@ask_router.post("/ask")
+async def ask(req: AskRequest):
+    """
+    Retrieval and generation in one call: embeds the question, searches the
+    index for ``key``, builds the prompt and answers it (streamed when the
+    backend streams). Chunk texts never leave the backend.
+    Streams are NDJSON events by default: meta, delta..., done.
+    With ``extractive`` a question whose best retrieved sentence is similar
+    enough (EXTRACTIVE_THRESHOLD) is answered with that sentence, no LLM.
+    """
+    logger.info(f"Ask on key: {req.key} (question: {req.question[:50]}..., top_k={req.top_k})")
+
+    # Queue for an LLM slot while the question is being embedded and searched
+    slot_task = asyncio.create_task(acquire_slot(req.batch))
+    extractive = config.extractive_answers if req.extractive is None else req.extractive
+    try:
+        hits = await retrieve(
+            req.key, req.question, req.top_k, req.fan_out, req.filters, req.diversity, with_qvec=extractive
+        )
+    except BaseException as e:
+        _discard_slot(slot_task)
+        if isinstance(e, HTTPException) or not isinstance(e, Exception):
+            raise
+        logger.exception(f"Error retrieving context for key {req.key}: {e}")
+        raise HTTPException(status_code=500, detail=f"Error retrieving context: {str(e)}")
+
+    extra = {"key": req.key, "top_k": req.top_k, "indices": hits["indices"], "distances": hits["distances"]}
+    events = req.stream_format == "ndjson"
+    if extractive and hits["matches"]:
+        extracted = await _extract(req, hits)
+        if extracted is not None:
+            # Position among the matches -> chunk id in the index
+            extracted["chunk"] = [i for i in hits["indices"][0] if i >= 0][extracted["chunk"]]
+            _discard_slot(slot_task)
+            return _extractive_response(extracted, extra, events)
+
+    with stage("prompt"):
+        prompt = build_optimized_prompt(CONTEXT_SEPARATOR.join(hits["matches"]), req.question)
+
+    # Duplicates of an in-flight prompt cost no generation, so they skip the queue
+    if await is_coalesced(prompt):
+        _discard_slot(slot_task)
+        slot = NoopSlot()
+    else:
+        try:
+            slot = await slot_task
+        except AdmissionRejected as e:
+            return rejection_response(e)
+
+    return await answer_prompt(prompt, slot, extra=extra, events=events)
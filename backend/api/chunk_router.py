@@ -1,25 +1,38 @@
 # backend/api/chunk_router.py
+from typing import List, Optional
 from fastapi import APIRouter
 from pydantic import BaseModel
 from backend.core.app_state import config
 from backend.services.chunk_and_vectorize import chunk_and_vectorize
+from backend.services.chunk_metadata import page_numbers, section_numbers
 
 chunk_router = APIRouter()
 
 class PDFText(BaseModel):
     text: str
+    model_name: Optional[str] = None
+    # Character offset in ``text`` where each PDF page starts (enables per-chunk page numbers)
+    page_offsets: Optional[List[int]] = None
 
 @chunk_router.post("/chunk")
 async def chunk_endpoint(data: PDFText):
     cfg = config
-    chunks, vectors = chunk_and_vectorize(
+    model_name = data.model_name or cfg.embedding_model_id
+    chunks, vectors, starts = chunk_and_vectorize(
         text=data.text,
         chunk_size=cfg.chunk_size,
         overlap=cfg.overlap,
-        model_name=cfg.embedding_model_id,  # Fixed: use embedding_model_id, not model_id
+        model_name=model_name,
+        with_starts=True,
     )
     return {
         "chunks": chunks,
+        # Per-chunk metadata columns, passed back to /api/search/build_index
+        "metadata": {
+            "pages": page_numbers(starts, data.page_offsets).tolist() if data.page_offsets else None,
+            "sections": section_numbers(data.text, starts).tolist(),
+        },
+        "model_name": model_name,
         "vectors": vectors.tolist(),
         "n_vectors": vectors.shape[0],
         "vector_dim": vectors.shape[1],
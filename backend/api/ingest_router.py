@@ -0,0 +1,158 @@
+# backend/api/ingest_router.py
+# PDF ingestion as background jobs: the upload returns a job id at once and
+# extract -> chunk -> embed -> index runs on the ingest worker pool.
+# Each worker process runs the jobs it accepted; with SHARED_INDEX_DIR job
+# status is also kept under <SHARED_INDEX_DIR>/jobs, so any worker can report
+# (and cancel, while queued) any job, as it serves any finished index.
+
+import os
+import tempfile
+from typing import Dict, Optional
+import numpy as np
+from fastapi import APIRouter, HTTPException, Request
+from starlette.concurrency import run_in_threadpool
+from backend.api.search_router import publish_index
+from backend.core.app_state import config
+from backend.core.embeddings import _EmbeddingModel
+from backend.core.hashing import file_sha256
+from backend.core.metrics import STAGE_SECONDS, registry
+from backend.services.bulk_ingest import extract_text
+from backend.services.chunk_and_vectorize import lc_split_spans
+from backend.services.chunk_metadata import ChunkMetadata, page_numbers, section_numbers
+from backend.services.chunk_store import CompactChunks
+from backend.services.ingest_cache import ingest_cache, ingest_key, make_store
+from backend.services.ingest_jobs import IngestJob, IngestJobQueue, IngestQueueFull
+import logging
+
+logger = logging.getLogger(__name__)
+ingest_router = APIRouter()
+
+_SPOOL_DIR = tempfile.mkdtemp(prefix="pdfchat_ingest_")
+# Upload bytes buffered per spool write (writes run in the threadpool)
+_SPOOL_BLOCK = 1 << 20
+
+# Share of job progress at the end of each stage; embedding dominates
+_PROGRESS = {"hash": 0.02, "extract": 0.1, "chunk": 0.15, "embed": 0.95}
+
+
+def run_ingest(job: IngestJob) -> Dict:
+    """Ingest one spooled PDF under ``job.key`` (reusing the ingest cache on a hit)."""
+    model_name = config.embedding_model_id
+    job.update("hash", 0.0)
+    content_hash = file_sha256(job.path)
+    result = {"content_hash": content_hash, "model_name": model_name}
+    store = ingest_cache.get(ingest_key(content_hash, config.chunk_size, config.overlap, model_name))
+    if store is not None:
+        publish_index(job.key, store)
+        return {**result, "n_chunks": len(store["chunks"]), "cached": True}
+
+    job.update("extract", _PROGRESS["hash"])
+    with STAGE_SECONDS.time(stage="extract"):
+        text, page_offsets = extract_text(job.path)
+    if not text.strip():
+        raise ValueError("The PDF contains no extractable text")
+
+    job.update("chunk", _PROGRESS["extract"])
+    with STAGE_SECONDS.time(stage="chunk"):
+        chunks, starts = lc_split_spans(text, chunk_size=config.chunk_size, overlap=config.overlap)
+
+    # Small batches so query-time embeddings are not held up behind a whole document
+    job.update("embed", _PROGRESS["chunk"])
+    model = _EmbeddingModel.get(model_name)
+    batch = config.ingest_embed_batch
+    parts = []
+    span = _PROGRESS["embed"] - _PROGRESS["chunk"]
+    with STAGE_SECONDS.time(stage="embed"):
+        for i in range(0, len(chunks), batch):
+            parts.append(model.encode(chunks[i:i + batch]))
+            job.update("embed", _PROGRESS["chunk"] + span * min(i + batch, len(chunks)) / len(chunks))
+
+    job.update("index", _PROGRESS["embed"])
+    metadata = ChunkMetadata.for_document(
+        job.doc_id or content_hash,
+        len(chunks),
+        pages=page_numbers(starts, page_offsets),
+        sections=section_numbers(text, starts),
+    )
+    # The document text is stored once; chunks are offsets into it
+    store_chunks = CompactChunks.from_text(text, starts, [len(c) for c in chunks])
+    publish_index(job.key, make_store(store_chunks, np.concatenate(parts), model_name, metadata), content_hash)
+    logger.info(f"Ingested {job.filename or job.key} into key {job.key} ({len(chunks)} chunks)")
+    return {**result, "n_chunks": len(chunks), "cached": False}
+
+
+ingest_jobs = IngestJobQueue(
+    run_ingest,
+    max_concurrency=config.ingest_max_concurrency,
+    max_queue=config.ingest_max_queue,
+    history=config.ingest_job_history,
+    status_dir=os.path.join(config.shared_index_dir, "jobs") if config.shared_index_dir else None,
+)
+
+registry.gauge(
+    "pdfchat_ingest_jobs",
+    "Background ingest jobs running and waiting.",
+    labelnames=("state",),
+    callback=lambda: [(("active",), ingest_jobs.active), (("queued",), ingest_jobs.queued())],
+)
+
+
+@ingest_router.post("/jobs", status_code=202)
+async def submit_job(request: Request, key: str, filename: Optional[str] = None, doc_id: Optional[str] = None):
+    """
+    Queue the PDF in the request body (raw bytes, application/pdf) for
+    ingestion under ``key``. Returns the job's status, including ``job_id``,
+    immediately; smaller documents are ingested first.
+    """
+    fd, path = tempfile.mkstemp(suffix=".pdf", dir=_SPOOL_DIR)
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pending, buffered = [], 0
+            async for part in request.stream():
+                pending.append(part)
+                buffered += len(part)
+                if buffered >= _SPOOL_BLOCK:
+                    await run_in_threadpool(f.writelines, pending)
+                    size += buffered
+                    pending, buffered = [], 0
+            if pending:
+                await run_in_threadpool(f.writelines, pending)
+                size += buffered
+    except BaseException:
+        os.remove(path)  # e.g. the client disconnected mid-upload
+        raise
+    if size == 0:
+        os.remove(path)
+        raise HTTPException(status_code=400, detail="Empty request body; send the PDF bytes")
+    try:
+        job = ingest_jobs.submit(IngestJob(key, path, size, filename=filename, doc_id=doc_id))
+    except IngestQueueFull as e:
+        os.remove(path)
+        raise HTTPException(status_code=429, detail=str(e))
+    return job.as_dict()
+
+
+@ingest_router.get("/jobs")
+async def list_jobs(key: Optional[str] = None):
+    """Recent jobs (optionally for one key) and this worker's pool counters."""
+    return {"jobs": ingest_jobs.statuses(key), **ingest_jobs.stats()}
+
+
+@ingest_router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Status, stage and progress (0..1) of one job; ``n_chunks`` once done."""
+    status = ingest_jobs.status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return status
+
+
+@ingest_router.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """Cancel a job that is still queued; 409 once it has started."""
+    if ingest_jobs.status(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if not ingest_jobs.cancel(job_id):
+        raise HTTPException(status_code=409, detail="Job already started")
+    return ingest_jobs.status(job_id)
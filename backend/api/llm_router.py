@@ -1,11 +1,22 @@
 # backend/api/llm_router.py
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel
-from backend.core.response_generator import generate_response
-from fastapi.responses import StreamingResponse
-import asyncio
+from backend.core.response_generator import generate_response, is_coalesced
+from backend.core.profiling import current_timings, stage, record_stage
+from backend.core.streaming import NDJSON_MEDIA_TYPE, StreamError, encode_event, wants_events
+from backend.core.cancellation import CancellationToken, CancellableStreamingResponse
+from backend.core.app_state import config, get_llm_async
+from backend.core.admission import (
+    AdmissionRejected, NoopSlot, QueueFull, PRIORITY_BATCH, PRIORITY_INTERACTIVE, get_admission_controller,
+)
+from typing import Any, Dict, Optional
+from fastapi.responses import JSONResponse
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool, iterate_in_threadpool
+from contextlib import aclosing
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -18,6 +29,8 @@ llm_router = APIRouter()
 class AnswerRequest(BaseModel):
     context: str
     question: str
+    # Batch callers yield to interactive (streaming) users under load
+    batch: bool = False
 
 
 # ==============================
@@ -36,6 +49,8 @@ def build_optimized_prompt(context: str, question: str) -> str:
 
     system_instruction = "Answer based only on the provided context."
 
+    # Keep the question last: LocalModel reuses the KV cache of everything
+    # before the final "\nQ:" when follow-up questions share the context.
     prompt = f"""{system_instruction}
 
 Context:
@@ -48,18 +63,53 @@ A:"""
 
 
 # ==============================
-# Router Entry
+# Admission + Generation
 # ==============================
-@llm_router.post("/answer")
-async def generate_answer(req: AnswerRequest):
+def rejection_response(e: AdmissionRejected) -> JSONResponse:
+    logger.warning(f"LLM request rejected ({e.reason}); retry after {e.retry_after}s")
+    return JSONResponse(
+        status_code=429 if isinstance(e, QueueFull) else 503,
+        content={"detail": e.reason},
+        headers={"Retry-After": str(e.retry_after)},
+    )
+
+
+async def acquire_slot(batch: bool = False):
     """
-    Routes the question + context to the LLM.
-    Supports both normal and streaming responses.
+    Wait for a generation slot on the current backend.
+    Raises AdmissionRejected when the queue is full or the wait times out.
+    """
+    interactive = config.stream_message and not batch
+    llm = await get_llm_async()
+    controller = get_admission_controller(type(llm).__name__, config)
+    with stage("queue"):
+        return await controller.acquire(PRIORITY_INTERACTIVE if interactive else PRIORITY_BATCH)
+
+
+async def answer_prompt(
+    prompt: str,
+    slot,
+    extra: Optional[Dict[str, Any]] = None,
+    events: bool = False,
+):
     """
+    Run ``prompt`` through the LLM while holding ``slot`` (released when done)
+    and return the JSON or streaming response. ``extra`` is merged into the
+    non-streaming JSON body. With ``events`` a stream is sent as NDJSON
+    events (see backend/core/streaming.py) with ``extra`` as the "meta"
+    event; otherwise as plain text.
+    """
+    timings = current_timings()
+    # Cancelled when the client disconnects so the backend stops generating
+    token = CancellationToken()
     try:
-        prompt = build_optimized_prompt(req.context, req.question)
-        result = generate_response(prompt)
+        llm_start = time.perf_counter()
+        # Backends block (HTTP calls, local inference): keep them off the event loop
+        result = await run_in_threadpool(generate_response, prompt, token)
+        if not result.get("stream", False):
+            record_stage("llm", time.perf_counter() - llm_start)
     except Exception as e:
+        slot.release()
         logger.exception("Error generating response from LLM backend.")
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -67,35 +117,93 @@ async def generate_answer(req: AnswerRequest):
     # Non-streaming response
     # -----------------------------
     if not result.get("stream", False):
+        slot.release()
         logger.info("Returning non-streaming response.")
-        return {"answer": result.get("data", "")}
+        return {"answer": result.get("data", ""), **(extra or {})}
 
     # -----------------------------
     # Streaming response
     # -----------------------------
     logger.info("Starting streaming LLM response.")
 
-    async def streamer():
+    async def deltas():
         """
         Wraps a synchronous generator and streams chunks asynchronously.
+        Each next() runs in the threadpool so a slow backend never blocks
+        other requests on the event loop.
         """
         try:
             generator = result["data"]  # This is a Python generator
+            first_token = True
 
-            for chunk in generator:
+            async for chunk in iterate_in_threadpool(generator):
                 if not chunk:
                     continue
-
-                # FastAPI StreamingResponse requires bytes
-                yield chunk.encode("utf-8")
-                # Yield control to event loop after each chunk
-                await asyncio.sleep(0)
-
+                if first_token:
+                    record_stage("llm_ttft", time.perf_counter() - llm_start)
+                    first_token = False
+                yield chunk
+        finally:
+            token.cancel()
+            slot.release()
+
+    async def text_stream():
+        try:
+            async with aclosing(deltas()) as chunks:
+                async for chunk in chunks:
+                    # FastAPI StreamingResponse requires bytes
+                    yield chunk.encode("utf-8")
         except Exception as e:
             logger.exception("Error during streaming LLM output.")
             yield f"\n\nError during streaming: {str(e)}".encode("utf-8")
 
-    return StreamingResponse(
-        streamer(),
-        media_type="text/plain; charset=utf-8"
+    async def event_stream():
+        n_chunks = 0
+        if extra:
+            yield encode_event("meta", **extra)
+        try:
+            async with aclosing(deltas()) as chunks:
+                async for chunk in chunks:
+                    if isinstance(chunk, StreamError):
+                        yield encode_event("error", message=chunk.strip())
+                        continue
+                    n_chunks += 1
+                    yield encode_event("delta", text=chunk)
+        except Exception as e:
+            logger.exception("Error during streaming LLM output.")
+            yield encode_event("error", message=str(e))
+        record_stage("llm", time.perf_counter() - llm_start)
+        yield encode_event("done", chunks=n_chunks, timings=timings.as_dict() if timings else {})
+
+    # The background task covers the case where the stream is never iterated
+    return CancellableStreamingResponse(
+        event_stream() if events else text_stream(),
+        token=token,
+        media_type=NDJSON_MEDIA_TYPE if events else "text/plain; charset=utf-8",
+        background=BackgroundTask(slot.release),
     )
+
+
+# ==============================
+# Router Entry
+# ==============================
+@llm_router.post("/answer")
+async def generate_answer(req: AnswerRequest, request: Request):
+    """
+    Routes the question + context to the LLM.
+    Supports both normal and streaming responses; streams are NDJSON events
+    when the client sends ``Accept: application/x-ndjson``, plain text otherwise.
+    """
+    with stage("prompt"):
+        prompt = build_optimized_prompt(req.context, req.question)
+
+    # Duplicates of an in-flight prompt cost no generation, so they skip the queue
+    if await is_coalesced(prompt):
+        slot = NoopSlot()
+    else:
+        try:
+            slot = await acquire_slot(req.batch)
+        except AdmissionRejected as e:
+            return rejection_response(e)
+
+    return await answer_prompt(prompt, slot, events=wants_events(request.headers.get("accept")))
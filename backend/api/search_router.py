@@ -1,32 +1,208 @@
 # backend/api/search_router.py
 from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, model_validator
 import numpy as np
-from typing import List
+from typing import Dict, List, Optional, Tuple
 import asyncio
+import heapq
+import itertools
+import os
 import logging
+import threading
 from concurrent.futures import ThreadPoolExecutor
-from backend.services.retrieval import FaissIndexWrapper, get_matches_from_indices
-from backend.core.embeddings import embed_text
+from backend.services.retrieval import HierarchicalIndex, get_matches_from_indices, mmr_rerank
+from backend.services.chunk_metadata import ChunkMetadata
+from backend.services.shared_index import MmapHierarchicalIndex, SharedIndexStore
+from backend.services.ingest_cache import ingest_cache, ingest_key, load_store, make_store
+from backend.core.embeddings import embed_text, embedding_registry
+from backend.core.app_state import config
+from backend.core.metrics import registry
+from backend.core.profiling import stage
 
 logger = logging.getLogger(__name__)
 search_router = APIRouter()
 
+
+
+class QueueCountingExecutor(ThreadPoolExecutor):
+    """ThreadPoolExecutor that counts submitted jobs still waiting for a worker thread."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._count_lock = threading.Lock()
+        self._waiting = 0
+
+    @property
+    def waiting(self) -> int:
+        return self._waiting
+
+    def _leave_queue(self):
+        with self._count_lock:
+            self._waiting -= 1
+
+    def submit(self, fn, /, *args, **kwargs):
+        def run():
+            self._leave_queue()
+            return fn(*args, **kwargs)
+
+        with self._count_lock:
+            self._waiting += 1
+        try:
+            future = super().submit(run)
+        except BaseException:
+            self._leave_queue()
+            raise
+        # A job cancelled before a worker picked it up never calls run()
+        future.add_done_callback(lambda f: f.cancelled() and self._leave_queue())
+        return future
+
+
 # Thread pool for running synchronous embedding operations
-embedding_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="embedding")
+embedding_executor = QueueCountingExecutor(max_workers=2, thread_name_prefix="embedding")
+# Thread pool for federated searches over many keys (FAISS releases the GIL)
+search_executor = ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1), thread_name_prefix="search")
+
+# key -> {"chunks": [...], "vectors": np.ndarray, "faiss": FaissIndexWrapper, "model_name": str}
+# In-process by default; with SHARED_INDEX_DIR every uvicorn worker sees the same indices
+_INDICES = SharedIndexStore(config.shared_index_dir) if config.shared_index_dir else {}
+
+
+def _index_memory_samples():
+    for key, store in list(_INDICES.items()):
+        chunks = store["chunks"]
+        chunk_bytes = getattr(chunks, "nbytes", None) or sum(len(c.encode("utf-8")) for c in chunks)
+        yield (key, "vectors"), store["vectors"].nbytes
+        yield (key, "faiss"), store["faiss"].nbytes
+        yield (key, "chunks"), chunk_bytes
+        if store.get("metadata") is not None:
+            yield (key, "metadata"), store["metadata"].nbytes
 
-# In-memory store (prototype)
-_INDICES = {}  # key -> {"chunks": [...], "vectors": np.ndarray, "faiss": FaissIndexWrapper}
+
+registry.gauge(
+    "pdfchat_executor_queue_depth",
+    "Tasks waiting in the embedding executor queue.",
+    callback=lambda: embedding_executor.waiting,
+)
+registry.gauge(
+    "pdfchat_index_memory_bytes",
+    "Approximate memory held per index key and component.",
+    labelnames=("key", "component"),
+    callback=_index_memory_samples,
+)
+registry.gauge(
+    "pdfchat_index_chunks",
+    "Number of chunks per index key.",
+    labelnames=("key",),
+    callback=lambda: [((key,), len(store["chunks"])) for key, store in list(_INDICES.items())],
+)
+registry.gauge(
+    "pdfchat_embedding_model_memory_bytes",
+    "Estimated memory of loaded embedding models.",
+    labelnames=("model",),
+    callback=lambda: [((name,), nbytes) for name, nbytes in embedding_registry.loaded_models().items()],
+)
+registry.gauge(
+    "pdfchat_ingest_cache_bytes",
+    "Approximate memory held by the ingest cache (shared with bound index keys).",
+    callback=lambda: ingest_cache.stats()["bytes"],
+)
+registry.gauge(
+    "pdfchat_ingest_cache_lookups",
+    "Ingest cache lookups by result.",
+    labelnames=("result",),
+    callback=lambda: [((r,), ingest_cache.stats()[r]) for r in ("hits", "disk_hits", "misses")],
+)
+
+def load_index_dir(index_dir: str) -> int:
+    """
+    Load every ``<index_dir>/indices/<key>`` written by the bulk ingester
+    under its directory name as the index key. Returns the number loaded.
+    """
+    root = os.path.join(index_dir, "indices")
+    if not os.path.isdir(root):
+        return 0
+    loaded = 0
+    for entry in sorted(os.scandir(root), key=lambda e: e.name):
+        if not entry.is_dir() or ".tmp-" in entry.name:
+            continue
+        if isinstance(_INDICES, SharedIndexStore) and entry.name in _INDICES:
+            continue  # already published by another worker
+        try:
+            store = load_store(entry.path)
+        except Exception as e:
+            logger.warning(f"Skipping unreadable index {entry.path}: {e}")
+            continue
+        _INDICES[entry.name] = store
+        embedding_registry.register_index(entry.name, store["model_name"])
+        loaded += 1
+        logger.info(f"Loaded index {entry.name} from disk ({len(store['chunks'])} chunks)")
+    return loaded
+
+class ChunkColumns(BaseModel):
+    pages: Optional[List[int]] = None
+    sections: Optional[List[int]] = None
 
 class BuildIndexRequest(BaseModel):
     key: str
     chunks: List[str]
     vectors: List[List[float]]
+    # Embedding model the vectors were built with (defaults to the configured one)
+    model_name: Optional[str] = None
+    # Hash of the source PDF bytes; when set the index is added to the ingest cache
+    content_hash: Optional[str] = None
+    # Document id for metadata filters (defaults to content_hash, else key)
+    doc_id: Optional[str] = None
+    # Per-chunk columns as returned by /api/chunk
+    metadata: Optional[ChunkColumns] = None
 
-class QueryRequest(BaseModel):
+class BindRequest(BaseModel):
     key: str
+    content_hash: str
+    model_name: Optional[str] = None
+
+class SearchFilters(BaseModel):
+    """Restricts a search to matching chunks; applied inside FAISS, not after it."""
+    # Inclusive page ranges, e.g. [[1, 3], [10, 10]]
+    pages: Optional[List[Tuple[int, int]]] = None
+    doc_ids: Optional[List[str]] = None
+    sections: Optional[List[int]] = None
+    # Unix timestamps of when the document was indexed
+    uploaded_after: Optional[float] = None
+    uploaded_before: Optional[float] = None
+
+class QueryRequest(BaseModel):
+    # Exactly one of: a single key, a list of keys, or a collection (all keys
+    # named "<collection>/...")
+    key: Optional[str] = None
+    keys: Optional[List[str]] = Field(None, min_length=1)
+    collection: Optional[str] = None
     query: str
     top_k: int = 3
+    # Sections searched on hierarchical indices (defaults to HIERARCHY_FAN_OUT)
+    fan_out: Optional[int] = Field(None, gt=0)
+    filters: Optional[SearchFilters] = None
+    # MMR trade-off between relevance and novelty (defaults to MMR_DIVERSITY; 0 = off)
+    diversity: Optional[float] = Field(None, ge=0.0, le=1.0)
+
+    @model_validator(mode="after")
+    def validate_target(self):
+        if sum(x is not None for x in (self.key, self.keys, self.collection)) != 1:
+            raise ValueError("exactly one of key, keys or collection is required")
+        return self
+
+def publish_index(key: str, store: Dict, content_hash: Optional[str] = None):
+    """
+    Serve ``store`` under ``key``; with ``content_hash`` also add it to the
+    ingest cache (the chunks must come from the server's chunking config).
+    """
+    _INDICES[key] = store
+    embedding_registry.register_index(key, store["model_name"])
+    if content_hash:
+        ingest_cache.put(
+            ingest_key(content_hash, config.chunk_size, config.overlap, store["model_name"]),
+            store,
+            meta={"content_hash": content_hash, "chunk_size": config.chunk_size, "overlap": config.overlap},
+        )
 
 @search_router.post("/build_index")
 async def build_index(req: BuildIndexRequest):
@@ -34,45 +210,229 @@ async def build_index(req: BuildIndexRequest):
     logger.info(f"Building index for key: {req.key} with {len(req.chunks)} chunks")
     try:
         vectors = np.array(req.vectors, dtype=np.float32)
-        fa = FaissIndexWrapper(vectors)
-        _INDICES[req.key] = {"chunks": req.chunks, "vectors": vectors, "faiss": fa}
-        logger.info(f"Index built successfully for key: {req.key} (dim={vectors.shape[1]}, n_vectors={vectors.shape[0]})")
+        model_name = req.model_name or config.embedding_model_id
+        columns = req.metadata or ChunkColumns()
+        metadata = ChunkMetadata.for_document(
+            req.doc_id or req.content_hash or req.key,
+            len(req.chunks),
+            pages=columns.pages,
+            sections=columns.sections,
+        )
+        # Chunks came from /api/chunk, i.e. the server's chunking config
+        publish_index(req.key, make_store(req.chunks, vectors, model_name, metadata), req.content_hash)
+        logger.info(f"Index built successfully for key: {req.key} (dim={vectors.shape[1]}, n_vectors={vectors.shape[0]}, model={model_name})")
         return {"status": "ok", "n_chunks": len(req.chunks)}
     except Exception as e:
         logger.exception(f"Error building index for key {req.key}: {e}")
         raise HTTPException(status_code=500, detail=f"Error building index: {str(e)}")
 
-@search_router.post("/query")
-async def query_index(req: QueryRequest):
-    """Query the FAISS index for similar chunks."""
-    logger.info(f"Querying index for key: {req.key} (query: {req.query[:50]}..., top_k={req.top_k})")
-    
-    if req.key not in _INDICES:
-        logger.warning(f"Index not found for key: {req.key}")
+@search_router.post("/bind")
+async def bind_index(req: BindRequest):
+    """
+    Point ``key`` at the cached index for a previously ingested document, if
+    any. Returns {"cached": false} on a miss; the caller then ingests as usual.
+    """
+    model_name = req.model_name or config.embedding_model_id
+    cache_key = ingest_key(req.content_hash, config.chunk_size, config.overlap, model_name)
+    loop = asyncio.get_event_loop()
+    # A disk hit loads vectors and rebuilds the FAISS index
+    store = await loop.run_in_executor(None, ingest_cache.get, cache_key)
+    if store is None:
+        return {"cached": False}
+    _INDICES[req.key] = store
+    embedding_registry.register_index(req.key, store["model_name"])
+    logger.info(f"Bound key {req.key} to cached index {cache_key[:12]} ({len(store['chunks'])} chunks)")
+    return {"cached": True, "n_chunks": len(store["chunks"]), "model_name": store["model_name"]}
+
+def _allowed_ids(store: Dict, filters: Optional[SearchFilters]) -> Optional[np.ndarray]:
+    """Chunk ids passing ``filters`` (None when nothing is filtered out)."""
+    spec = filters.model_dump(exclude_none=True) if filters is not None else {}
+    if not spec:
+        return None
+    metadata = store.get("metadata")
+    if metadata is None:
+        raise HTTPException(status_code=400, detail="Index has no chunk metadata to filter on")
+    return metadata.select(**spec)
+
+def _search_store(
+    store: Dict,
+    qvec: np.ndarray,
+    top_k: int,
+    fan_out: Optional[int] = None,
+    filters: Optional[SearchFilters] = None,
+    diversity: Optional[float] = None,
+):
+    index = store["faiss"]
+    allowed = _allowed_ids(store, filters)
+    diversity = config.mmr_diversity if diversity is None else diversity
+    # MMR picks top_k out of an over-fetched candidate set
+    fetch_k = top_k * config.mmr_fetch_factor if diversity > 0 else top_k
+    if isinstance(index, (HierarchicalIndex, MmapHierarchicalIndex)):
+        D, I = index.search(qvec, fetch_k, fan_out, allowed)
+    else:
+        D, I = index.search(qvec, fetch_k, allowed=allowed)
+    if diversity > 0:
+        D, I = mmr_rerank(store["vectors"], qvec, D, I, top_k, diversity)
+    return D, I
+
+def _chunk_metadata(store: Dict, indices) -> Optional[List[Dict]]:
+    metadata = store.get("metadata")
+    if metadata is None:
+        return None
+    return [metadata.row(i) for i in indices if 0 <= i < len(metadata)]
+
+async def retrieve(
+    key: str,
+    query: str,
+    top_k: int,
+    fan_out: Optional[int] = None,
+    filters: Optional[SearchFilters] = None,
+    diversity: Optional[float] = None,
+    with_qvec: bool = False,
+) -> dict:
+    """
+    Embed ``query`` with the index's model and search the index for ``key``.
+    ``fan_out`` overrides the number of sections searched on a hierarchical index;
+    ``filters`` restrict the search to matching chunks; ``diversity`` > 0
+    selects the chunks by maximal marginal relevance (see MMR_DIVERSITY).
+    Returns {"matches", "distances", "indices", "metadata", "model_name"} (the
+    index's embedding model), plus the query vector as "qvec" with
+    ``with_qvec``; 404 if the key is unknown.
+    """
+    store = _INDICES.get(key)
+    if store is None:
+        logger.warning(f"Index not found for key: {key}")
         raise HTTPException(status_code=404, detail="Index not found for key")
-    
-    store = _INDICES[req.key]
-    
-    try:
-        # Run embedding generation in thread pool to avoid blocking event loop
-        loop = asyncio.get_event_loop()
-        logger.debug("Generating query embedding (async)...")
-        qvec = await loop.run_in_executor(embedding_executor, embed_text, req.query)
-        logger.debug(f"Embedding generated (shape: {qvec.shape})")
-        
-        # FAISS search is fast and CPU-bound, but run in executor to be safe
-        logger.debug("Performing FAISS search...")
+
+    # Run embedding generation in thread pool to avoid blocking event loop
+    loop = asyncio.get_event_loop()
+    logger.debug("Generating query embedding (async)...")
+    # Encode with the same model the index was built with
+    model_name = store.get("model_name") or config.embedding_model_id
+    with stage("embed"):
+        qvec = await loop.run_in_executor(embedding_executor, embed_text, query, model_name)
+    logger.debug(f"Embedding generated (shape: {qvec.shape})")
+
+    # FAISS search is fast and CPU-bound, but run in executor to be safe
+    logger.debug("Performing FAISS search...")
+    with stage("search"):
         D, I = await loop.run_in_executor(
             None,  # Use default executor for CPU-bound operation
-            store["faiss"].search,
+            _search_store,
+            store,
             qvec,
-            req.top_k
+            top_k,
+            fan_out,
+            filters,
+            diversity,
         )
-        
-        matches = get_matches_from_indices(store["chunks"], I)
-        logger.info(f"Search complete: found {len(matches)} matches (distances: {D[0].tolist()})")
-        
-        return {"matches": matches, "distances": D.tolist(), "indices": I.tolist()}
+
+    matches = get_matches_from_indices(store["chunks"], I)
+    logger.info(f"Search complete: found {len(matches)} matches (distances: {D[0].tolist()})")
+
+    result = {
+        "matches": matches,
+        "distances": D.tolist(),
+        "indices": I.tolist(),
+        "metadata": _chunk_metadata(store, I[0]),
+        "model_name": model_name,
+    }
+    if with_qvec:
+        result["qvec"] = qvec
+    return result
+
+def collection_keys(collection: str) -> List[str]:
+    """Index keys in ``collection``, i.e. named ``<collection>/<anything>``."""
+    prefix = f"{collection}/"
+    return sorted(k for k in _INDICES.keys() if k.startswith(prefix))
+
+async def retrieve_many(
+    keys: List[str],
+    query: str,
+    top_k: int,
+    fan_out: Optional[int] = None,
+    filters: Optional[SearchFilters] = None,
+    diversity: Optional[float] = None,
+) -> dict:
+    """
+    Federated search: embed ``query`` once, search every key's index in
+    parallel and merge the per-key results into a global top-k by distance.
+    ``diversity`` applies MMR within each key. 404 if any key is unknown;
+    400 if the keys were built with different embedding models (their
+    distances are not comparable, so there is no global top-k).
+    """
+    keys = list(dict.fromkeys(keys))
+    stores = {key: _INDICES.get(key) for key in keys}
+    missing = [key for key, store in stores.items() if store is None]
+    if missing:
+        logger.warning(f"Index not found for keys: {missing}")
+        raise HTTPException(status_code=404, detail=f"Index not found for keys: {missing}")
+
+    models = {key: store.get("model_name") or config.embedding_model_id for key, store in stores.items()}
+    if len(set(models.values())) > 1:
+        by_model: Dict[str, List[str]] = {}
+        for key, model_name in models.items():
+            by_model.setdefault(model_name, []).append(key)
+        raise HTTPException(
+            status_code=400,
+            detail=f"Keys use different embedding models; query each model's keys separately: {by_model}",
+        )
+    model_name = next(iter(models.values()))
+
+    loop = asyncio.get_event_loop()
+    with stage("embed"):
+        qvec = await loop.run_in_executor(embedding_executor, embed_text, query, model_name)
+
+    with stage("search"):
+        results = await asyncio.gather(*(
+            loop.run_in_executor(
+                search_executor,
+                _search_store,
+                store,
+                qvec,
+                top_k,
+                fan_out,
+                filters,
+                diversity,
+            )
+            for store in stores.values()
+        ))
+
+    # With each key's hits sorted by distance (MMR picks are not), a k-way
+    # heap merge yields the global order
+    per_key = [
+        sorted((float(d), key, int(i)) for d, i in zip(D[0], I[0]) if 0 <= i < len(stores[key]["chunks"]))
+        for key, (D, I) in zip(stores, results)
+    ]
+    top = list(itertools.islice(heapq.merge(*per_key), top_k))
+    hits = []
+    for d, key, i in top:
+        hit = {"key": key, "index": i, "distance": d, "chunk": stores[key]["chunks"][i]}
+        metadata = stores[key].get("metadata")
+        if metadata is not None:
+            hit["metadata"] = metadata.row(i)
+        hits.append(hit)
+    logger.info(f"Federated search over {len(keys)} keys complete: found {len(hits)} matches")
+    return {"matches": [h["chunk"] for h in hits], "results": hits, "keys": keys}
+
+@search_router.post("/query")
+async def query_index(req: QueryRequest):
+    """
+    Query the FAISS index for similar chunks. With ``keys`` or ``collection``
+    the indices are searched together and each result names its key.
+    """
+    target = req.key or req.keys or f"collection {req.collection}"
+    logger.info(f"Querying index for: {target} (query: {req.query[:50]}..., top_k={req.top_k})")
+
+    try:
+        if req.key is not None:
+            return await retrieve(req.key, req.query, req.top_k, req.fan_out, req.filters, req.diversity)
+        keys = req.keys if req.keys is not None else collection_keys(req.collection)
+        if not keys:
+            raise HTTPException(status_code=404, detail="No indices in collection")
+        return await retrieve_many(keys, req.query, req.top_k, req.fan_out, req.filters, req.diversity)
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.exception(f"Error querying index for key {req.key}: {e}")
+        logger.exception(f"Error querying index for {target}: {e}")
         raise HTTPException(status_code=500, detail=f"Error querying index: {str(e)}")
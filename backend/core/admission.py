@@ -0,0 +1,219 @@
+# backend/core/admission.py
+# Admission control for LLM generation: a per-backend concurrency limit with
+# a bounded priority wait queue and queue-time deadlines.
+
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Dict, List, Optional
+import logging
+
+from backend.core.metrics import registry
+
+logger = logging.getLogger("core.admission")
+
+# Lower value is served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 1
+_PRIORITY_NAMES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_BATCH: "batch"}
+
+ADMISSION_REJECTED = registry.counter(
+    "pdfchat_llm_admission_rejected_total",
+    "LLM requests rejected by admission control.",
+    labelnames=("backend", "reason"),
+)
+ADMISSION_WAIT_SECONDS = registry.histogram(
+    "pdfchat_llm_admission_wait_seconds",
+    "Time LLM requests spent queued before starting.",
+    labelnames=("backend", "priority"),
+)
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted; carries a Retry-After hint."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class QueueFull(AdmissionRejected):
+    pass
+
+
+class QueueTimeout(AdmissionRejected):
+    pass
+
+
+class AdmissionSlot:
+    """A held concurrency slot; release() is idempotent."""
+
+    def __init__(self, controller: "AdmissionController"):
+        self._controller = controller
+        self._start = time.perf_counter()
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._controller._release(time.perf_counter() - self._start)
+
+
+class NoopSlot:
+    """Stand-in for requests that bypass admission (e.g. coalesced duplicates)."""
+
+    def release(self):
+        pass
+
+
+class AdmissionController:
+    """
+    Limits concurrent generations for one backend.
+
+    Requests beyond ``max_concurrency`` wait in a priority queue of at most
+    ``max_queue`` entries (interactive before batch, FIFO within a priority).
+    A full queue is rejected immediately with QueueFull; a request that waits
+    longer than ``queue_timeout_s`` gets QueueTimeout. Both carry a
+    Retry-After estimate from the recent average service time.
+
+    Must be used from a single event loop.
+    """
+
+    def __init__(self, backend: str, max_concurrency: int, max_queue: int, queue_timeout_s: float):
+        self.backend = backend
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout_s = queue_timeout_s
+        self.active = 0
+        self._waiters: List = []  # heap of [priority, seq, future]
+        self._seq = itertools.count()
+        self._avg_service_s = 1.0
+        self.admitted = 0
+        self.rejected = 0
+
+    # -------------------------------------------------------------------------
+    # Stats
+    # -------------------------------------------------------------------------
+    def queue_length(self, priority: Optional[int] = None) -> int:
+        return sum(
+            1 for p, _, fut in self._waiters
+            if not fut.done() and (priority is None or p == priority)
+        )
+
+    def stats(self) -> Dict:
+        return {
+            "backend": self.backend,
+            "active": self.active,
+            "max_concurrency": self.max_concurrency,
+            "queued": {name: self.queue_length(p) for p, name in _PRIORITY_NAMES.items()},
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "avg_service_s": round(self._avg_service_s, 3),
+        }
+
+    def retry_after(self) -> int:
+        waiting = self.queue_length() + 1
+        estimate = self._avg_service_s * waiting / max(self.max_concurrency, 1)
+        return max(1, int(round(estimate)))
+
+    # -------------------------------------------------------------------------
+    # Acquire / release
+    # -------------------------------------------------------------------------
+    async def acquire(self, priority: int = PRIORITY_INTERACTIVE) -> AdmissionSlot:
+        priority_name = _PRIORITY_NAMES.get(priority, str(priority))
+        start = time.perf_counter()
+
+        if self.active < self.max_concurrency and self.queue_length() == 0:
+            return self._admit(start, priority_name)
+
+        if self.queue_length() >= self.max_queue:
+            self.rejected += 1
+            ADMISSION_REJECTED.inc(backend=self.backend, reason="queue_full")
+            raise QueueFull("LLM queue is full", self.retry_after())
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, [priority, next(self._seq), future])
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=self.queue_timeout_s)
+        except asyncio.TimeoutError:
+            if future.done() and not future.cancelled():
+                # Granted just as the deadline hit: hand the slot on
+                self.active -= 1
+                self._wake_next()
+            future.cancel()
+            self.rejected += 1
+            ADMISSION_REJECTED.inc(backend=self.backend, reason="queue_timeout")
+            raise QueueTimeout("Timed out waiting for the LLM", self.retry_after())
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.active -= 1
+                self._wake_next()
+            future.cancel()
+            raise
+        # _wake_next already counted this request as active
+        self.active -= 1
+        return self._admit(start, priority_name)
+
+    def _admit(self, start: float, priority_name: str) -> AdmissionSlot:
+        self.active += 1
+        self.admitted += 1
+        ADMISSION_WAIT_SECONDS.observe(time.perf_counter() - start, backend=self.backend, priority=priority_name)
+        return AdmissionSlot(self)
+
+    def _release(self, service_s: float):
+        self.active -= 1
+        # Exponential moving average of service time for Retry-After
+        self._avg_service_s = 0.8 * self._avg_service_s + 0.2 * service_s
+        self._wake_next()
+
+    def _wake_next(self):
+        while self._waiters and self.active < self.max_concurrency:
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                continue  # timed out or cancelled while queued
+            self.active += 1  # reserve the slot for the woken waiter
+            future.set_result(None)
+
+
+_controllers: Dict[str, AdmissionController] = {}
+
+
+def get_admission_controller(backend: str, config) -> AdmissionController:
+    """Return the controller for ``backend``, created from ``config`` on first use."""
+    controller = _controllers.get(backend)
+    if controller is None:
+        controller = _controllers[backend] = AdmissionController(
+            backend,
+            max_concurrency=config.llm_max_concurrency,
+            max_queue=config.llm_max_queue,
+            queue_timeout_s=config.llm_queue_timeout_s,
+        )
+        logger.info(
+            f"Admission control for {backend}: concurrency={controller.max_concurrency}, "
+            f"queue={controller.max_queue}, timeout={controller.queue_timeout_s}s"
+        )
+    return controller
+
+
+def admission_stats() -> List[Dict]:
+    return [c.stats() for c in _controllers.values()]
+
+
+registry.gauge(
+    "pdfchat_llm_queue_length",
+    "LLM requests waiting for admission, per backend and priority.",
+    labelnames=("backend", "priority"),
+    callback=lambda: [
+        ((c.backend, name), c.queue_length(p))
+        for c in list(_controllers.values()) for p, name in _PRIORITY_NAMES.items()
+    ],
+)
+registry.gauge(
+    "pdfchat_llm_active_generations",
+    "LLM generations currently running, per backend.",
+    labelnames=("backend",),
+    callback=lambda: [((c.backend,), c.active) for c in list(_controllers.values())],
+)
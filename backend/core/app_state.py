@@ -1,21 +1,103 @@
 # backend/core/app_state.py
 from backend.core.config import ChatBotEnvConfig
 from backend.models.model_factory import ModelFactory
-from backend.core.embeddings import _EmbeddingModel  # internal class, see below
+from backend.core.embeddings import _EmbeddingModel, embedding_registry
+from backend.services.ingest_cache import ingest_cache
+from backend.services.retrieval import configure_hierarchy
+from starlette.concurrency import run_in_threadpool
+import threading
 import logging
+import time
 import os
 
 logger = logging.getLogger(__name__)
 
-# Load configuration once
+# Load configuration once (cheap: env vars only)
 config = ChatBotEnvConfig.from_env()
 
-# Create LLM client using factory (supports API, local, or Ollama)
-llm = ModelFactory.create_model(config=config)
-
-# Create embedding model singleton using embedding_model_id from config
-# _EmbeddingModel is the class you already have in embeddings.py
-embedding_model = _EmbeddingModel.get(model_name=config.embedding_model_id)
+# Apply the memory cap before the default embedding model is loaded
+embedding_registry.configure(max_memory_mb=config.embedding_cache_max_mb)
+ingest_cache.configure(
+    max_bytes=config.ingest_cache_max_mb * 2**20,
+    persist_dir=config.ingest_cache_dir,
+    library_dir=os.path.join(config.index_dir, "docs") if config.index_dir else None,
+)
+configure_hierarchy(
+    enabled=config.hierarchical_index,
+    section_size=config.hierarchy_section_size,
+    fan_out=config.hierarchy_fan_out,
+)
 
 model_type = os.getenv("MODEL_TYPE", "api")
-logger.info(f"App state initialized: model_type={model_type}, model={config.model_id}, embedding_model={config.embedding_model_id}")
+
+# Heavy objects (LLM backend, default embedding model) are created lazily on
+# first use or by warm_up(), so importing the app does not block on them.
+_llm = None
+_llm_lock = threading.Lock()
+
+# Readiness as reported by /health/ready
+readiness = {"ready": False, "error": None, "warmup_seconds": None}
+
+
+def get_llm():
+    """Return the LLM client, creating it with ModelFactory on first use."""
+    global _llm
+    if _llm is None:
+        with _llm_lock:
+            if _llm is None:
+                _llm = ModelFactory.create_model(config=config)
+    return _llm
+
+
+async def get_llm_async():
+    """
+    get_llm() for async handlers: while the backend is still being created
+    (e.g. by warm_up holding the lock) the wait happens off the event loop.
+    """
+    if _llm is not None:
+        return _llm
+    return await run_in_threadpool(get_llm)
+
+
+def get_embedding_model() -> _EmbeddingModel:
+    """Return the default embedding model (loaded on first use)."""
+    return _EmbeddingModel.get(model_name=config.embedding_model_id)
+
+
+def warm_up():
+    """
+    Load the LLM backend and default embedding model, then run a dummy
+    encode/generate so lazy initialisation and kernel caches are paid for
+    before the first real request. Meant to run off the event loop.
+    """
+    start = time.perf_counter()
+    try:
+        embedding_model = get_embedding_model()
+        embedding_model.encode(["warm-up"])
+        llm = get_llm()
+        # Only backends that define warm_up() get a dummy generation; remote
+        # APIs would bill us for it and gain nothing.
+        backend_warm_up = getattr(llm, "warm_up", None)
+        if callable(backend_warm_up):
+            try:
+                backend_warm_up()
+            except Exception as e:
+                logger.warning(f"LLM warm-up generation failed (continuing): {e}")
+        readiness["warmup_seconds"] = round(time.perf_counter() - start, 3)
+        readiness["ready"] = True
+        logger.info(
+            f"App state initialized in {readiness['warmup_seconds']}s: model_type={model_type}, "
+            f"model={config.model_id}, embedding_model={config.embedding_model_id}"
+        )
+    except Exception as e:
+        readiness["error"] = str(e)
+        logger.exception("Warm-up failed")
+
+
+def __getattr__(name):
+    # Backwards compatibility for `app_state.llm` / `app_state.embedding_model`
+    if name == "llm":
+        return get_llm()
+    if name == "embedding_model":
+        return get_embedding_model()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
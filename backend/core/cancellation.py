@@ -0,0 +1,94 @@
+# backend/core/cancellation.py
+# Cancellation tokens threaded from the HTTP layer down into LLM backends,
+# and a StreamingResponse that cancels its token when the client goes away.
+
+import asyncio
+import threading
+from typing import Callable, List
+import logging
+
+from starlette.responses import StreamingResponse
+
+logger = logging.getLogger("core.cancellation")
+
+
+class CancellationToken:
+    """
+    Thread-safe, one-shot cancellation flag.
+
+    Backends poll ``cancelled`` between tokens and register callbacks (e.g.
+    closing an upstream HTTP stream) to unblock calls that are waiting.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._callbacks: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def wait(self, timeout: float) -> bool:
+        """Sleep up to ``timeout`` seconds; returns True if cancelled meanwhile."""
+        return self._event.wait(timeout)
+
+    def add_callback(self, fn: Callable[[], None]) -> Callable[[], None]:
+        """Run ``fn`` on cancellation (immediately if already cancelled); returns an unregister function."""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(fn)
+                return lambda: self._remove(fn)
+        self._run(fn)
+        return lambda: None
+
+    def _remove(self, fn):
+        with self._lock:
+            if fn in self._callbacks:
+                self._callbacks.remove(fn)
+
+    def cancel(self):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for fn in callbacks:
+            self._run(fn)
+
+    @staticmethod
+    def _run(fn):
+        try:
+            fn()
+        except Exception as e:
+            logger.debug(f"Cancellation callback failed: {e}")
+
+
+class CancellableStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that watches for ``http.disconnect`` for the whole life
+    of the response and cancels ``token`` as soon as the client disconnects,
+    even while the backend is still working on its first token. The token is
+    also cancelled once the response ends, so nothing outlives the request.
+    """
+
+    def __init__(self, content, token: CancellationToken, **kwargs):
+        super().__init__(content, **kwargs)
+        self.token = token
+
+    async def __call__(self, scope, receive, send):
+        async def watch_disconnect():
+            while True:
+                message = await receive()
+                if message["type"] == "http.disconnect":
+                    if not self.token.cancelled:
+                        logger.info("Client disconnected; cancelling generation")
+                    self.token.cancel()
+                    return
+
+        watcher = asyncio.create_task(watch_disconnect())
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            watcher.cancel()
+            self.token.cancel()
@@ -0,0 +1,224 @@
+# backend/core/coalescing.py
+# Single-flight coalescing of identical in-flight LLM generations: callers
+# asking for the same (backend, model, parameters, prompt) while a
+# generation is running share it instead of starting another one.
+
+import hashlib
+import threading
+from concurrent.futures import Future
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+import logging
+
+from backend.core.cancellation import CancellationToken
+from backend.core.metrics import registry
+
+logger = logging.getLogger("core.coalescing")
+
+COALESCED_REQUESTS = registry.counter(
+    "pdfchat_llm_coalesced_total",
+    "LLM requests served by attaching to an identical in-flight generation.",
+    labelnames=("backend", "stream"),
+)
+
+
+def generation_key(llm, prompt: str, stream: bool) -> Tuple:
+    cfg = llm.config
+    digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    return (type(llm).__name__, cfg.model_id, cfg.max_tokens, cfg.temperature, stream, digest)
+
+
+class _SharedStream:
+    """
+    One upstream token stream fanned out to any number of subscribers.
+
+    A daemon thread drives the upstream generator and appends to ``tokens``;
+    subscribers replay what has already been emitted and then follow live,
+    so a subscriber going away never stalls the others. When the last
+    subscriber leaves early, the upstream generation is cancelled.
+    """
+
+    def __init__(self, start: Callable[[CancellationToken], Iterator[str]], on_done: Callable[["_SharedStream"], None]):
+        self.tokens: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.upstream = CancellationToken()
+        self._cond = threading.Condition()
+        self._on_done = on_done
+        source = start(self.upstream)
+        self._thread = threading.Thread(target=self._pump, args=(source,), name="llm-single-flight", daemon=True)
+        self._thread.start()
+
+    def _pump(self, source: Iterator[str]):
+        try:
+            for token in source:
+                with self._cond:
+                    self.tokens.append(token)
+                    self._cond.notify_all()
+        except BaseException as e:  # surfaced to every subscriber
+            self.error = e
+        finally:
+            self._on_done(self)
+            with self._cond:
+                self.done = True
+                self._cond.notify_all()
+
+    def attach(self) -> bool:
+        """Register a subscriber; False if the upstream was already cancelled."""
+        with self._cond:
+            if self.upstream.cancelled:
+                return False
+            self.subscribers += 1
+            return True
+
+    def _wake(self):
+        with self._cond:
+            self._cond.notify_all()
+
+    def detach(self):
+        """Undo one ``attach()``; the last subscriber leaving early cancels the upstream."""
+        with self._cond:
+            self.subscribers -= 1
+            abandon = self.subscribers == 0 and not self.done
+        if abandon:
+            logger.info("All subscribers left; cancelling shared generation")
+            self.upstream.cancel()
+            self._on_done(self)
+
+    def subscribe(self, cancel: Optional[CancellationToken] = None) -> Iterator[str]:
+        """Iterate the shared stream; must follow a successful ``attach()``."""
+        unregister = cancel.add_callback(self._wake) if cancel is not None else None
+        i = 0
+        try:
+            while True:
+                with self._cond:
+                    while i >= len(self.tokens) and not self.done and not (cancel and cancel.cancelled):
+                        self._cond.wait()
+                    pending = self.tokens[i:]
+                    finished = self.done
+                if cancel is not None and cancel.cancelled:
+                    return
+                for token in pending:
+                    yield token
+                i += len(pending)
+                if finished and i >= len(self.tokens):
+                    break
+            if self.error is not None:
+                raise self.error
+        finally:
+            if unregister is not None:
+                unregister()
+            self.detach()
+
+
+class _Subscription:
+    """
+    One attached subscriber's iterator over a _SharedStream.
+
+    The attach is undone exactly once: by ``subscribe()``'s own cleanup once
+    iteration has started, or by ``close()``, garbage collection or ``cancel``
+    firing if it never started. (A generator that was never started does not
+    run its ``finally`` when closed, e.g. when the client disconnects before
+    the first body chunk is pulled.)
+    """
+
+    def __init__(self, shared: _SharedStream, cancel: Optional[CancellationToken] = None):
+        self._shared = shared
+        self._cancel = cancel
+        self._iterator: Optional[Iterator[str]] = None
+        self._released = False
+        self._lock = threading.Lock()
+        self._unregister = cancel.add_callback(self._release_unstarted) if cancel is not None else None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        with self._lock:
+            if self._iterator is None:
+                if self._released:
+                    raise StopIteration
+                self._iterator = self._shared.subscribe(self._cancel)
+                if self._unregister is not None:
+                    self._unregister()  # subscribe() watches ``cancel`` from here on
+        return next(self._iterator)
+
+    def _release_unstarted(self):
+        with self._lock:
+            if self._iterator is not None or self._released:
+                return
+            self._released = True
+        self._shared.detach()
+
+    def close(self):
+        if getattr(self, "_unregister", None) is not None:
+            self._unregister()
+        if getattr(self, "_iterator", None) is not None:
+            self._iterator.close()
+        elif hasattr(self, "_lock"):
+            self._release_unstarted()
+
+    __del__ = close
+
+
+class SingleFlight:
+    """Registry of in-flight generations keyed by ``generation_key``."""
+
+    def __init__(self):
+        self._streams: Dict[Tuple, _SharedStream] = {}
+        self._results: Dict[Tuple, Future] = {}
+        self._lock = threading.Lock()
+
+    def is_inflight(self, key: Tuple) -> bool:
+        return key in self._streams or key in self._results
+
+    def stream(
+        self,
+        key: Tuple,
+        start: Callable[[CancellationToken], Iterator[str]],
+        cancel: Optional[CancellationToken] = None,
+    ) -> Iterator[str]:
+        """
+        Subscribe to the generation for ``key``, starting it with
+        ``start(upstream_token)`` if none is running. Close the returned
+        iterator (or let it be collected) to leave without iterating.
+        """
+        with self._lock:
+            shared = self._streams.get(key)
+            if shared is not None and shared.attach():
+                COALESCED_REQUESTS.inc(backend=key[0], stream="true")
+                logger.info(f"Coalesced streaming request onto in-flight generation ({len(shared.tokens)} tokens so far)")
+            else:
+                shared = self._streams[key] = _SharedStream(
+                    start, lambda finished: self._drop(self._streams, key, finished)
+                )
+                shared.attach()
+        return _Subscription(shared, cancel)
+
+    def call(self, key: Tuple, fn: Callable[[], Optional[str]]) -> Optional[str]:
+        """Return ``fn()``, sharing the result with identical concurrent calls."""
+        with self._lock:
+            future = self._results.get(key)
+            leader = future is None
+            if leader:
+                future = self._results[key] = Future()
+            else:
+                COALESCED_REQUESTS.inc(backend=key[0], stream="false")
+        if not leader:
+            return future.result()
+        try:
+            future.set_result(fn())
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            self._drop(self._results, key, future)
+        return future.result()
+
+    def _drop(self, table: Dict, key: Tuple, expected):
+        # Only remove our own entry; a newer generation may have replaced it
+        with self._lock:
+            if table.get(key) is expected:
+                del table[key]
+
+
+single_flight = SingleFlight()
@@ -10,11 +10,75 @@ class ChatBotEnvConfig(BaseModel):
     model_id: str = Field(..., min_length=1)
     # Embedding model (SentenceTransformers or HF sentence-transformers repo)
     embedding_model_id: str = Field(..., min_length=1)
+    # Memory cap (MiB) for loaded embedding models; 0 disables eviction
+    embedding_cache_max_mb: int = Field(0, ge=0)
     max_tokens: int = Field(512, gt=0)
     temperature: float = Field(0.7, ge=0.0, le=1.0)
     stream_message: bool = Field(False)
     chunk_size: int = Field(1000, gt=0)
     overlap: int = Field(100, ge=0)
+    # Built indices reused when the same PDF is uploaded again; 0 disables
+    ingest_cache_max_mb: int = Field(512, ge=0)
+    # Directory to persist the ingest cache across restarts ("" = memory only)
+    ingest_cache_dir: str = Field("")
+    # Output directory of backend.services.bulk_ingest ("" = none): docs/ entries
+    # are bound by content hash, indices/<key> are loaded at startup
+    index_dir: str = Field("")
+    # Memory-mapped index store shared by all uvicorn workers, e.g. /dev/shm/pdfchat
+    # ("" = per-process indices, which only works with a single worker)
+    shared_index_dir: str = Field("")
+    # Background ingest jobs (/api/ingest/jobs): documents ingested at once,
+    # jobs waiting beyond that, finished jobs kept for status polling, and
+    # chunks embedded per batch (query embeddings run between batches)
+    ingest_max_concurrency: int = Field(1, gt=0)
+    ingest_max_queue: int = Field(64, ge=0)
+    ingest_job_history: int = Field(256, gt=0)
+    ingest_embed_batch: int = Field(64, gt=0)
+    # Coarse-to-fine retrieval for large documents: search the chunks of the
+    # hierarchy_fan_out sections (runs of hierarchy_section_size chunks) whose
+    # centroids are closest to the query instead of every chunk
+    hierarchical_index: bool = Field(False)
+    hierarchy_section_size: int = Field(64, gt=0)
+    hierarchy_fan_out: int = Field(8, gt=0)
+    # Maximal marginal relevance: re-rank mmr_fetch_factor x top_k nearest
+    # chunks for diversity (0 = plain nearest neighbours, up to 1)
+    mmr_diversity: float = Field(0.0, ge=0.0, le=1.0)
+    mmr_fetch_factor: int = Field(4, ge=1)
+    # /api/ask answers with the retrieved sentence closest to the question
+    # (no LLM call) when its cosine similarity reaches extractive_threshold
+    extractive_answers: bool = Field(False)
+    extractive_threshold: float = Field(0.7, ge=0.0, le=1.0)
+    # LLM admission control (per backend)
+    llm_max_concurrency: int = Field(4, gt=0)
+    llm_max_queue: int = Field(32, ge=0)
+    llm_queue_timeout_s: float = Field(30.0, gt=0)
+    # LocalModel continuous batching (shared decode loop for concurrent prompts)
+    local_batching: bool = Field(True)
+    local_max_batch_size: int = Field(8, gt=0)
+    # KV cache for shared prompt prefixes (instruction + context); 0 disables
+    local_prefix_cache_mb: int = Field(256, ge=0)
+    # LocalModel on CPU: "float32", or "int8" for dynamic int8 quantization of linear layers
+    local_cpu_mode: str = Field("float32", pattern="^(float32|int8)$")
+    # torch intra-op / inter-op thread pools for LocalModel (0 = torch default)
+    local_threads: int = Field(0, ge=0)
+    local_interop_threads: int = Field(0, ge=0)
+    # Share one generation between identical concurrent prompts
+    coalesce_requests: bool = Field(True)
+    # MODEL_TYPE=hedged: ordered backends "kind[:model_id][@deadline_s],..."
+    hedge_backends: str = Field("")
+    hedge_ttft_deadline_s: float = Field(20.0, gt=0)
+    # Hedge to the next backend once the primary exceeds this TTFT percentile
+    hedge_percentile: float = Field(90.0, gt=0, le=100)
+    hedge_default_delay_s: float = Field(2.0, gt=0)
+    hedge_min_samples: int = Field(5, gt=0)
+    # Cancel a streaming winner that produces no token for this long
+    hedge_token_gap_s: float = Field(30.0, gt=0)
+    # Opt-in per-request sampling profiler (X-Profile: 1 request header)
+    profiling_enabled: bool = Field(False)
+    profile_interval_ms: float = Field(5.0, gt=0)
+    profile_history: int = Field(20, gt=0)
+    # Bearer token for the /admin endpoints ("" = admin API disabled)
+    admin_token: str = Field("")
     # Backend url used by frontend / pdf processor if needed
     backend_url: str = Field("http://localhost:8081")
 
@@ -26,11 +90,47 @@ class ChatBotEnvConfig(BaseModel):
         return cls(
             model_id=model_id,
             embedding_model_id=embedding_id,
+            embedding_cache_max_mb=int(os.getenv("EMBEDDING_CACHE_MAX_MB", 0)),
             max_tokens=int(os.getenv("MAX_TOKENS", 512)),
             temperature=float(os.getenv("TEMPERATURE", 0.7)),
             stream_message=os.getenv("STREAM_MESSAGE", "true").lower() == "true",
             chunk_size=int(os.getenv("CHUNK_SIZE", 1000)),
             overlap=int(os.getenv("OVERLAP", 100)),
+            ingest_cache_max_mb=int(os.getenv("INGEST_CACHE_MAX_MB", 512)),
+            ingest_cache_dir=os.getenv("INGEST_CACHE_DIR", ""),
+            index_dir=os.getenv("INDEX_DIR", ""),
+            shared_index_dir=os.getenv("SHARED_INDEX_DIR", ""),
+            ingest_max_concurrency=int(os.getenv("INGEST_MAX_CONCURRENCY", 1)),
+            ingest_max_queue=int(os.getenv("INGEST_MAX_QUEUE", 64)),
+            ingest_job_history=int(os.getenv("INGEST_JOB_HISTORY", 256)),
+            ingest_embed_batch=int(os.getenv("INGEST_EMBED_BATCH", 64)),
+            hierarchical_index=os.getenv("HIERARCHICAL_INDEX", "false").lower() == "true",
+            hierarchy_section_size=int(os.getenv("HIERARCHY_SECTION_SIZE", 64)),
+            hierarchy_fan_out=int(os.getenv("HIERARCHY_FAN_OUT", 8)),
+            mmr_diversity=float(os.getenv("MMR_DIVERSITY", 0.0)),
+            mmr_fetch_factor=int(os.getenv("MMR_FETCH_FACTOR", 4)),
+            extractive_answers=os.getenv("EXTRACTIVE_ANSWERS", "false").lower() == "true",
+            extractive_threshold=float(os.getenv("EXTRACTIVE_THRESHOLD", 0.7)),
+            llm_max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", 4)),
+            llm_max_queue=int(os.getenv("LLM_MAX_QUEUE", 32)),
+            llm_queue_timeout_s=float(os.getenv("LLM_QUEUE_TIMEOUT_S", 30.0)),
+            local_batching=os.getenv("LOCAL_BATCHING", "true").lower() == "true",
+            local_max_batch_size=int(os.getenv("LOCAL_MAX_BATCH_SIZE", 8)),
+            local_prefix_cache_mb=int(os.getenv("LOCAL_PREFIX_CACHE_MB", 256)),
+            local_cpu_mode=os.getenv("LOCAL_CPU_MODE", "float32").lower(),
+            local_threads=int(os.getenv("LOCAL_THREADS", 0)),
+            local_interop_threads=int(os.getenv("LOCAL_INTEROP_THREADS", 0)),
+            coalesce_requests=os.getenv("COALESCE_REQUESTS", "true").lower() == "true",
+            hedge_backends=os.getenv("HEDGE_BACKENDS", ""),
+            hedge_ttft_deadline_s=float(os.getenv("HEDGE_TTFT_DEADLINE_S", 20.0)),
+            hedge_percentile=float(os.getenv("HEDGE_PERCENTILE", 90.0)),
+            hedge_default_delay_s=float(os.getenv("HEDGE_DEFAULT_DELAY_S", 2.0)),
+            hedge_min_samples=int(os.getenv("HEDGE_MIN_SAMPLES", 5)),
+            hedge_token_gap_s=float(os.getenv("HEDGE_TOKEN_GAP_S", 30.0)),
+            profiling_enabled=os.getenv("PROFILING_ENABLED", "false").lower() == "true",
+            profile_interval_ms=float(os.getenv("PROFILE_INTERVAL_MS", 5.0)),
+            profile_history=int(os.getenv("PROFILE_HISTORY", 20)),
+            admin_token=os.getenv("ADMIN_TOKEN", ""),
             backend_url=os.getenv("BACKEND_URL", f"http://localhost:{os.getenv('PORT', '8081')}"),
         )
 
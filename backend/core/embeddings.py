@@ -1,46 +1,157 @@
 # backend/core/embeddings.py
-# Singleton wrapper to load SentenceTransformer ONCE and expose embedding helpers.
+# Registry of SentenceTransformer models, loaded lazily per model name and
+# evicted (least recently used first) when a memory cap is configured.
 
 import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
 import numpy as np
 import logging
-from sentence_transformers import SentenceTransformer
 
 logger = logging.getLogger("embeddings")
 
+DEFAULT_EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+
+
 class _EmbeddingModel:
-    _instance = None
-    _lock = threading.Lock()
+    def __init__(self, model_name: str = DEFAULT_EMBEDDING_MODEL):
+        # Imported here so importing this module does not pull in torch
+        from sentence_transformers import SentenceTransformer
 
-    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
         self.model_name = model_name
         self.model = SentenceTransformer(model_name)
-        logger.info(f"Loaded embedding model: {model_name}")
+        self.memory_bytes = self._estimate_memory_bytes()
+        self.last_used = time.monotonic()
+        self._active = 0
+        self._active_lock = threading.Lock()
+        logger.info(f"Loaded embedding model: {model_name} (~{self.memory_bytes / 2**20:.1f} MiB)")
+
+    def _estimate_memory_bytes(self) -> int:
+        try:
+            params = sum(p.numel() * p.element_size() for p in self.model.parameters())
+            buffers = sum(b.numel() * b.element_size() for b in self.model.buffers())
+            return int(params + buffers)
+        except Exception as e:
+            logger.warning(f"Could not estimate memory for {self.model_name}: {e}")
+            return 0
 
     @classmethod
-    def get(cls, model_name: str = "all-MiniLM-L6-v2"):
-        # Note: multiple calls with the same or different model_name will create only one instance.
-        # If you need multiple embedding models simultaneously, adjust logic accordingly.
-        if cls._instance is None:
-            with cls._lock:
-                if cls._instance is None:
-                    cls._instance = _EmbeddingModel(model_name=model_name)
-        return cls._instance
+    def get(cls, model_name: str = DEFAULT_EMBEDDING_MODEL) -> "_EmbeddingModel":
+        """Return the (lazily loaded) model for ``model_name`` from the registry."""
+        return embedding_registry.get(model_name)
+
+    @property
+    def in_use(self) -> bool:
+        return self._active > 0
 
     def encode(self, texts, **kwargs) -> np.ndarray:
-        vectors = self.model.encode(texts, show_progress_bar=False, **kwargs)
-        return np.array(vectors, dtype=np.float32)
+        with self._active_lock:
+            self._active += 1
+        try:
+            vectors = self.model.encode(texts, show_progress_bar=False, **kwargs)
+            return np.array(vectors, dtype=np.float32)
+        finally:
+            with self._active_lock:
+                self._active -= 1
+            self.last_used = time.monotonic()
+
+
+class _EmbeddingRegistry:
+    """
+    Thread-safe registry of embedding models keyed by model name.
+
+    Models are loaded on first use. When ``max_memory_mb`` is set, idle models
+    are evicted least-recently-used first until the loaded set fits the cap.
+    The registry also remembers which model each index key was built with so
+    queries against that key are encoded with the matching model.
+    """
+
+    def __init__(self, max_memory_mb: int = 0):
+        self.max_memory_mb = max_memory_mb
+        self._models: "OrderedDict[str, _EmbeddingModel]" = OrderedDict()
+        self._index_models: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+
+    def configure(self, max_memory_mb: Optional[int] = None):
+        if max_memory_mb is not None:
+            self.max_memory_mb = max_memory_mb
+        with self._lock:
+            self._evict_locked(keep=None)
+
+    def get(self, model_name: str = DEFAULT_EMBEDDING_MODEL) -> _EmbeddingModel:
+        with self._lock:
+            model = self._models.get(model_name)
+            if model is not None:
+                self._models.move_to_end(model_name)
+                model.last_used = time.monotonic()
+                return model
+            load_lock = self._load_locks.setdefault(model_name, threading.Lock())
 
+        # Load outside the registry lock so other models stay available
+        with load_lock:
+            with self._lock:
+                model = self._models.get(model_name)
+            if model is None:
+                model = _EmbeddingModel(model_name=model_name)
+                with self._lock:
+                    self._models[model_name] = model
+                    self._evict_locked(keep=model_name)
+        return model
 
-def get_embedding_model(model_name: str = "all-MiniLM-L6-v2") -> _EmbeddingModel:
-    return _EmbeddingModel.get(model_name)
+    def _evict_locked(self, keep: Optional[str]):
+        if not self.max_memory_mb:
+            return
+        cap = self.max_memory_mb * 2**20
+        total = sum(m.memory_bytes for m in self._models.values())
+        for name in list(self._models.keys()):  # oldest first
+            if total <= cap:
+                break
+            model = self._models[name]
+            if name == keep or model.in_use:
+                continue
+            del self._models[name]
+            total -= model.memory_bytes
+            logger.info(f"Evicted embedding model {name} (idle {time.monotonic() - model.last_used:.0f}s)")
+        if total > cap:
+            logger.warning(
+                f"Embedding models use {total / 2**20:.1f} MiB, above the {self.max_memory_mb} MiB cap"
+            )
 
+    def evict(self, model_name: str) -> bool:
+        with self._lock:
+            return self._models.pop(model_name, None) is not None
 
-def embed_texts(texts, model_name: str = "all-MiniLM-L6-v2") -> np.ndarray:
+    def loaded_models(self) -> Dict[str, int]:
+        """Return loaded model names mapped to their estimated memory in bytes."""
+        with self._lock:
+            return {name: m.memory_bytes for name, m in self._models.items()}
+
+    # -------------------------------------------------------------------------
+    # Index key -> embedding model bookkeeping
+    # -------------------------------------------------------------------------
+    def register_index(self, key: str, model_name: str):
+        self._index_models[key] = model_name
+
+    def unregister_index(self, key: str):
+        self._index_models.pop(key, None)
+
+    def model_for_index(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        return self._index_models.get(key, default)
+
+
+embedding_registry = _EmbeddingRegistry()
+
+
+def get_embedding_model(model_name: str = DEFAULT_EMBEDDING_MODEL) -> _EmbeddingModel:
+    return embedding_registry.get(model_name)
+
+
+def embed_texts(texts, model_name: str = DEFAULT_EMBEDDING_MODEL) -> np.ndarray:
     m = get_embedding_model(model_name)
     return m.encode(texts)
 
 
-def embed_text(text, model_name: str = "all-MiniLM-L6-v2") -> np.ndarray:
+def embed_text(text, model_name: str = DEFAULT_EMBEDDING_MODEL) -> np.ndarray:
     return embed_texts([text], model_name=model_name)[0]
-
@@ -0,0 +1,14 @@
+# backend/core/hashing.py
+# Content hashing shared by the backend and the Gradio client (standard
+# library only, so the frontend can import it without the search stack).
+
+import hashlib
+
+
+def file_sha256(path: str, block_size: int = 1 << 20) -> str:
+    """Content hash of a file, the document part of ``ingest_key``."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
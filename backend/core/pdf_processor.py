@@ -3,11 +3,13 @@ import shutil
 import tempfile
 import atexit
 import httpx
+import json
 import asyncio
 import logging
-import numpy as np
+import time
 from typing import Optional, Generator
-from pypdf import PdfReader
+from backend.core.streaming import NDJSON_MEDIA_TYPE, EventStreamDecoder
+from backend.core.hashing import file_sha256
 
 logger = logging.getLogger("core.pdf_processor")
 
@@ -29,9 +31,14 @@ class PDFProcessor:
 
         self.session_dir = tempfile.mkdtemp(prefix="gradio_pdf_session_")
         self.pdf_path: Optional[str] = None
-        self.pdf_text: str = ""
-        self.chunks: list[str] = []
-        self.vectors: Optional[np.ndarray] = None
+        # Chunk texts and vectors live only in the backend index
+        self.n_chunks = 0
+        self.embedding_model: Optional[str] = None
+        # sha256 of the uploaded PDF bytes (ingest cache key on the backend)
+        self.content_hash: Optional[str] = None
+        self.indexed = False
+        # Background ingest job for the current upload, until it finishes
+        self.job_id: Optional[str] = None
         self.index_key = index_key
 
         self.client = httpx.AsyncClient(timeout=120.0)
@@ -71,99 +78,122 @@ class PDFProcessor:
         # Copy PDF
         self.pdf_path = os.path.join(self.session_dir, os.path.basename(file.name))
         shutil.copy(file.name, self.pdf_path)
+        self.indexed = False
+        self.job_id = None
+        self.content_hash = file_sha256(self.pdf_path)
 
-        # Extract PDF text
-        try:
-            reader = PdfReader(self.pdf_path)
-            self.pdf_text = ""
-            for page in reader.pages:
-                text = page.extract_text() or ""
-                self.pdf_text += text + "\n"
-
-            logger.info(
-                f"Extracted {len(self.pdf_text)} characters "
-                f"from {len(reader.pages)} PDF pages."
-            )
-        except Exception as e:
-            logger.exception(f"Error reading PDF: {e}")
-            return f"Error reading PDF: {e}"
-
-        if not self.pdf_text.strip():
-            return "The PDF contains no extractable text."
-
-        # Send to chunker + build index
+        # Same document ingested before (any session): reuse its index
         loop = get_event_loop()
         try:
-            logger.info("Sending text to chunking API...")
-
-            # Chunk request
             r = loop.run_until_complete(
                 self.client.post(
-                    f"{self.api_url}/api/chunk",
-                    json={"text": self.pdf_text},
+                    f"{self.api_url}/api/search/bind",
+                    json={"key": self.index_key, "content_hash": self.content_hash},
                 )
             )
             r.raise_for_status()
+            bound = r.json()
+            if bound.get("cached"):
+                self.n_chunks = bound["n_chunks"]
+                self.embedding_model = bound.get("model_name")
+                self.indexed = True
+                logger.info(f"Reused cached index for {self.content_hash[:12]} ({bound['n_chunks']} chunks)")
+                return f"PDF already indexed; reused {bound['n_chunks']} chunks."
+        except Exception as e:
+            logger.warning(f"Ingest cache lookup failed, ingesting from scratch: {e}")
 
-            data = r.json()
-            self.chunks = data.get("chunks", [])
-            self.vectors = np.array(data.get("vectors", []), dtype=np.float32)
-
-            logger.info(f"Received {len(self.chunks)} chunks. Building index...")
-
-            # Build index
-            build_resp = loop.run_until_complete(
+        # Ingest in the background: the backend extracts, chunks, embeds and
+        # indexes; ask()/ingest_status() poll the job until it is done
+        try:
+            with open(self.pdf_path, "rb") as f:
+                pdf_bytes = f.read()
+            r = loop.run_until_complete(
                 self.client.post(
-                    f"{self.api_url}/api/search/build_index",
-                    json={
+                    f"{self.api_url}/api/ingest/jobs",
+                    params={
                         "key": self.index_key,
-                        "chunks": self.chunks,
-                        "vectors": self.vectors.tolist(),
+                        "filename": os.path.basename(self.pdf_path),
+                        "doc_id": os.path.basename(self.pdf_path),
                     },
+                    content=pdf_bytes,
+                    headers={"Content-Type": "application/pdf"},
                 )
             )
-            build_resp.raise_for_status()
-
-            logger.info(f"Index built successfully for key: {self.index_key}")
-            return f"PDF uploaded and indexed successfully! {len(self.chunks)} chunks processed."
+            r.raise_for_status()
+            job = r.json()
+            self.job_id = job["job_id"]
+            logger.info(f"Submitted ingest job {self.job_id} for key: {self.index_key}")
+            return f"PDF uploaded; indexing in the background (job {self.job_id[:8]}). Use 'Check status' to follow progress."
 
         except Exception as e:
-            logger.exception(f"Error processing PDF: {e}")
+            logger.exception(f"Error submitting PDF for ingestion: {e}")
             return f"Error processing PDF via API: {e}"
 
+    def ingest_status(self) -> str:
+        """Poll the background ingest job; marks the PDF indexed once it is done."""
+        if self.indexed:
+            return f"PDF indexed: {self.n_chunks} chunks."
+        if self.job_id is None:
+            return "Please upload a PDF first."
+
+        loop = get_event_loop()
+        try:
+            r = loop.run_until_complete(self.client.get(f"{self.api_url}/api/ingest/jobs/{self.job_id}"))
+            r.raise_for_status()
+            job = r.json()
+        except Exception as e:
+            logger.warning(f"Could not fetch ingest job {self.job_id}: {e}")
+            return f"Could not fetch indexing status: {e}"
+
+        if job["status"] == "done":
+            self.n_chunks = job.get("n_chunks", 0)
+            self.embedding_model = job.get("model_name")
+            self.indexed = True
+            self.job_id = None
+            logger.info(f"Ingest job finished for key {self.index_key} ({self.n_chunks} chunks)")
+            return f"PDF uploaded and indexed successfully! {self.n_chunks} chunks processed."
+        if job["status"] in ("failed", "cancelled"):
+            self.job_id = None
+            return f"Indexing {job['status']}: {job.get('error') or ''}".strip()
+        return f"Indexing: {job['stage']} ({job['progress']:.0%})"
+
+    def _not_ready_message(self) -> Optional[str]:
+        """None when questions can be asked, else a message for the user."""
+        if self.indexed:
+            return None
+        if self.job_id is None:
+            return "Please upload and process a PDF before asking a question."
+        status = self.ingest_status()
+        return None if self.indexed else f"The PDF is still being indexed. {status}"
+
     # -------------------------------------------------------------------------
     # Ask (non-streaming)
     # -------------------------------------------------------------------------
     def ask(self, question: str, top_k: int = 3) -> str:
-        if not self.chunks or self.vectors is None:
-            return "Please upload and process a PDF before asking a question."
+        not_ready = self._not_ready_message()
+        if not_ready:
+            return not_ready
 
         loop = get_event_loop()
 
         try:
-            logger.info(f"Getting context for question: {question[:50]}...")
-
-            # Search matches
-            resp = loop.run_until_complete(
-                self.client.post(
-                    f"{self.api_url}/api/search/query",
-                    json={"key": self.index_key, "query": question, "top_k": top_k},
-                )
-            )
-            resp.raise_for_status()
-
-            matches = resp.json().get("matches", [])
-            context = "\n\n---\n\n".join(matches)
+            logger.info(f"Asking question: {question[:50]}...")
 
-            # Get answer from LLM
+            # Retrieval and generation both happen server-side
             ans_resp = loop.run_until_complete(
                 self.client.post(
-                    f"{self.api_url}/api/llm/answer",
-                    json={"context": context, "question": question},
+                    f"{self.api_url}/api/ask",
+                    json={"key": self.index_key, "question": question, "top_k": top_k},
                 )
             )
             ans_resp.raise_for_status()
 
+            if ans_resp.headers.get("content-type", "").startswith(NDJSON_MEDIA_TYPE):
+                # Streaming backend: collect the deltas
+                decoder = EventStreamDecoder()
+                events = decoder.feed(ans_resp.content) + decoder.close()
+                return "".join(e["text"] for e in events if e.get("type") == "delta")
+
             answer = ans_resp.json().get("answer", "")
             return answer
 
@@ -174,56 +204,75 @@ class PDFProcessor:
     # -------------------------------------------------------------------------
     # Ask (streaming)
     # -------------------------------------------------------------------------
-    def ask_stream(self, question: str, top_k: int = 3) -> Generator[str, None, None]:
-        if not self.chunks or self.vectors is None:
-            yield "Please upload and process a PDF before asking a question."
+    def ask_stream(
+        self, question: str, top_k: int = 3, min_update_interval: float = 0.05
+    ) -> Generator[str, None, None]:
+        """
+        Stream the answer as NDJSON events from /api/ask and yield the answer
+        so far. Deltas are appended to a list and the UI is refreshed at most
+        every ``min_update_interval`` seconds (and once at the end), so the
+        number of full-text updates depends on elapsed time rather than on
+        answer length; Gradio sends each update to the browser as a diff.
+        """
+        not_ready = self._not_ready_message()
+        if not_ready:
+            yield not_ready
             return
 
         loop = get_event_loop()
 
-        # Step 1: Fetch context
+        # Single round-trip: the backend retrieves context and streams the answer
         try:
-            resp = loop.run_until_complete(
-                self.client.post(
-                    f"{self.api_url}/api/search/query",
-                    json={"key": self.index_key, "query": question, "top_k": top_k},
-                )
-            )
-            resp.raise_for_status()
-
-            matches = resp.json().get("matches", [])
-            context = "\n\n---\n\n".join(matches)
-        except Exception as e:
-            logger.exception(f"Error fetching context: {e}")
-            yield f"Error fetching context: {e}"
-            return
-
-        # Step 2: Stream LLM chunks
-        try:
-            async def stream_answer():
+            async def stream_events():
                 async with self.client.stream(
                     "POST",
-                    f"{self.api_url}/api/llm/answer",
-                    json={"context": context, "question": question},
+                    f"{self.api_url}/api/ask",
+                    json={"key": self.index_key, "question": question, "top_k": top_k, "stream_format": "ndjson"},
+                    headers={"Accept": NDJSON_MEDIA_TYPE},
                 ) as ans_resp:
                     ans_resp.raise_for_status()
+                    if not ans_resp.headers.get("content-type", "").startswith(NDJSON_MEDIA_TYPE):
+                        # Backend is not streaming: a single JSON body
+                        body = await ans_resp.aread()
+                        yield {"type": "delta", "text": json.loads(body).get("answer", "")}
+                        return
+                    decoder = EventStreamDecoder()
                     async for chunk in ans_resp.aiter_bytes():
-                        if chunk:
-                            yield chunk.decode("utf-8", errors="ignore")
+                        for event in decoder.feed(chunk):
+                            yield event
+                    for event in decoder.close():
+                        yield event
 
-            agen = stream_answer()
-
-            # FIX: accumulate partial text
-            accumulated = ""
+            agen = stream_events()
+            # Running answer; each update re-renders it, so it is not re-joined from parts
+            answer = ""
+            shown = 0
+            last_update = time.perf_counter()
 
             while True:
                 try:
-                    piece = loop.run_until_complete(agen.__anext__())
-                    accumulated += piece
-                    yield accumulated
+                    event = loop.run_until_complete(agen.__anext__())
                 except StopAsyncIteration:
                     break
 
+                kind = event.get("type")
+                if kind == "delta":
+                    answer += event["text"]
+                elif kind == "error":
+                    answer += f"\n\nError during streaming: {event.get('message')}"
+                elif kind == "meta":
+                    logger.debug(f"Retrieved chunks {event.get('indices')} (distances: {event.get('distances')})")
+                elif kind == "done":
+                    logger.info(f"Answer streamed in {event.get('chunks')} chunks; timings (ms): {event.get('timings')}")
+
+                now = time.perf_counter()
+                if len(answer) > shown and now - last_update >= min_update_interval:
+                    shown, last_update = len(answer), now
+                    yield answer
+
+            if len(answer) > shown or not answer:
+                yield answer
+
         except Exception as e:
             logger.exception("Streaming error")
             yield f"Streaming error: {e}"
@@ -0,0 +1,261 @@
+# backend/core/profiling.py
+# Per-request stage timings (for Server-Timing headers) and an opt-in
+# sampling profiler whose results can be fetched after the request.
+
+import asyncio
+import contextvars
+import itertools
+import sys
+import threading
+import time
+from collections import Counter as _Counter, OrderedDict
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger("core.profiling")
+
+
+# ==============================
+# Stage timings
+# ==============================
+class RequestTimings:
+    """Ordered stage durations (seconds) recorded while serving one request."""
+
+    __slots__ = ("start", "stages")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.stages: List[Tuple[str, float]] = []
+
+    def add(self, name: str, seconds: float):
+        self.stages.append((name, seconds))
+
+    def as_dict(self) -> Dict[str, float]:
+        """Stage durations in milliseconds, plus the total so far."""
+        out = {name: round(seconds * 1000, 2) for name, seconds in self.stages}
+        out["total"] = round((time.perf_counter() - self.start) * 1000, 2)
+        return out
+
+    def server_timing(self, total_desc: str = "") -> str:
+        parts = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in self.stages]
+        total = f"total;dur={(time.perf_counter() - self.start) * 1000:.2f}"
+        if total_desc:
+            total += f';desc="{total_desc}"'
+        parts.append(total)
+        return ", ".join(parts)
+
+
+_current_timings: contextvars.ContextVar[Optional[RequestTimings]] = contextvars.ContextVar(
+    "request_timings", default=None
+)
+
+
+def current_timings() -> Optional[RequestTimings]:
+    return _current_timings.get()
+
+
+def record_stage(name: str, seconds: float):
+    """Record a stage duration on the current request, if there is one."""
+    timings = _current_timings.get()
+    if timings is not None:
+        timings.add(name, seconds)
+
+
+@contextmanager
+def stage(name: str):
+    """
+    Time a block as a Server-Timing stage. Note that executor threads do not
+    inherit the request context, so wrap the ``await`` in the router rather
+    than code running inside the executor.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - start)
+
+
+# ==============================
+# Sampling profiler
+# ==============================
+class StackSampler:
+    """
+    Samples the stacks of all threads (event loop and executor workers) at a
+    fixed interval and aggregates them as collapsed stacks, the input format
+    of flamegraph.pl / speedscope.
+    """
+
+    def __init__(self, interval_s: float = 0.005, max_depth: int = 64):
+        self.interval_s = interval_s
+        self.max_depth = max_depth
+        self.samples: _Counter = _Counter()
+        self.n_samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        """Stop sampling and wait for the sampler thread (blocks: call off the event loop)."""
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval_s):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < self.max_depth:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({code.co_filename}:{frame.f_lineno})")
+                    frame = frame.f_back
+                if thread_id not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                thread_name = names.get(thread_id, str(thread_id))
+                self.samples[";".join([thread_name] + stack[::-1])] += 1
+            self.n_samples += 1
+
+    def collapsed(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self.samples.most_common())
+
+
+class ProfileStore:
+    """Bounded in-memory store of finished request profiles, newest last."""
+
+    def __init__(self, max_profiles: int = 20):
+        self.max_profiles = max_profiles
+        self._profiles: "OrderedDict[str, Dict]" = OrderedDict()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def new_id(self) -> str:
+        return f"{int(time.time())}-{next(self._ids)}"
+
+    def put(self, profile_id: str, profile: Dict):
+        with self._lock:
+            self._profiles[profile_id] = profile
+            while len(self._profiles) > self.max_profiles:
+                self._profiles.popitem(last=False)
+
+    def get(self, profile_id: str) -> Optional[Dict]:
+        return self._profiles.get(profile_id)
+
+    def list(self) -> List[Dict]:
+        with self._lock:
+            return [
+                {k: v for k, v in p.items() if k != "collapsed"} | {"id": pid}
+                for pid, p in self._profiles.items()
+            ]
+
+
+class ProfilingState:
+    """Admin-switchable profiling settings shared by the middleware and admin router."""
+
+    def __init__(self, enabled: bool = False, interval_ms: float = 5.0, max_profiles: int = 20):
+        self.enabled = enabled
+        self.interval_ms = interval_ms
+        self.store = ProfileStore(max_profiles)
+
+
+profiling_state = ProfilingState()
+
+
+# ==============================
+# Middleware
+# ==============================
+PROFILE_HEADER = b"x-profile"
+# An NDJSON answer stream starts with a "meta" event; the header waits for the
+# first event produced by the LLM (or the end of the stream)
+_NDJSON = b"application/x-ndjson"
+_LLM_EVENTS = (b'{"type":"delta"', b'{"type":"error"', b'{"type":"done"')
+
+
+class ServerTimingMiddleware:
+    """
+    ASGI middleware that attaches a ``Server-Timing`` header built from the
+    stages recorded during the request.
+
+    The response start is held back until the first LLM output so streaming
+    responses can report the ``llm_ttft`` stage: the first non-empty body
+    chunk of a plain-text stream, or the first delta/error/done event of an
+    NDJSON stream (the "meta" event before it is held back too). For streams
+    ``total`` is time to first token, and stages recorded later (``llm``,
+    the whole generation) cannot be in the header; the ``timings`` of the
+    NDJSON "done" event are the only complete source. When profiling is
+    enabled and the request carries ``X-Profile: 1``, the request is sampled
+    and the profile id returned in ``X-Profile-Id``.
+    """
+
+    def __init__(self, app, path_prefix: str = "/api"):
+        self.app = app
+        self.path_prefix = path_prefix
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefix):
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = _current_timings.set(timings)
+
+        sampler = None
+        profile_id = None
+        if profiling_state.enabled and dict(scope["headers"]).get(PROFILE_HEADER, b"") in (b"1", b"true"):
+            profile_id = profiling_state.store.new_id()
+            sampler = StackSampler(interval_s=profiling_state.interval_ms / 1000.0)
+            sampler.start()
+
+        pending_start = None
+        held: List[Dict] = []  # body messages sent before the LLM output
+        ndjson = False
+
+        async def send_wrapper(message):
+            nonlocal pending_start, ndjson
+            if message["type"] == "http.response.start":
+                pending_start = message
+                content_type = dict(message.get("headers", [])).get(b"content-type", b"")
+                ndjson = content_type.startswith(_NDJSON)
+                return
+            if pending_start is not None and message["type"] == "http.response.body":
+                body = message.get("body", b"")
+                streaming = message.get("more_body", False)
+                llm_output = any(event in body for event in _LLM_EVENTS) if ndjson else bool(body)
+                if streaming and not llm_output:
+                    if body:
+                        held.append(message)
+                    return
+                headers = list(pending_start.get("headers", []))
+                headers.append((
+                    b"server-timing",
+                    timings.server_timing("time to first token" if streaming else "").encode("latin-1"),
+                ))
+                if profile_id is not None:
+                    headers.append((b"x-profile-id", profile_id.encode("latin-1")))
+                await send({**pending_start, "headers": headers})
+                pending_start = None
+                for earlier in held:
+                    await send(earlier)
+                held.clear()
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_timings.reset(token)
+            if sampler is not None:
+                # Joining the sampler thread blocks; keep it off the event loop
+                await asyncio.get_running_loop().run_in_executor(None, sampler.stop)
+                profiling_state.store.put(profile_id, {
+                    "path": scope["path"],
+                    "method": scope["method"],
+                    "duration_ms": round((time.perf_counter() - timings.start) * 1000, 2),
+                    "n_samples": sampler.n_samples,
+                    "interval_ms": profiling_state.interval_ms,
+                    "stages": [(name, round(s * 1000, 2)) for name, s in timings.stages],
+                    "collapsed": sampler.collapsed(),
+                })
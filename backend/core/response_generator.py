@@ -1,30 +1,105 @@
-from backend.core.app_state import llm
+from backend.core.app_state import config, get_llm, get_llm_async
+from backend.core.coalescing import generation_key, single_flight
+from backend.core.cancellation import CancellationToken
+from backend.core.metrics import (
+    LLM_TTFT_SECONDS, LLM_GENERATION_SECONDS, LLM_TOKENS_PER_SECOND, LLM_STREAM_CHUNKS, LLM_CANCELLED, registry,
+)
+from typing import Dict, Iterator, Optional
 import logging
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
-def generate_response(prompt: str) -> str:
+# Backend streams being consumed; one that never finishes (a stuck consumer) stays counted
+_open_streams: Dict[str, int] = {}
+_open_streams_lock = threading.Lock()
+
+registry.gauge(
+    "pdfchat_llm_open_streams",
+    "Backend token streams started and not yet finished, per backend.",
+    labelnames=("backend",),
+    callback=lambda: [((backend,), n) for backend, n in list(_open_streams.items())],
+)
+
+
+def _count_open_stream(backend: str, delta: int):
+    with _open_streams_lock:
+        _open_streams[backend] = _open_streams.get(backend, 0) + delta
+
+
+def _instrumented_stream(
+    stream: Iterator[str], backend: str, start: float, cancel: Optional[CancellationToken] = None
+) -> Iterator[str]:
+    """Pass chunks through while recording TTFT and tokens/second for ``backend``."""
+    first_token_at = None
+    n_tokens = 0
+    _count_open_stream(backend, 1)
+    try:
+        for chunk in stream:
+            if first_token_at is None and chunk:
+                first_token_at = time.perf_counter()
+                LLM_TTFT_SECONDS.observe(first_token_at - start, backend=backend)
+            n_tokens += 1
+            LLM_STREAM_CHUNKS.inc(backend=backend)
+            yield chunk
+    finally:
+        _count_open_stream(backend, -1)
+        if cancel is not None and cancel.cancelled:
+            LLM_CANCELLED.inc(backend=backend)
+        end = time.perf_counter()
+        LLM_GENERATION_SECONDS.observe(end - start, backend=backend, stream="true")
+        if first_token_at is not None and end > first_token_at and n_tokens > 1:
+            LLM_TOKENS_PER_SECOND.observe((n_tokens - 1) / (end - first_token_at), backend=backend)
+
+async def is_coalesced(prompt: str) -> bool:
+    """True if an identical generation is already running and this prompt would join it."""
+    llm = await get_llm_async()
+    return config.coalesce_requests and single_flight.is_inflight(
+        generation_key(llm, prompt, llm.config.stream_message)
+    )
+
+
+def generate_response(prompt: str, cancel: Optional[CancellationToken] = None) -> str:
     """
     Generates a non-streaming response from the LLM.
 
     Args:
         prompt (str): The input prompt for the LLM.
+        cancel (CancellationToken): Stops a streaming generation when cancelled
+            (e.g. the client disconnected).
     Returns:
         str: The generated response from the LLM.
     """
 
+    llm = get_llm()
+    backend = type(llm).__name__
+    start = time.perf_counter()
     try:
         if llm.config.stream_message:
             # Return a generator for streaming
+            stream = lambda token: _instrumented_stream(
+                llm.generate_stream(prompt, cancel=token), backend, start, token
+            )
+            if config.coalesce_requests:
+                # Identical in-flight prompts share one upstream generation, which
+                # is cancelled only once every subscriber has gone away
+                data = single_flight.stream(generation_key(llm, prompt, True), stream, cancel=cancel)
+            else:
+                data = stream(cancel)
             return {
                 "success": True,
-                "data": llm.generate_stream(prompt),
+                "data": data,
                 "stream": True,
                 "error": None
             }
         else:
             # Normal one-shot generation
-            output = llm.generate(prompt)
+            if config.coalesce_requests:
+                output = single_flight.call(generation_key(llm, prompt, False), lambda: llm.generate(prompt))
+            else:
+                output = llm.generate(prompt)
+            LLM_GENERATION_SECONDS.observe(time.perf_counter() - start, backend=backend, stream="false")
             if output:
                 return {
                     "success": True,
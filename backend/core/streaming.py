@@ -0,0 +1,59 @@
+# backend/core/streaming.py
+# Structured answer streaming: newline-delimited JSON events carrying token
+# deltas, retrieval metadata, timings and a terminal event, plus an
+# incremental decoder for the client side.
+#
+# Event types, in order:
+#   {"type": "meta", ...}                  retrieval metadata (optional)
+#   {"type": "delta", "text": "..."}       appended answer text
+#   {"type": "error", "message": "..."}    generation failed (then "done")
+#   {"type": "done", "timings": {...}, "chunks": n}
+
+import codecs
+import json
+from typing import Any, Dict, List
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+class StreamError(str):
+    """
+    A backend's in-band failure message ("\nError: ...").
+
+    Plain-text consumers see an ordinary chunk; code that must tell a failure
+    from answer text that happens to start with "Error:" checks ``isinstance``.
+    """
+
+
+def encode_event(event_type: str, **fields: Any) -> bytes:
+    """One event as a single NDJSON line (non-ASCII kept as UTF-8, no newlines inside)."""
+    return json.dumps({"type": event_type, **fields}, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+
+
+def wants_events(accept: str) -> bool:
+    return NDJSON_MEDIA_TYPE in (accept or "")
+
+
+class EventStreamDecoder:
+    """
+    Incrementally turns raw response bytes into event dicts.
+
+    Bytes go through an incremental UTF-8 decoder, so a multi-byte character
+    split across network chunks is held back until complete instead of being
+    dropped; only complete lines are parsed, and each byte is decoded once.
+    """
+
+    def __init__(self):
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._pending = ""
+
+    def feed(self, data: bytes) -> List[Dict[str, Any]]:
+        text = self._pending + self._decoder.decode(data)
+        *lines, self._pending = text.split("\n")
+        return [json.loads(line) for line in lines if line]
+
+    def close(self) -> List[Dict[str, Any]]:
+        """Flush at end of stream; a truncated trailing event is an error."""
+        tail = self._pending + self._decoder.decode(b"", final=True)
+        self._pending = ""
+        return [json.loads(tail)] if tail.strip() else []
@@ -1,12 +1,20 @@
 # main.py
+import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from backend.api.chunk_router import chunk_router
+from backend.api.ask_router import ask_router
 from backend.api.llm_router import llm_router
-from backend.api.search_router import search_router
+from backend.api.search_router import search_router, load_index_dir
+from backend.api.admin_router import admin_router
+from backend.api.ingest_router import ingest_router
 
-# Import app_state so it loads config, LLM, embeddings once
+# app_state loads config only; the LLM and embedding model are loaded by
+# the background warm-up task started below (or lazily on first use)
 from backend.core import app_state
+from backend.core.metrics import registry as metrics_registry, RequestMetricsMiddleware
+from backend.core.profiling import ServerTimingMiddleware, profiling_state
 
 app = FastAPI(title="PDF_ChatBot")
 
@@ -18,16 +26,53 @@ app.add_middleware(
 )
 
 app.include_router(chunk_router, prefix="/api")
+app.include_router(ask_router, prefix="/api")
 app.include_router(search_router, prefix="/api/search")
+app.include_router(ingest_router, prefix="/api/ingest")
 app.include_router(llm_router, prefix="/api/llm")
+app.include_router(admin_router, prefix="/admin")
+
+profiling_state.enabled = app_state.config.profiling_enabled
+profiling_state.interval_ms = app_state.config.profile_interval_ms
+profiling_state.store.max_profiles = app_state.config.profile_history
+
+# Pure ASGI middleware: no per-request task or body buffering, streaming untouched
+app.add_middleware(
+    RequestMetricsMiddleware,
+    router_prefixes=(
+        ("/api/search", "search"), ("/api/ingest", "ingest"), ("/api/llm", "llm"), ("/api/ask", "ask"), ("/api", "chunk"),
+    ),
+)
+# Server-Timing on every /api response; sampling profiler only on opt-in
+app.add_middleware(ServerTimingMiddleware, path_prefix="/api")
 
 @app.get("/")
 def root():
     return {"message": "API is up!"}
 
+@app.get("/health/live")
+def liveness():
+    """The process is up and serving HTTP."""
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+def readiness():
+    """Models are loaded and warmed up; 503 until then."""
+    state = dict(app_state.readiness)
+    if not state["ready"]:
+        return JSONResponse(status_code=503, content={"status": "starting", **state})
+    return {"status": "ready", **state}
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus text exposition of pipeline, LLM, HTTP and memory metrics."""
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
 @app.on_event("startup")
-def startup_event():
-    # trigger initialization
-    _ = app_state.config
-    _ = app_state.llm
-    _ = app_state.embedding_model
+async def startup_event():
+    # Warm up in a worker thread so the server accepts connections immediately
+    loop = asyncio.get_running_loop()
+    app.state.warmup_future = loop.run_in_executor(None, app_state.warm_up)
+    if app_state.config.index_dir:
+        # Indices written by the bulk ingester (backend/services/bulk_ingest.py)
+        app.state.index_load_future = loop.run_in_executor(None, load_index_dir, app_state.config.index_dir)
@@ -0,0 +1,346 @@
+"""
+Continuous batching scheduler for local causal LMs.
+
+Concurrent prompts share one decode loop: new requests are prefilled and
+merged into the running batch between decode steps, finished requests are
+retired from it, and every request still streams its own tokens.
+"""
+from typing import Iterator, List, Optional, Tuple
+import logging
+import queue
+import threading
+import time
+
+import torch
+from transformers import DynamicCache
+
+from backend.models.prefix_cache import PrefixCache, prefix_key, split_prompt
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Legacy cache layout: one (key, value) pair per layer, each [batch, heads, seq, head_dim]
+LegacyCache = List[Tuple[torch.Tensor, torch.Tensor]]
+
+_DONE = object()
+
+
+class GenerationRequest:
+    """One prompt in the batch; tokens are delivered through ``output``."""
+
+    def __init__(self, input_ids: List[int], max_new_tokens: int, temperature: float, prefix_len: int = 0):
+        self.input_ids = input_ids
+        # Leading tokens eligible for prefix KV-cache reuse (0 = none)
+        self.prefix_len = prefix_len
+        self.max_new_tokens = max_new_tokens
+        self.temperature = temperature
+        self.generated: List[int] = []
+        self.output: "queue.Queue" = queue.Queue()
+        self.cancelled = threading.Event()
+        self.submitted_at = time.perf_counter()
+        self._emitted_text = ""
+
+    def cancel(self):
+        self.cancelled.set()
+
+
+def _pad_left(cache: LegacyCache, mask: torch.Tensor, length: int) -> Tuple[LegacyCache, torch.Tensor]:
+    """Left-pad cache tensors and attention mask along the sequence dimension to ``length``."""
+    extra = length - mask.shape[1]
+    if extra <= 0:
+        return cache, mask
+    padded = []
+    for k, v in cache:
+        pad_shape = (k.shape[0], k.shape[1], extra, k.shape[3])
+        padded.append((
+            torch.cat([k.new_zeros(pad_shape), k], dim=2),
+            torch.cat([v.new_zeros(pad_shape), v], dim=2),
+        ))
+    return padded, torch.cat([mask.new_zeros((mask.shape[0], extra)), mask], dim=1)
+
+
+class BatchScheduler:
+    """
+    Runs a single decode loop in a background thread for all concurrent
+    requests to one model.
+
+    Per iteration the scheduler admits waiting requests (batched, left-padded
+    prefill merged into the running KV cache), runs one batched decode step,
+    streams each row's new text and retires rows that hit EOS, their token
+    budget or were cancelled.
+    """
+
+    def __init__(
+        self,
+        model,
+        tokenizer,
+        device: str,
+        max_batch_size: int = 8,
+        prefix_cache: Optional[PrefixCache] = None,
+        prefix_marker: str = "\nQ:",
+        min_prefix_tokens: int = 32,
+    ):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.device = device
+        self.max_batch_size = max_batch_size
+        self.eos_token_id = tokenizer.eos_token_id
+        self.pad_token_id = tokenizer.pad_token_id if tokenizer.pad_token_id is not None else (self.eos_token_id or 0)
+
+        self._waiting: "queue.Queue[GenerationRequest]" = queue.Queue()
+        self._rows: List[GenerationRequest] = []
+        self._cache: Optional[LegacyCache] = None
+        self._mask: Optional[torch.Tensor] = None        # [B, L]
+        self._next_tokens: Optional[torch.Tensor] = None  # [B, 1]
+
+        self.prefix_cache = prefix_cache
+        self.prefix_marker = prefix_marker
+        self.min_prefix_tokens = min_prefix_tokens
+
+        self.steps = 0
+        self.prefill_seconds = 0.0
+        self.prefill_tokens = 0
+        self._thread = threading.Thread(target=self._loop, name="local-batch-scheduler", daemon=True)
+        self._thread.start()
+
+    # -------------------------------------------------------------------------
+    # Public API
+    # -------------------------------------------------------------------------
+    def submit(self, prompt: str, max_new_tokens: int, temperature: float) -> GenerationRequest:
+        prefix_len = 0
+        if self.prefix_cache is not None:
+            # Tokenize prefix and question separately so the prefix ids are stable across questions
+            prefix_text, suffix_text = split_prompt(prompt, self.prefix_marker)
+            prefix_ids = self.tokenizer(prefix_text)["input_ids"] if prefix_text else []
+            suffix_ids = self.tokenizer(suffix_text, add_special_tokens=False)["input_ids"]
+            if len(prefix_ids) >= self.min_prefix_tokens and suffix_ids:
+                input_ids, prefix_len = prefix_ids + suffix_ids, len(prefix_ids)
+            else:
+                input_ids = self.tokenizer(prompt)["input_ids"]
+        else:
+            input_ids = self.tokenizer(prompt)["input_ids"]
+        request = GenerationRequest(input_ids, max_new_tokens, temperature, prefix_len=prefix_len)
+        self._waiting.put(request)
+        return request
+
+    def stream(self, request: GenerationRequest) -> Iterator[str]:
+        try:
+            while True:
+                item = request.output.get()
+                if item is _DONE:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            # Consumer went away (or finished): free the row at the next step
+            request.cancel()
+
+    @property
+    def batch_size(self) -> int:
+        return len(self._rows)
+
+    @property
+    def queue_length(self) -> int:
+        return self._waiting.qsize()
+
+    # -------------------------------------------------------------------------
+    # Scheduler loop
+    # -------------------------------------------------------------------------
+    def _loop(self):
+        while True:
+            try:
+                if not self._rows:
+                    # Idle: block until work arrives, then take whatever else is queued
+                    self._admit_waiting(first=self._waiting.get())
+                else:
+                    self._admit_waiting()
+                if self._rows:
+                    self._decode_step()
+            except Exception as e:
+                logger.exception("Batch scheduler step failed")
+                for request in self._rows:
+                    request.output.put(e)
+                    request.output.put(_DONE)
+                self._reset()
+
+    def _reset(self):
+        self._rows, self._cache, self._mask, self._next_tokens = [], None, None, None
+
+    def _admit_waiting(self, first: Optional[GenerationRequest] = None):
+        new = [first] if first is not None else []
+        while len(self._rows) + len(new) < self.max_batch_size:
+            try:
+                new.append(self._waiting.get_nowait())
+            except queue.Empty:
+                break
+        if new:
+            self._admit(new)
+
+    @torch.inference_mode()
+    def _admit(self, requests: List[GenerationRequest]):
+        live = []
+        for request in requests:
+            if request.cancelled.is_set():
+                # Cancelled while queued: end its stream without prefilling
+                request.output.put(_DONE)
+            else:
+                live.append(request)
+        if not live:
+            return
+        start = time.perf_counter()
+        plain = [r for r in live if not r.prefix_len]
+        groups = ([plain] if plain else []) + [[r] for r in live if r.prefix_len]
+        admitted = [r for group in groups for r in self._admit_group(group)]
+        self.prefill_seconds += time.perf_counter() - start
+        self.prefill_tokens += sum(len(r.input_ids) for r in admitted)
+        if admitted:
+            self._emit_and_retire(first_index=len(self._rows) - len(admitted))
+
+    def _admit_group(self, requests: List[GenerationRequest]) -> List[GenerationRequest]:
+        """
+        Prefill ``requests`` and merge them into the running batch; returns
+        those admitted. A prompt whose prefill fails (e.g. longer than the
+        model's context) gets the exception and ends; the others and the
+        running rows are unaffected.
+        """
+        try:
+            if requests[0].prefix_len:
+                self._merge(requests, *self._prefill_with_prefix(requests[0]))
+            else:
+                self._merge(requests, *self._prefill_batch(requests))
+            return requests
+        except Exception as e:
+            if len(requests) > 1:
+                # Isolate the failing prompt(s)
+                return [r for request in requests for r in self._admit_group([request])]
+            logger.warning(f"Prefill of a {len(requests[0].input_ids)}-token prompt failed: {e}")
+            requests[0].output.put(e)
+            requests[0].output.put(_DONE)
+            return []
+
+    def _prefill_batch(self, requests: List[GenerationRequest]):
+        """Left-padded prefill of several prompts in one forward pass."""
+        length = max(len(r.input_ids) for r in requests)
+        ids = torch.full((len(requests), length), self.pad_token_id, dtype=torch.long)
+        mask = torch.zeros((len(requests), length), dtype=torch.long)
+        for i, r in enumerate(requests):
+            ids[i, length - len(r.input_ids):] = torch.tensor(r.input_ids, dtype=torch.long)
+            mask[i, length - len(r.input_ids):] = 1
+        ids, mask = ids.to(self.device), mask.to(self.device)
+        position_ids = (mask.cumsum(-1) - 1).clamp(min=0)
+
+        out = self.model(input_ids=ids, attention_mask=mask, position_ids=position_ids, use_cache=True)
+        return out.past_key_values.to_legacy_cache(), mask, self._sample(out.logits[:, -1, :], requests)
+
+    def _prefill_with_prefix(self, request: GenerationRequest):
+        """Prefill one prompt, reusing (or populating) the KV cache of its prefix."""
+        prefix_ids = request.input_ids[:request.prefix_len]
+        key = prefix_key(prefix_ids)
+        prefix = self.prefix_cache.get(key, request.prefix_len)
+        if prefix is None:
+            out = self.model(input_ids=torch.tensor([prefix_ids], device=self.device), use_cache=True)
+            prefix = out.past_key_values.to_legacy_cache()
+            self.prefix_cache.put(key, prefix)
+
+        total = len(request.input_ids)
+        suffix = torch.tensor([request.input_ids[request.prefix_len:]], device=self.device)
+        mask = torch.ones((1, total), dtype=torch.long, device=self.device)
+        position_ids = torch.arange(request.prefix_len, total, device=self.device).unsqueeze(0)
+        # Extending a DynamicCache concatenates into new tensors, so the cached prefix stays intact
+        out = self.model(
+            input_ids=suffix,
+            attention_mask=mask,
+            position_ids=position_ids,
+            past_key_values=DynamicCache.from_legacy_cache(prefix),
+            use_cache=True,
+        )
+        return out.past_key_values.to_legacy_cache(), mask, self._sample(out.logits[:, -1, :], [request])
+
+    def _merge(self, requests: List[GenerationRequest], cache, mask: torch.Tensor, next_tokens: torch.Tensor):
+        """Append freshly prefilled rows to the running batch."""
+        if self._rows:
+            total = max(self._mask.shape[1], mask.shape[1])
+            old_cache, old_mask = _pad_left(self._cache, self._mask, total)
+            cache, mask = _pad_left(cache, mask, total)
+            cache = [
+                (torch.cat([ok, nk], dim=0), torch.cat([ov, nv], dim=0))
+                for (ok, ov), (nk, nv) in zip(old_cache, cache)
+            ]
+            mask = torch.cat([old_mask, mask], dim=0)
+            next_tokens = torch.cat([self._next_tokens, next_tokens], dim=0)
+        self._rows.extend(requests)
+        self._cache, self._mask, self._next_tokens = list(cache), mask, next_tokens
+
+    @torch.inference_mode()
+    def _decode_step(self):
+        mask = torch.cat([self._mask, self._mask.new_ones((self._mask.shape[0], 1))], dim=1)
+        position_ids = mask.sum(-1, keepdim=True) - 1
+        out = self.model(
+            input_ids=self._next_tokens,
+            attention_mask=mask,
+            position_ids=position_ids,
+            past_key_values=DynamicCache.from_legacy_cache(tuple(self._cache)),
+            use_cache=True,
+        )
+        self._cache = out.past_key_values.to_legacy_cache()
+        self._mask = mask
+        self._next_tokens = self._sample(out.logits[:, -1, :], self._rows)
+        self.steps += 1
+        self._emit_and_retire(first_index=0)
+
+    def _sample(self, logits: torch.Tensor, requests: List[GenerationRequest]) -> torch.Tensor:
+        temperatures = torch.tensor([r.temperature for r in requests], dtype=logits.dtype, device=logits.device)
+        greedy = logits.argmax(dim=-1)
+        sampled = greedy
+        if bool((temperatures > 0).any()):
+            probs = torch.softmax(logits / temperatures.clamp(min=1e-5).unsqueeze(-1), dim=-1)
+            sampled = torch.multinomial(probs, num_samples=1).squeeze(-1)
+        return torch.where(temperatures > 0, sampled, greedy).unsqueeze(-1)
+
+    def _emit_and_retire(self, first_index: int):
+        """Record each row's newest token, stream its text, and drop finished rows."""
+        tokens = self._next_tokens.squeeze(-1).tolist()
+        keep = []
+        for i, request in enumerate(self._rows):
+            if i >= first_index:
+                token = tokens[i]
+                finished = token == self.eos_token_id or request.cancelled.is_set()
+                if not finished:
+                    request.generated.append(token)
+                    self._emit_text(request)
+                    finished = len(request.generated) >= request.max_new_tokens
+            else:
+                finished = request.cancelled.is_set()
+            if finished:
+                request.output.put(_DONE)
+            else:
+                keep.append(i)
+        if len(keep) != len(self._rows):
+            self._retire(keep)
+
+    def _emit_text(self, request: GenerationRequest):
+        text = self.tokenizer.decode(request.generated, skip_special_tokens=True)
+        # Hold back incomplete multi-byte sequences until the next token completes them
+        if text.endswith("�"):
+            return
+        delta = text[len(request._emitted_text):]
+        if delta:
+            request._emitted_text = text
+            request.output.put(delta)
+
+    def _retire(self, keep: List[int]):
+        if not keep:
+            self._reset()
+            return
+        index = torch.tensor(keep, dtype=torch.long, device=self._mask.device)
+        self._rows = [self._rows[i] for i in keep]
+        self._cache = [(k.index_select(0, index), v.index_select(0, index)) for k, v in self._cache]
+        self._mask = self._mask.index_select(0, index)
+        self._next_tokens = self._next_tokens.index_select(0, index)
+        # Drop leading columns that are padding for every remaining row
+        live = self._mask.any(dim=0).nonzero()
+        start = int(live[0]) if len(live) else 0
+        if start:
+            self._mask = self._mask[:, start:]
+            self._cache = [(k[:, :, start:], v[:, :, start:]) for k, v in self._cache]
@@ -0,0 +1,360 @@
+"""
+Composite LLM backend with hedged requests and failover.
+
+Holds an ordered set of backends (e.g. Together, HF router, Ollama). A
+request goes to the currently preferred backend; if it has not produced a
+token within a percentile of its recent time-to-first-token, the same
+request is also sent to the next backend, and whichever streams first wins
+while the other is cancelled. Errors and per-backend TTFT deadlines fail
+over immediately. Backends report failures by raising or by yielding a
+``StreamError``; answer text is never inspected. A winner that goes quiet
+for longer than the token gap timeout is cancelled and counted as failed.
+Backends are re-ranked by their observed TTFT and failure rate.
+"""
+from backend.core.config import ChatBotEnvConfig
+from backend.core.cancellation import CancellationToken
+from backend.core.metrics import registry
+from backend.core.streaming import StreamError
+from collections import deque
+from typing import Iterator, List, Optional, Tuple
+import logging
+import queue
+import threading
+import time
+import numpy as np
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+HEDGED_REQUESTS = registry.counter(
+    "pdfchat_llm_hedged_total",
+    "Hedged requests fired to a backup backend, by backup backend.",
+    labelnames=("backend",),
+)
+HEDGE_WINS = registry.counter(
+    "pdfchat_llm_backend_wins_total",
+    "Requests answered by each backend of the hedged composite.",
+    labelnames=("backend",),
+)
+BACKEND_FAILURES = registry.counter(
+    "pdfchat_llm_backend_failures_total",
+    "Backend attempts that failed inside the hedged composite.",
+    labelnames=("backend", "reason"),
+)
+
+_END = object()
+
+
+class BackendStats:
+    """Recent first-token latencies and failure rate of one backend."""
+
+    def __init__(self, window: int = 200):
+        self.ttft = deque(maxlen=window)
+        self.failure_rate = 0.0  # exponential moving average of failures
+        self.requests = 0
+        self.wins = 0
+        self.failures = 0
+
+    def observe(self, seconds: float):
+        self.ttft.append(seconds)
+        self.failure_rate *= 0.9
+
+    def fail(self):
+        self.failures += 1
+        self.failure_rate = 0.9 * self.failure_rate + 0.1
+
+    def percentile(self, q: float) -> Optional[float]:
+        return float(np.percentile(np.fromiter(self.ttft, dtype=np.float64), q)) if self.ttft else None
+
+
+class _Backend:
+    def __init__(self, name: str, model, deadline_s: float):
+        self.name = name
+        self.model = model
+        self.deadline_s = deadline_s
+        self.stats = BackendStats()
+
+
+class _Attempt:
+    """One backend working on the request, pushing (index, item) onto a shared queue."""
+
+    def __init__(self, index: int, backend: _Backend):
+        self.index = index
+        self.backend = backend
+        self.token = CancellationToken()
+        self.started = time.perf_counter()
+        self.done = False
+
+    def start_stream(self, prompt: str, out: queue.Queue):
+        def run():
+            try:
+                for chunk in self.backend.model.generate_stream(prompt, cancel=self.token):
+                    out.put((self.index, chunk))
+            except Exception as e:
+                out.put((self.index, e))
+            finally:
+                out.put((self.index, _END))
+
+        threading.Thread(target=run, name=f"hedge-{self.backend.name}", daemon=True).start()
+
+    def start_call(self, prompt: str, out: queue.Queue):
+        def run():
+            try:
+                out.put((self.index, self.backend.model.generate(prompt)))
+            except Exception as e:
+                out.put((self.index, e))
+
+        threading.Thread(target=run, name=f"hedge-{self.backend.name}", daemon=True).start()
+
+
+def parse_backend_spec(spec: str, default_deadline_s: float) -> List[Tuple[str, Optional[str], float]]:
+    """
+    Parse HEDGE_BACKENDS: comma-separated ``kind[:model_id][@deadline_s]``,
+    e.g. ``together:meta-llama/Llama-3-8b-chat-hf@10,hf_api,ollama:llama3@30``.
+    """
+    backends = []
+    for item in filter(None, (s.strip() for s in spec.split(","))):
+        deadline = default_deadline_s
+        if "@" in item:
+            item, raw = item.rsplit("@", 1)
+            deadline = float(raw)
+        kind, _, model_id = item.partition(":")
+        backends.append((kind.strip(), model_id.strip() or None, deadline))
+    return backends
+
+
+class HedgedModel:
+    """
+    LLM wrapper over several backends with hedging and failover.
+
+    Config:
+        hedge_backends       backend spec, see ``parse_backend_spec``
+        hedge_ttft_deadline_s  give up on a backend with no token by then
+        hedge_percentile     hedge once the primary is slower than this TTFT percentile
+        hedge_default_delay_s  hedge delay until a backend has ``hedge_min_samples`` samples
+        hedge_token_gap_s    give up on the streaming winner after this long without a token
+    """
+
+    def __init__(self, config: ChatBotEnvConfig, backends: Optional[List[_Backend]] = None):
+        self.config = config
+        self.percentile = config.hedge_percentile
+        self.default_delay_s = config.hedge_default_delay_s
+        self.min_samples = config.hedge_min_samples
+        self.token_gap_s = config.hedge_token_gap_s
+        self._lock = threading.Lock()
+        if backends is None:
+            backends = self._create_backends(config)
+        if not backends:
+            raise ValueError("HedgedModel needs at least one backend (HEDGE_BACKENDS)")
+        self.backends = backends
+        logger.info(f"Hedged backend order: {[b.name for b in self.backends]}")
+
+    @staticmethod
+    def _create_backends(config: ChatBotEnvConfig) -> List[_Backend]:
+        from backend.models.model_factory import load_backend_class
+
+        backends = []
+        for kind, model_id, deadline in parse_backend_spec(config.hedge_backends, config.hedge_ttft_deadline_s):
+            sub_config = config.model_copy(update={"model_id": model_id}) if model_id else config
+            try:
+                model = load_backend_class(kind)(sub_config)
+            except Exception as e:
+                logger.error(f"Skipping hedged backend {kind}: {e}")
+                continue
+            backends.append(_Backend(f"{kind}:{sub_config.model_id}", model, deadline))
+        return backends
+
+    def warm_up(self):
+        for backend in self.backends:
+            warm_up = getattr(backend.model, "warm_up", None)
+            if warm_up is None:
+                continue
+            try:
+                warm_up()
+            except Exception as e:
+                logger.warning(f"Warm-up failed for {backend.name}: {e}")
+
+    # -------------------------------------------------------------------------
+    # Ranking
+    # -------------------------------------------------------------------------
+    def _score(self, backend: _Backend) -> float:
+        """Median TTFT plus a failure penalty; lower is preferred."""
+        # Backends without enough samples sort first (in configured order) so they get measured
+        base = backend.stats.percentile(50) if len(backend.stats.ttft) >= self.min_samples else 0.0
+        return base + backend.stats.failure_rate * backend.deadline_s
+
+    def _ordered(self) -> List[_Backend]:
+        with self._lock:
+            return sorted(self.backends, key=self._score)
+
+    def _hedge_delay(self, backend: _Backend) -> float:
+        with self._lock:
+            if len(backend.stats.ttft) < self.min_samples:
+                delay = self.default_delay_s
+            else:
+                delay = backend.stats.percentile(self.percentile)
+        return min(delay, backend.deadline_s)
+
+    def _fail(self, attempt: _Attempt, reason: str):
+        attempt.done = True
+        attempt.token.cancel()
+        with self._lock:
+            attempt.backend.stats.fail()
+        BACKEND_FAILURES.inc(backend=attempt.backend.name, reason=reason)
+        logger.warning(f"Backend {attempt.backend.name} failed ({reason})")
+
+    def stats(self) -> List[dict]:
+        with self._lock:
+            return [
+                {
+                    "backend": b.name,
+                    "score": round(self._score(b), 4),
+                    "requests": b.stats.requests,
+                    "wins": b.stats.wins,
+                    "failures": b.stats.failures,
+                    "failure_rate": round(b.stats.failure_rate, 4),
+                    "ttft_p50_s": b.stats.percentile(50),
+                    f"ttft_p{self.percentile:g}_s": b.stats.percentile(self.percentile),
+                    "deadline_s": b.deadline_s,
+                }
+                for b in sorted(self.backends, key=self._score)
+            ]
+
+    # -------------------------------------------------------------------------
+    # Race
+    # -------------------------------------------------------------------------
+    def _race(self, prompt: str, stream: bool, cancel: Optional[CancellationToken]):
+        """
+        Run attempts until one produces its first token (or result).
+        Returns (winning attempt, first item, queue, attempts); winner is None if all failed.
+        """
+        order = self._ordered()
+        out: queue.Queue = queue.Queue()
+        attempts: List[_Attempt] = []
+
+        def launch():
+            attempt = _Attempt(len(attempts), order[len(attempts)])
+            attempts.append(attempt)
+            with self._lock:
+                attempt.backend.stats.requests += 1
+            if len(attempts) > 1:
+                HEDGED_REQUESTS.inc(backend=attempt.backend.name)
+                logger.info(f"Hedging request to {attempt.backend.name}")
+            (attempt.start_stream if stream else attempt.start_call)(prompt, out)
+
+        unregister = cancel.add_callback(lambda: [a.token.cancel() for a in list(attempts)]) if cancel else None
+        launch()
+        try:
+            while True:
+                if cancel is not None and cancel.cancelled:
+                    return None, None, out, attempts
+                now = time.perf_counter()
+                for a in attempts:
+                    if not a.done and now - a.started >= a.backend.deadline_s:
+                        self._fail(a, "deadline")
+                live = [a for a in attempts if not a.done]
+
+                wake_at = [a.started + a.backend.deadline_s for a in live]
+                if len(attempts) < len(order):
+                    last = attempts[-1]
+                    # Hedge after the newest attempt's delay, or at once if it already failed
+                    hedge_at = now if last.done else last.started + self._hedge_delay(last.backend)
+                    if now >= hedge_at:
+                        launch()
+                        continue
+                    wake_at.append(hedge_at)
+                elif not live:
+                    return None, None, out, attempts
+
+                try:
+                    index, item = out.get(timeout=max(min(wake_at) - now, 0.001))
+                except queue.Empty:
+                    continue
+                attempt = attempts[index]
+                if attempt.done:
+                    continue  # late output from a failed attempt
+                if item is _END:
+                    self._fail(attempt, "empty")
+                elif isinstance(item, BaseException):
+                    self._fail(attempt, type(item).__name__)
+                elif item is None or isinstance(item, StreamError):
+                    self._fail(attempt, "error")
+                elif item:
+                    return attempt, item, out, attempts
+        finally:
+            if unregister is not None:
+                unregister()
+
+    def _settle(self, winner: _Attempt, attempts: List[_Attempt]):
+        """Cancel the losers and record latencies."""
+        now = time.perf_counter()
+        with self._lock:
+            winner.backend.stats.observe(now - winner.started)
+            winner.backend.stats.wins += 1
+            for a in attempts:
+                if a is not winner and not a.done:
+                    # Censored sample: the loser was at least this slow
+                    a.backend.stats.observe(now - a.started)
+        for a in attempts:
+            if a is not winner:
+                a.done = True
+                a.token.cancel()
+        HEDGE_WINS.inc(backend=winner.backend.name)
+
+    # -------------------------------------------------------------------------
+    # Generation
+    # -------------------------------------------------------------------------
+    def generate(self, prompt: str) -> Optional[str]:
+        """
+        Non-streaming text generation (returns full response).
+        A losing backend's call cannot be interrupted; its result is discarded.
+        """
+        winner, result, _, attempts = self._race(prompt, stream=False, cancel=None)
+        if winner is None:
+            logger.error("All hedged backends failed")
+            return None
+        self._settle(winner, attempts)
+        return result
+
+    def generate_stream(self, prompt: str, cancel: Optional[CancellationToken] = None) -> Iterator[str]:
+        """
+        Streaming text generation (yields chunks as they arrive).
+        Only the first backend to produce a token is streamed; the others are cancelled.
+        Tokens already sent cannot be taken back, so a winner that stalls for
+        ``hedge_token_gap_s`` ends the stream with an error instead of failing over.
+        """
+        winner, first, out, attempts = self._race(prompt, stream=True, cancel=cancel)
+        try:
+            if winner is None:
+                if cancel is None or not cancel.cancelled:
+                    logger.error("All hedged backends failed")
+                    yield StreamError("\nError: all LLM backends failed")
+                return
+            self._settle(winner, attempts)
+            unregister = cancel.add_callback(winner.token.cancel) if cancel else None
+            try:
+                yield first
+                last_token = time.perf_counter()
+                while True:
+                    try:
+                        index, item = out.get(timeout=max(last_token + self.token_gap_s - time.perf_counter(), 0.001))
+                    except queue.Empty:
+                        self._fail(winner, "stall")
+                        yield StreamError(f"\nError: {winner.backend.name} stalled for {self.token_gap_s:g}s")
+                        break
+                    if index != winner.index:
+                        continue
+                    last_token = time.perf_counter()
+                    if item is _END:
+                        break
+                    if isinstance(item, BaseException):
+                        logger.error(f"Backend {winner.backend.name} failed mid-stream: {item}")
+                        yield StreamError(f"\nError: Streaming failed - {item}")
+                        break
+                    yield item
+            finally:
+                if unregister is not None:
+                    unregister()
+        finally:
+            for a in attempts:
+                a.token.cancel()
@@ -1,4 +1,6 @@
 from backend.core.config import ChatBotEnvConfig
+from backend.core.cancellation import CancellationToken
+from backend.core.streaming import StreamError
 from typing import Iterator, Optional
 import logging
 import requests
@@ -61,9 +63,11 @@ class HugginFaceModel:
             logger.error(f"Non-streaming request failed: {e}")
             return None
 
-    def generate_stream(self, prompt: str) -> Iterator[str]:
+    def generate_stream(self, prompt: str, cancel: Optional[CancellationToken] = None) -> Iterator[str]:
         """
         Streaming text generation (yields chunks as they arrive).
+        Once ``cancel`` fires the HTTP response is closed, which unblocks
+        the SSE read and drops the router connection.
         Uses Server-Sent Events (SSE) format.
         """
         try:
@@ -90,9 +94,14 @@ class HugginFaceModel:
                 timeout=120
             )
             response.raise_for_status()
+            if cancel is not None:
+                # Closing the connection unblocks iter_lines and stops the upstream generation
+                cancel.add_callback(response.close)
             
             # Parse SSE format
             for line in response.iter_lines():
+                if cancel is not None and cancel.cancelled:
+                    break
                 if not line:
                     continue
                 
@@ -134,5 +143,8 @@ class HugginFaceModel:
                     continue
 
         except Exception as e:
+            if cancel is not None and cancel.cancelled:
+                logger.info("Streaming request cancelled")
+                return
             logger.error(f"Streaming request failed: {e}")
-            yield f"\nError: Streaming failed - {e}"
\ No newline at end of file
+            yield StreamError(f"\nError: Streaming failed - {e}")
\ No newline at end of file
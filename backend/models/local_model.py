@@ -3,6 +3,8 @@ Local LLM model implementation using transformers library.
 Much faster than API calls - runs inference locally.
 """
 from backend.core.config import ChatBotEnvConfig
+from backend.core.cancellation import CancellationToken
+from backend.core.streaming import StreamError
 from typing import Iterator, Optional
 import logging
 import torch
@@ -25,7 +27,52 @@ class LocalModel:
         self.model = None
         self.tokenizer = None
         self.pipeline = None
+        self.scheduler = None
+        self._configure_threads()
         self._load_model()
+        if config.local_batching:
+            from backend.models.batch_scheduler import BatchScheduler
+            from backend.models.prefix_cache import PrefixCache
+            prefix_cache = (
+                PrefixCache(config.local_prefix_cache_mb * 2**20) if config.local_prefix_cache_mb else None
+            )
+            self.scheduler = BatchScheduler(
+                self.model,
+                self.tokenizer,
+                self.device,
+                max_batch_size=config.local_max_batch_size,
+                prefix_cache=prefix_cache,
+            )
+            logger.info(f"Continuous batching enabled (max batch size {config.local_max_batch_size})")
+
+    def _configure_threads(self):
+        """Pin torch's thread pools (process-wide) when configured."""
+        if self.config.local_threads:
+            torch.set_num_threads(self.config.local_threads)
+        if self.config.local_interop_threads:
+            try:
+                torch.set_num_interop_threads(self.config.local_interop_threads)
+            except RuntimeError as e:
+                # Only allowed before the first inter-op parallel work in the process
+                logger.warning(f"Could not set inter-op threads: {e}")
+        logger.info(f"torch threads: intra-op={torch.get_num_threads()}, inter-op={torch.get_num_interop_threads()}")
+
+    @staticmethod
+    def _quantize_int8(model):
+        """Dynamic int8 quantization of nn.Linear layers (weights int8, activations quantized per batch)."""
+        n_linear = sum(isinstance(m, torch.nn.Linear) for m in model.modules())
+        # In place: a copy would keep the float32 weights resident next to the int8 ones
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+        # Remaining float tensors (embeddings, norms) may still view the memory-mapped
+        # checkpoint, whose pages quantization just read in; copy them so it is unmapped
+        for tensor in list(model.parameters()) + list(model.buffers()):
+            tensor.data = tensor.data.clone()
+        gc.collect()
+        if n_linear <= 1:
+            # e.g. GPT-2 style Conv1D projections, which dynamic quantization does not cover
+            logger.warning("Model has almost no nn.Linear layers; int8 mode will save little")
+        logger.info(f"Quantized {n_linear} linear layers to int8")
+        return model
 
     def _load_model(self):
         """Load the model and tokenizer."""
@@ -49,6 +96,9 @@ class LocalModel:
             
             if self.device == "cpu":
                 self.model = self.model.to(self.device)
+                if self.config.local_cpu_mode == "int8":
+                    self.model = self._quantize_int8(self.model)
+            self.model.eval()
             
             # Create pipeline for easier generation
             self.pipeline = pipeline(
@@ -65,22 +115,39 @@ class LocalModel:
             logger.error(f"Failed to load local model: {e}")
             raise
 
+    def warm_up(self):
+        """Run a one-token generation so kernels and caches are initialised."""
+        inputs = self.tokenizer("Hello", return_tensors="pt").to(self.device)
+        with torch.inference_mode():
+            self.model.generate(
+                **inputs,
+                max_new_tokens=1,
+                do_sample=False,
+                pad_token_id=self.tokenizer.eos_token_id
+            )
+        logger.info("Local model warm-up complete")
+
     def generate(self, prompt: str) -> Optional[str]:
         """
         Non-streaming text generation (returns full response).
         """
         try:
             logger.info(f"Generating response locally (non-stream): model={self.config.model_id}")
+
+            if self.scheduler is not None:
+                request = self.scheduler.submit(prompt, self.config.max_tokens, self.config.temperature)
+                return "".join(self.scheduler.stream(request)).strip()
             
             # Use pipeline for generation
-            outputs = self.pipeline(
-                prompt,
-                max_new_tokens=self.config.max_tokens,
-                temperature=self.config.temperature,
-                do_sample=True,
-                return_full_text=False,
-                pad_token_id=self.tokenizer.eos_token_id
-            )
+            with torch.inference_mode():
+                outputs = self.pipeline(
+                    prompt,
+                    max_new_tokens=self.config.max_tokens,
+                    temperature=self.config.temperature,
+                    do_sample=True,
+                    return_full_text=False,
+                    pad_token_id=self.tokenizer.eos_token_id
+                )
             
             response = outputs[0]["generated_text"].strip()
             return response
@@ -89,16 +156,34 @@ class LocalModel:
             logger.error(f"Local generation failed: {e}")
             return None
 
-    def generate_stream(self, prompt: str) -> Iterator[str]:
+    def generate_stream(self, prompt: str, cancel: Optional[CancellationToken] = None) -> Iterator[str]:
         """
         Streaming text generation (yields chunks as they arrive).
-        Uses TextIteratorStreamer for proper streaming.
+        Uses TextIteratorStreamer for proper streaming. Decoding stops at the
+        next step once ``cancel`` fires.
         """
         try:
             logger.info(f"Generating response locally (streaming): model={self.config.model_id}")
+
+            if self.scheduler is not None:
+                # Shared decode loop with every other in-flight request
+                request = self.scheduler.submit(prompt, self.config.max_tokens, self.config.temperature)
+                # Retires the request from the batch at the next decode step (or
+                # ends it at admission if it is still queued)
+                unregister = cancel.add_callback(request.cancel) if cancel is not None else None
+                try:
+                    yield from self.scheduler.stream(request)
+                finally:
+                    if unregister is not None:
+                        unregister()
+                return
             
-            from transformers import TextIteratorStreamer
+            from transformers import StoppingCriteria, StoppingCriteriaList, TextIteratorStreamer
             from threading import Thread
+
+            class _Cancelled(StoppingCriteria):
+                def __call__(self, input_ids, scores, **kwargs):
+                    return cancel is not None and cancel.cancelled
             
             # Tokenize input
             inputs = self.tokenizer(prompt, return_tensors="pt").to(self.device)
@@ -117,19 +202,27 @@ class LocalModel:
                 "temperature": self.config.temperature,
                 "do_sample": True,
                 "pad_token_id": self.tokenizer.eos_token_id,
-                "streamer": streamer
+                "streamer": streamer,
+                "stopping_criteria": StoppingCriteriaList([_Cancelled()]),
             }
             
-            thread = Thread(target=self.model.generate, kwargs=generation_kwargs)
+            def run_generate():
+                # inference_mode is thread-local, so enter it in the generation thread
+                with torch.inference_mode():
+                    self.model.generate(**generation_kwargs)
+
+            thread = Thread(target=run_generate)
             thread.start()
             
             # Yield tokens as they arrive
             for token in streamer:
+                if cancel is not None and cancel.cancelled:
+                    break
                 yield token
                 
         except Exception as e:
             logger.error(f"Local streaming generation failed: {e}")
-            yield f"\nError: Local generation failed - {e}"
+            yield StreamError(f"\nError: Local generation failed - {e}")
 
     def __del__(self):
         """Cleanup model from memory."""
@@ -0,0 +1,68 @@
+"""
+Mock LLM backend for offline load testing.
+Emits canned tokens at a configurable time-to-first-token and token rate,
+so the rest of the pipeline can be exercised without any model or API.
+"""
+from backend.core.config import ChatBotEnvConfig
+from backend.core.cancellation import CancellationToken
+from typing import Iterator, Optional
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+_WORDS = (
+    "Based on the provided context the document states that the agreement "
+    "takes effect on the stated date and remains in force for the initial term"
+).split()
+
+
+class MockModel:
+    """
+    LLM wrapper that fakes generation.
+
+    Environment:
+        MOCK_TTFT_MS            delay before the first token (default 200)
+        MOCK_TOKENS_PER_SECOND  token rate after the first token (default 50)
+        MOCK_OUTPUT_TOKENS      tokens per answer (default: config.max_tokens, capped at 128)
+    """
+
+    def __init__(self, config: ChatBotEnvConfig):
+        self.config = config
+        self.ttft_s = float(os.getenv("MOCK_TTFT_MS", 200)) / 1000.0
+        self.tokens_per_second = float(os.getenv("MOCK_TOKENS_PER_SECOND", 50))
+        if self.tokens_per_second <= 0:
+            raise ValueError(f"MOCK_TOKENS_PER_SECOND must be > 0, got {self.tokens_per_second}")
+        self.output_tokens = int(os.getenv("MOCK_OUTPUT_TOKENS", min(config.max_tokens, 128)))
+        logger.info(
+            f"Mock model: ttft={self.ttft_s * 1000:.0f}ms, rate={self.tokens_per_second} tok/s, "
+            f"tokens={self.output_tokens}"
+        )
+
+    def _tokens(self):
+        for i in range(self.output_tokens):
+            yield _WORDS[i % len(_WORDS)] + " "
+
+    def generate(self, prompt: str) -> Optional[str]:
+        """
+        Non-streaming text generation (returns full response).
+        """
+        time.sleep(self.ttft_s + max(self.output_tokens - 1, 0) / self.tokens_per_second)
+        return "".join(self._tokens()).strip()
+
+    def generate_stream(self, prompt: str, cancel: Optional[CancellationToken] = None) -> Iterator[str]:
+        """
+        Streaming text generation (yields chunks as they arrive).
+        Returns at the next token boundary (or during the simulated TTFT)
+        once ``cancel`` fires.
+        """
+        cancel = cancel or CancellationToken()
+        interval = 1.0 / self.tokens_per_second
+        if cancel.wait(self.ttft_s):
+            return
+        for i, token in enumerate(self._tokens()):
+            if i and cancel.wait(interval):
+                return
+            yield token
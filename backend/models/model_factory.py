@@ -1,18 +1,35 @@
 """
 Model factory to create the appropriate LLM model based on configuration.
-Supports: HuggingFace API, Local Transformers, Ollama
+Supports: HuggingFace API, Local Transformers, Ollama, and a hedged
+composite of several of them
+
+Backend modules are imported only when selected, so e.g. the HF API backend
+never pays for importing torch/transformers or the Together SDK.
 """
 from backend.core.config import ChatBotEnvConfig
-from backend.models.hugginface_model import HugginFaceModel
-from backend.models.local_model import LocalModel
-from backend.models.ollama_model import OllamaModel
-from backend.models.together_model import TogetherModel
 
+import importlib
 import logging
 import os
 
 logger = logging.getLogger(__name__)
 
+# model kind -> (module, class name)
+_BACKENDS = {
+    "hf_api": ("backend.models.hugginface_model", "HugginFaceModel"),
+    "local": ("backend.models.local_model", "LocalModel"),
+    "together": ("backend.models.together_model", "TogetherModel"),
+    "ollama": ("backend.models.ollama_model", "OllamaModel"),
+    "mock": ("backend.models.mock_model", "MockModel"),
+    "hedged": ("backend.models.hedged_model", "HedgedModel"),
+}
+
+
+def load_backend_class(kind: str):
+    """Import and return the model class for ``kind`` (a key of ``_BACKENDS``)."""
+    module_name, class_name = _BACKENDS[kind]
+    return getattr(importlib.import_module(module_name), class_name)
+
 
 class ModelFactory:
     """Factory to create LLM models based on configuration."""
@@ -26,6 +43,8 @@ class ModelFactory:
         - "api" or "hf_api": HuggingFace Inference API (default, slower, requires API key)
         - "local" or "transformers": Local model using transformers (faster, requires GPU/CPU)
         - "ollama": Ollama local server (fastest setup, requires Ollama installed)
+        - "mock": Canned tokens at a configurable rate, for offline load tests
+        - "hedged": Several of the above (HEDGE_BACKENDS) with hedged requests and failover
         
         Returns:
             Model instance (HugginFaceModel, LocalModel, or OllamaModel)
@@ -34,37 +53,45 @@ class ModelFactory:
         
         if model_type in ["api", "hf_api", "huggingface_api"]:
             logger.info("Using HuggingFace Inference API")
-            return HugginFaceModel(config)
+            return load_backend_class("hf_api")(config)
         
         elif model_type in ["local", "transformers", "local_transformers"]:
             logger.info("Using local transformers model")
             try:
-                return LocalModel(config)
+                return load_backend_class("local")(config)
             except Exception as e:
                 logger.error(f"Failed to load local model: {e}")
                 logger.warning("Falling back to HuggingFace API")
-                return HugginFaceModel(config)
+                return load_backend_class("hf_api")(config)
         
         elif model_type in ['together']:
             logger.info("Using Together api model")
             try:
-                return TogetherModel(config)
+                return load_backend_class("together")(config)
             except Exception as e:
                 logger.error(f"Failed to load local model: {e}")
                 logger.warning("Falling back to HuggingFace API")
-                return HugginFaceModel(config)
+                return load_backend_class("hf_api")(config)
 
         
         elif model_type == "ollama":
             logger.info("Using Ollama local server")
             try:
-                return OllamaModel(config)
+                return load_backend_class("ollama")(config)
             except Exception as e:
                 logger.error(f"Failed to connect to Ollama: {e}")
                 logger.warning("Falling back to HuggingFace API")
-                return HugginFaceModel(config)
+                return load_backend_class("hf_api")(config)
+        
+        elif model_type == "hedged":
+            logger.info(f"Using hedged backends: {config.hedge_backends}")
+            return load_backend_class("hedged")(config)
+        
+        elif model_type == "mock":
+            logger.info("Using mock model (load testing)")
+            return load_backend_class("mock")(config)
         
         else:
             logger.warning(f"Unknown MODEL_TYPE: {model_type}, using HuggingFace API")
-            return HugginFaceModel(config)
+            return load_backend_class("hf_api")(config)
 
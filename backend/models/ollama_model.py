@@ -3,6 +3,8 @@ Ollama model implementation - lightweight local inference.
 Ollama is easier to set up and faster than full transformers.
 """
 from backend.core.config import ChatBotEnvConfig
+from backend.core.cancellation import CancellationToken
+from backend.core.streaming import StreamError
 from typing import Iterator, Optional
 import logging
 import requests
@@ -34,6 +36,16 @@ class OllamaModel:
             logger.warning(f"Ollama server not reachable at {self.base_url}: {e}")
             logger.warning("Make sure Ollama is installed and running: https://ollama.ai")
 
+    def warm_up(self):
+        """Ask Ollama to load the model into memory (empty prompt, no tokens)."""
+        response = requests.post(
+            f"{self.base_url}/api/generate",
+            json={"model": self.model_name, "prompt": "", "stream": False},
+            timeout=120
+        )
+        response.raise_for_status()
+        logger.info(f"Ollama model {self.model_name} loaded")
+
     def generate(self, prompt: str) -> Optional[str]:
         """
         Non-streaming text generation (returns full response).
@@ -62,9 +74,11 @@ class OllamaModel:
             logger.error(f"Ollama generation failed: {e}")
             return None
 
-    def generate_stream(self, prompt: str) -> Iterator[str]:
+    def generate_stream(self, prompt: str, cancel: Optional[CancellationToken] = None) -> Iterator[str]:
         """
         Streaming text generation (yields chunks as they arrive).
+        Once ``cancel`` fires the HTTP response is closed; Ollama aborts a
+        generation whose client has disconnected.
         """
         try:
             logger.info(f"Generating response via Ollama (streaming): model={self.model_name}")
@@ -84,8 +98,13 @@ class OllamaModel:
                 timeout=120
             )
             response.raise_for_status()
+            if cancel is not None:
+                # Closing the connection makes Ollama abort the generation
+                cancel.add_callback(response.close)
             
             for line in response.iter_lines():
+                if cancel is not None and cancel.cancelled:
+                    break
                 if line:
                     try:
                         data = json.loads(line)
@@ -96,6 +115,9 @@ class OllamaModel:
                         continue
                         
         except Exception as e:
+            if cancel is not None and cancel.cancelled:
+                logger.info("Ollama streaming generation cancelled")
+                return
             logger.error(f"Ollama streaming generation failed: {e}")
-            yield f"\nError: Ollama generation failed - {e}"
+            yield StreamError(f"\nError: Ollama generation failed - {e}")
 
@@ -0,0 +1,86 @@
+"""
+Bounded LRU cache of KV states for prompt prefixes.
+
+build_optimized_prompt puts the instruction and retrieved context first and
+the question last, so follow-up questions about the same context share a
+token prefix whose past_key_values can be reused instead of re-encoded.
+"""
+from collections import OrderedDict
+from typing import Optional, Sequence, Tuple
+import hashlib
+import logging
+import threading
+
+import torch
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+LegacyCache = Tuple[Tuple[torch.Tensor, torch.Tensor], ...]
+
+
+def prefix_key(token_ids: Sequence[int]) -> str:
+    data = b"".join(int(t).to_bytes(4, "little", signed=False) for t in token_ids)
+    return hashlib.sha1(data).hexdigest()
+
+
+def split_prompt(prompt: str, marker: str) -> Tuple[str, str]:
+    """Split ``prompt`` before the last ``marker`` into (reusable prefix, question suffix)."""
+    idx = prompt.rfind(marker)
+    if idx <= 0:
+        return "", prompt
+    return prompt[:idx], prompt[idx:]
+
+
+class PrefixCache:
+    """
+    LRU of prefix hash -> KV cache (batch size 1), bounded by total tensor
+    bytes. Entries are treated as immutable: the model builds new
+    tensors when extending a cache, so hits can be shared without copying.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[LegacyCache, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.tokens_reused = 0
+
+    @staticmethod
+    def _nbytes(cache: LegacyCache) -> int:
+        return sum(k.numel() * k.element_size() + v.numel() * v.element_size() for k, v in cache)
+
+    def get(self, key: str, n_tokens: int) -> Optional[LegacyCache]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.tokens_reused += n_tokens
+            return entry[0]
+
+    def put(self, key: str, cache: LegacyCache):
+        nbytes = self._nbytes(cache)
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = (cache, nbytes)
+            self._bytes += nbytes
+            while self._bytes > self.max_bytes and self._entries:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "tokens_reused": self.tokens_reused,
+        }
@@ -1,5 +1,7 @@
 from together import Together
 from backend.core.config import ChatBotEnvConfig
+from backend.core.cancellation import CancellationToken
+from backend.core.streaming import StreamError
 from typing import Iterator, Optional
 import logging
 import os
@@ -36,9 +38,11 @@ class TogetherModel:
             logger.error(f"Non-streaming request failed: {e}")
             return None
 
-    def generate_stream(self, prompt: str) -> Iterator[str]:
+    def generate_stream(self, prompt: str, cancel: Optional[CancellationToken] = None) -> Iterator[str]:
         """
         Streaming text generation (yields chunks as they arrive).
+        Once ``cancel`` fires the SDK stream is closed (unblocking a wait for
+        the next chunk) and iteration stops.
         """
         try:
             logger.info(f"Sending prompt to Together (streaming): model={self.config.model_id}")
@@ -49,13 +53,32 @@ class TogetherModel:
                 temperature=self.config.temperature,
                 stream=True
             )
+            unregister = None
+            if cancel is not None:
+                # Closing the connection unblocks the iterator while it waits for the next chunk
+                # (newer SDKs wrap the HTTP response, older ones return a closeable iterator)
+                close = getattr(getattr(stream, "response", None), "close", None) or getattr(stream, "close", None)
+                if close is not None:
+                    unregister = cancel.add_callback(close)
 
-            for chunk in stream:
-                if not chunk.choices:
-                    continue  # skip if empty or missing choices
-                delta = chunk.choices[0].delta.content or ""
-                yield delta
+            try:
+                for chunk in stream:
+                    if cancel is not None and cancel.cancelled:
+                        break
+                    if not chunk.choices:
+                        continue  # skip if empty or missing choices
+                    delta = chunk.choices[0].delta.content or ""
+                    yield delta
+            finally:
+                if unregister is not None:
+                    unregister()
+                close_stream = getattr(stream, "close", None)
+                if close_stream is not None:
+                    close_stream()
 
         except Exception as e:
+            if cancel is not None and cancel.cancelled:
+                logger.info("Streaming request cancelled")
+                return
             logger.error(f"Streaming request failed: {e}")
-            yield f"\nError: Streaming failed - {e}"
\ No newline at end of file
+            yield StreamError(f"\nError: Streaming failed - {e}")
\ No newline at end of file
@@ -0,0 +1,277 @@
+# backend/services/bulk_ingest.py
+"""
+Offline bulk ingestion of a directory of PDFs.
+
+Extraction and chunking run in worker processes; the main process embeds
+chunks from many documents at once in large batches with the configured
+embedding model and writes one entry per document in the ingest cache
+format (see backend/services/ingest_cache.py):
+
+    <out>/docs/<ingest key>/{vectors.npy,chunks.bin,chunk_spans.npy,meta.json}
+    <out>/indices/<key>/...          with --combined <key>
+    <out>/manifest.jsonl             one line per processed document
+
+Documents whose entry already exists are skipped, so an interrupted run is
+resumed by running the same command again. Point the backend at the output
+with INDEX_DIR=<out>: uploads of an ingested PDF bind to its entry by
+content hash, and combined indices are loaded at startup under their key.
+
+    python -m backend.services.bulk_ingest ./pdfs --out ./index --workers 4 --combined corpus
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import logging
+
+from backend.core.hashing import file_sha256
+from backend.services.chunk_metadata import ChunkMetadata, page_numbers, section_numbers
+from backend.services.chunk_store import CompactChunks, as_compact
+from backend.services.ingest_cache import ingest_key, load_store, save_store
+
+logger = logging.getLogger("services.bulk_ingest")
+
+
+def find_pdfs(root: str) -> List[str]:
+    paths = []
+    for dirpath, _, filenames in os.walk(root):
+        paths.extend(os.path.join(dirpath, f) for f in filenames if f.lower().endswith(".pdf"))
+    return sorted(paths)
+
+
+def extract_text(path: str) -> Tuple[str, List[int]]:
+    """
+    Same extraction as background ingest jobs (/api/ingest/jobs), so chunks
+    (and cache keys) match. Returns the text and the offset where each page starts.
+    """
+    from pypdf import PdfReader
+
+    reader = PdfReader(path)
+    pages = [(page.extract_text() or "") + "\n" for page in reader.pages]
+    offsets = np.zeros(len(pages), dtype=np.int64)
+    np.cumsum([len(p) for p in pages[:-1]], out=offsets[1:])
+    return "".join(pages), offsets.tolist()
+
+
+def _prepare(path: str, docs_dir: str, chunk_size: int, overlap: int, model_name: str) -> Dict:
+    """Worker process: hash, and unless already ingested, extract and chunk one PDF."""
+    from backend.services.chunk_and_vectorize import lc_split_spans
+
+    content_hash = file_sha256(path)
+    entry = ingest_key(content_hash, chunk_size, overlap, model_name)
+    result = {"path": path, "content_hash": content_hash, "entry": entry, "chunks": None}
+    if os.path.isdir(os.path.join(docs_dir, entry)):
+        result["status"] = "skipped"
+        return result
+    try:
+        text, page_offsets = extract_text(path)
+    except Exception as e:
+        result["status"] = "error"
+        result["error"] = f"{type(e).__name__}: {e}"
+        return result
+    if not text.strip():
+        result["status"] = "empty"
+        return result
+    chunks, starts = lc_split_spans(text, chunk_size=chunk_size, overlap=overlap)
+    # The document text once plus offsets (also what is pickled back to the parent)
+    result["chunks"] = CompactChunks.from_text(text, starts, [len(c) for c in chunks])
+    result["pages"] = page_numbers(starts, page_offsets)
+    result["sections"] = section_numbers(text, starts)
+    result["status"] = "ok"
+    return result
+
+
+class _Progress:
+    def __init__(self, total: int):
+        self.total = total
+        self.done = 0
+        self.processed = 0  # excluding skipped, for throughput
+        self.chunks = 0
+        self.start = time.perf_counter()
+
+    def update(self, status: str, n_chunks: int = 0):
+        self.done += 1
+        if status != "skipped":
+            self.processed += 1
+        self.chunks += n_chunks
+
+    @property
+    def docs_per_minute(self) -> float:
+        elapsed = time.perf_counter() - self.start
+        return self.processed / elapsed * 60 if elapsed > 0 else 0.0
+
+    def report(self):
+        rate = self.docs_per_minute
+        remaining = self.total - self.done
+        eta = f"{remaining / rate * 60:.0f}s" if rate > 0 else "?"
+        print(
+            f"[{self.done}/{self.total}] {self.chunks} chunks, {rate:.1f} docs/min, ETA {eta}",
+            file=sys.stderr, flush=True,
+        )
+
+
+def _flush(pending: List[Dict], docs_dir: str, manifest, args, progress: _Progress):
+    """Embed the chunks of all pending documents in one pass and write their entries."""
+    from backend.core.embeddings import _EmbeddingModel
+
+    texts = [c for doc in pending for c in doc["chunks"]]
+    vectors = _EmbeddingModel.get(args.model_name).encode(texts, batch_size=args.batch_size)
+    offset = 0
+    for doc in pending:
+        n = len(doc["chunks"])
+        store = {
+            "chunks": doc["chunks"],
+            "vectors": vectors[offset:offset + n],
+            "model_name": args.model_name,
+            "metadata": ChunkMetadata.for_document(
+                os.path.basename(doc["path"]), n, pages=doc["pages"], sections=doc["sections"]
+            ),
+        }
+        offset += n
+        save_store(os.path.join(docs_dir, doc["entry"]), store, meta={
+            "content_hash": doc["content_hash"],
+            "chunk_size": args.chunk_size,
+            "overlap": args.overlap,
+            "source": doc["path"],
+        })
+        _record(manifest, doc, n)
+        progress.update("ok", n)
+    progress.report()
+
+
+def _record(manifest, doc: Dict, n_chunks: int = 0):
+    manifest.write(json.dumps({
+        "path": doc["path"],
+        "content_hash": doc["content_hash"],
+        "entry": doc["entry"],
+        "status": doc["status"],
+        "n_chunks": n_chunks,
+        **({"error": doc["error"]} if "error" in doc else {}),
+    }) + "\n")
+    manifest.flush()
+
+
+def build_combined(out: str, key: str, paths: List[str], entries: Dict[str, str]) -> Optional[Dict]:
+    """Concatenate per-document entries (in ``paths`` order) into ``<out>/indices/<key>``."""
+    docs_dir = os.path.join(out, "docs")
+    chunks = []
+    n_chunks = 0
+    vectors = []
+    metadata = []
+    documents = []
+    model_name = None
+    for path in paths:
+        entry = entries.get(path)
+        if entry is None or not os.path.isdir(os.path.join(docs_dir, entry)):
+            continue
+        store = load_store(os.path.join(docs_dir, entry))
+        documents.append({"path": path, "entry": entry, "start": n_chunks, "n_chunks": len(store["chunks"])})
+        chunks.append(as_compact(store["chunks"]))
+        n_chunks += len(store["chunks"])
+        vectors.append(store["vectors"])
+        metadata.append(store["metadata"])
+        model_name = store["model_name"]
+    if not n_chunks:
+        return None
+    store = {
+        "chunks": CompactChunks.concat(chunks),
+        "vectors": np.concatenate(vectors),
+        "model_name": model_name,
+        # Entries written before chunk metadata existed have none
+        "metadata": ChunkMetadata.concat(metadata) if all(m is not None for m in metadata) else None,
+    }
+    os.makedirs(os.path.join(out, "indices"), exist_ok=True)
+    save_store(os.path.join(out, "indices", key), store, meta={"documents": documents})
+    return {"key": key, "documents": len(documents), "chunks": n_chunks}
+
+
+def run(args) -> Dict:
+    paths = find_pdfs(args.input)
+    docs_dir = os.path.join(args.out, "docs")
+    os.makedirs(docs_dir, exist_ok=True)
+    progress = _Progress(len(paths))
+    entries: Dict[str, str] = {}
+    counts = {"ok": 0, "skipped": 0, "empty": 0, "error": 0}
+    print(f"Ingesting {len(paths)} PDFs from {args.input} with {args.workers} workers", file=sys.stderr)
+
+    pending: List[Dict] = []
+    pending_chunks = 0
+    with open(os.path.join(args.out, "manifest.jsonl"), "a", encoding="utf-8") as manifest, \
+            ProcessPoolExecutor(max_workers=args.workers, mp_context=mp.get_context("spawn")) as pool:
+        todo = iter(paths)
+        in_flight = set()
+        while True:
+            # Bounded window so extracted text never piles up ahead of the embedder
+            while len(in_flight) < args.workers * 2:
+                path = next(todo, None)
+                if path is None:
+                    break
+                in_flight.add(pool.submit(
+                    _prepare, path, docs_dir, args.chunk_size, args.overlap, args.model_name
+                ))
+            if not in_flight:
+                break
+            finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                doc = future.result()
+                entries[doc["path"]] = doc["entry"]
+                counts[doc["status"]] += 1
+                if doc["status"] == "ok":
+                    pending.append(doc)
+                    pending_chunks += len(doc["chunks"])
+                    continue
+                if doc["status"] != "skipped":
+                    _record(manifest, doc)
+                if doc["status"] == "error":
+                    logger.warning(f"Failed to read {doc['path']}: {doc['error']}")
+                progress.update(doc["status"])
+            if pending_chunks >= args.embed_chunks or (not in_flight and pending):
+                _flush(pending, docs_dir, manifest, args, progress)
+                pending, pending_chunks = [], 0
+
+    combined = build_combined(args.out, args.combined, paths, entries) if args.combined else None
+    elapsed = time.perf_counter() - progress.start
+    return {
+        "input": args.input,
+        "out": args.out,
+        "documents": len(paths),
+        **counts,
+        "chunks": progress.chunks,
+        "elapsed_s": round(elapsed, 2),
+        "docs_per_minute": round(progress.docs_per_minute, 1),
+        "model_name": args.model_name,
+        "chunk_size": args.chunk_size,
+        "overlap": args.overlap,
+        "combined": combined,
+    }
+
+
+def main():
+    from backend.core.config import ChatBotEnvConfig
+
+    config = ChatBotEnvConfig.from_env()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="directory to search for PDFs (recursively)")
+    parser.add_argument("--out", required=True, help="output directory (use as the backend's INDEX_DIR)")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) - 1),
+                        help="extraction/chunking processes")
+    parser.add_argument("--embed-chunks", type=int, default=2048,
+                        help="embed once this many chunks from any documents are pending")
+    parser.add_argument("--batch-size", type=int, default=128, help="embedding model batch size")
+    parser.add_argument("--combined", metavar="KEY", help="also write one index of all documents under KEY")
+    parser.add_argument("--model-name", default=config.embedding_model_id)
+    parser.add_argument("--chunk-size", type=int, default=config.chunk_size)
+    parser.add_argument("--overlap", type=int, default=config.overlap)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    print(json.dumps(run(args), indent=2))
+
+
+if __name__ == "__main__":
+    main()
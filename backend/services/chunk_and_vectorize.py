@@ -1,9 +1,9 @@
 # backend/services/chunk_and_vectorize.py
 from typing import List, Tuple
-import numpy as np
 from pydantic import BaseModel, Field, field_validator
 import logging
 from backend.core.embeddings import embed_texts
+from backend.core.metrics import STAGE_SECONDS
 from backend.core.app_state import config  # centralized config
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
@@ -49,13 +49,29 @@ def lc_split(text, chunk_size=1000, overlap=200):
     )
     return splitter.split_text(text)
 
-def chunk_and_vectorize(text: str, chunk_size: int = None, overlap: int = None, model_name: str = None) -> Tuple[List[str], np.ndarray]:
+def lc_split_spans(text, chunk_size=1000, overlap=200) -> Tuple[List[str], List[int]]:
+    """Same chunks as ``lc_split``, plus the character offset of each chunk in ``text``."""
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=overlap,
+        length_function=len,
+        add_start_index=True,
+    )
+    docs = splitter.create_documents([text])
+    return [d.page_content for d in docs], [d.metadata["start_index"] for d in docs]
+
+def chunk_and_vectorize(text: str, chunk_size: int = None, overlap: int = None, model_name: str = None, with_starts: bool = False):
+    """Returns (chunks, vectors), or (chunks, vectors, start offsets) with ``with_starts``."""
     # default to config values
     chunk_size = chunk_size or config.chunk_size
     overlap = overlap or config.overlap
     model_name = model_name or config.embedding_model_id
 
     # chunks = recursive_text_splitter(text=text, chunk_size=chunk_size, overlap=overlap)
-    chunks = lc_split(text=text, chunk_size=chunk_size, overlap=overlap)
-    vectors = embed_texts(chunks, model_name=model_name)
+    with STAGE_SECONDS.time(stage="chunk"):
+        chunks, starts = lc_split_spans(text=text, chunk_size=chunk_size, overlap=overlap)
+    with STAGE_SECONDS.time(stage="embed"):
+        vectors = embed_texts(chunks, model_name=model_name)
+    if with_starts:
+        return chunks, vectors, starts
     return chunks, vectors
@@ -0,0 +1,143 @@
+# backend/services/chunk_metadata.py
+# Per-chunk metadata kept as parallel NumPy columns indexed by chunk id
+# (the FAISS id), so filters become a vectorised mask and then a FAISS ID
+# selector instead of over-fetching and discarding results.
+
+import re
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+# Lines that look like headings: "3.", "4.2 Payment", "Section 7", "ARTICLE IV", "Chapter 2"
+_HEADING = re.compile(
+    r"^[ \t]*(?:\d+(?:\.\d+)*\.?|(?:section|article|chapter|part)[ \t]+[\divxlc]+\.?)[ \t]+\S[^\n]{0,80}$",
+    re.IGNORECASE | re.MULTILINE,
+)
+
+
+def page_numbers(starts: Sequence[int], page_offsets: Sequence[int]) -> np.ndarray:
+    """1-based page of each chunk, from chunk start offsets and the start offset of each page."""
+    return np.searchsorted(np.asarray(page_offsets), np.asarray(starts), side="right").astype(np.int32)
+
+
+def section_numbers(text: str, starts: Sequence[int]) -> np.ndarray:
+    """Index of the heading-like line preceding each chunk (-1 before the first heading)."""
+    headings = np.fromiter((m.start() for m in _HEADING.finditer(text)), dtype=np.int64)
+    return (np.searchsorted(headings, np.asarray(starts), side="right") - 1).astype(np.int32)
+
+
+class ChunkMetadata:
+    """
+    Columnar metadata for the chunks of one index.
+
+    Columns (one entry per chunk):
+        doc      int32    index into ``documents`` (document ids)
+        page     int32    1-based page number, 0 if unknown
+        section  int32    heading-delimited section number, -1 if unknown
+        uploaded float64  unix time the chunk's document was indexed
+    """
+
+    COLUMNS = ("doc", "page", "section", "uploaded")
+
+    def __init__(self, documents: List[str], doc: np.ndarray, page: np.ndarray, section: np.ndarray, uploaded: np.ndarray):
+        self.documents = list(documents)
+        self.doc = np.asarray(doc, dtype=np.int32)
+        self.page = np.asarray(page, dtype=np.int32)
+        self.section = np.asarray(section, dtype=np.int32)
+        self.uploaded = np.asarray(uploaded, dtype=np.float64)
+
+    @classmethod
+    def for_document(
+        cls,
+        doc_id: str,
+        n_chunks: int,
+        pages: Optional[Sequence[int]] = None,
+        sections: Optional[Sequence[int]] = None,
+        uploaded: Optional[float] = None,
+    ) -> "ChunkMetadata":
+        return cls(
+            [doc_id],
+            np.zeros(n_chunks, dtype=np.int32),
+            pages if pages is not None else np.zeros(n_chunks, dtype=np.int32),
+            sections if sections is not None else np.full(n_chunks, -1, dtype=np.int32),
+            np.full(n_chunks, time.time() if uploaded is None else uploaded, dtype=np.float64),
+        )
+
+    @classmethod
+    def concat(cls, parts: Sequence["ChunkMetadata"]) -> "ChunkMetadata":
+        """Metadata of several indices concatenated in order (document ids are merged)."""
+        positions: Dict[str, int] = {}
+        docs = []
+        for part in parts:
+            remap = np.array([positions.setdefault(d, len(positions)) for d in part.documents], dtype=np.int32)
+            docs.append(remap[part.doc])
+        return cls(
+            list(positions),
+            np.concatenate(docs),
+            np.concatenate([p.page for p in parts]),
+            np.concatenate([p.section for p in parts]),
+            np.concatenate([p.uploaded for p in parts]),
+        )
+
+    def __len__(self) -> int:
+        return len(self.doc)
+
+    @property
+    def nbytes(self) -> int:
+        return int(sum(getattr(self, c).nbytes for c in self.COLUMNS))
+
+    # -------------------------------------------------------------------------
+    # Filtering
+    # -------------------------------------------------------------------------
+    def mask(
+        self,
+        pages: Optional[List[Tuple[int, int]]] = None,
+        doc_ids: Optional[List[str]] = None,
+        sections: Optional[List[int]] = None,
+        uploaded_after: Optional[float] = None,
+        uploaded_before: Optional[float] = None,
+    ) -> np.ndarray:
+        """Boolean mask of chunks matching every given filter (page ranges are inclusive)."""
+        keep = np.ones(len(self), dtype=bool)
+        if pages:
+            in_range = np.zeros(len(self), dtype=bool)
+            for first, last in pages:
+                in_range |= (self.page >= first) & (self.page <= last)
+            keep &= in_range
+        if doc_ids:
+            doc_ids = set(doc_ids)
+            wanted = [i for i, d in enumerate(self.documents) if d in doc_ids]
+            keep &= np.isin(self.doc, wanted)
+        if sections:
+            keep &= np.isin(self.section, sections)
+        if uploaded_after is not None:
+            keep &= self.uploaded >= uploaded_after
+        if uploaded_before is not None:
+            keep &= self.uploaded < uploaded_before
+        return keep
+
+    def select(self, **filters) -> Optional[np.ndarray]:
+        """Sorted chunk ids matching ``filters`` (see ``mask``), or None if nothing is filtered out."""
+        keep = self.mask(**filters)
+        if keep.all():
+            return None
+        return np.flatnonzero(keep).astype(np.int64)
+
+    def row(self, i: int) -> Dict:
+        return {
+            "doc_id": self.documents[self.doc[i]],
+            "page": int(self.page[i]),
+            "section": int(self.section[i]),
+            "uploaded": float(self.uploaded[i]),
+        }
+
+    # -------------------------------------------------------------------------
+    # Persistence
+    # -------------------------------------------------------------------------
+    def save(self, path: str):
+        np.savez(path, documents=np.array(self.documents, dtype=str), **{c: getattr(self, c) for c in self.COLUMNS})
+
+    @classmethod
+    def load(cls, path: str) -> "ChunkMetadata":
+        with np.load(path) as data:
+            return cls(data["documents"].tolist(), *(data[c] for c in cls.COLUMNS))
@@ -0,0 +1,110 @@
+# backend/services/chunk_store.py
+# Compact chunk text storage: the document text once, as one contiguous
+# UTF-8 buffer (a bytes object or a memory map), plus start/end byte offsets
+# per chunk taken from the splitter (lc_split_spans). Overlapping chunks share
+# their overlap bytes, and a chunk is only decoded to a str when it is looked
+# up (i.e. for the final top-k).
+
+import os
+from typing import Iterable, Sequence
+import numpy as np
+
+
+def _byte_offsets(text: str, char_offsets: np.ndarray) -> np.ndarray:
+    """Convert character offsets into ``text`` to byte offsets into its UTF-8 encoding."""
+    if text.isascii():
+        return char_offsets.astype(np.int64)
+    codepoints = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+    widths = 1 + (codepoints >= 0x80) + (codepoints >= 0x800) + (codepoints >= 0x10000)
+    cumulative = np.zeros(len(codepoints) + 1, dtype=np.int64)
+    np.cumsum(widths, out=cumulative[1:])
+    return cumulative[char_offsets]
+
+
+class CompactChunks(Sequence):
+    """
+    Read-only sequence of chunk strings over a shared UTF-8 buffer.
+
+    ``buffer`` is bytes or a uint8 array (e.g. np.memmap); ``starts``/``ends``
+    are int64 byte offsets. Behaves like the ``list[str]`` it replaces.
+    """
+
+    def __init__(self, buffer, starts: np.ndarray, ends: np.ndarray):
+        self._buffer = buffer
+        self.starts = np.asarray(starts, dtype=np.int64)
+        self.ends = np.asarray(ends, dtype=np.int64)
+
+    @classmethod
+    def from_text(cls, text: str, starts: Sequence[int], lengths: Sequence[int]) -> "CompactChunks":
+        """
+        Chunks ``text[starts[i]:starts[i] + lengths[i]]`` (character offsets,
+        as returned by ``lc_split_spans``) over the UTF-8 encoding of ``text``,
+        stored once.
+        """
+        char_starts = np.asarray(starts, dtype=np.int64)
+        char_ends = char_starts + np.asarray(lengths, dtype=np.int64)
+        return cls(text.encode("utf-8"), _byte_offsets(text, char_starts), _byte_offsets(text, char_ends))
+
+    @classmethod
+    def from_chunks(cls, chunks: Iterable[str]) -> "CompactChunks":
+        """
+        Build from chunk strings alone (no source text, e.g. chunks sent by a
+        client): stored back to back, overlaps included.
+        """
+        encoded = [chunk.encode("utf-8") for chunk in chunks]
+        ends = np.cumsum([len(b) for b in encoded], dtype=np.int64)
+        starts = ends - np.asarray([len(b) for b in encoded], dtype=np.int64)
+        return cls(b"".join(encoded), starts, ends)
+
+    @classmethod
+    def concat(cls, parts: Sequence["CompactChunks"]) -> "CompactChunks":
+        """Chunks of several stores in order, in one buffer (no re-encoding)."""
+        buffers = [bytes(p._buffer) for p in parts]
+        shifts = np.cumsum([0] + [len(b) for b in buffers[:-1]])
+        return cls(
+            b"".join(buffers),
+            np.concatenate([p.starts + shift for p, shift in zip(parts, shifts)]),
+            np.concatenate([p.ends + shift for p, shift in zip(parts, shifts)]),
+        )
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return bytes(self._buffer[self.starts.item(i):self.ends.item(i)]).decode("utf-8")
+
+    @property
+    def nbytes(self) -> int:
+        return int(len(self._buffer) + self.starts.nbytes + self.ends.nbytes)
+
+    # -------------------------------------------------------------------------
+    # Persistence: <dir>/chunks.bin (buffer) + <dir>/chunk_spans.npy ([n, 2] int64)
+    # -------------------------------------------------------------------------
+    def save(self, path: str):
+        with open(os.path.join(path, "chunks.bin"), "wb") as f:
+            f.write(memoryview(self._buffer))
+        np.save(os.path.join(path, "chunk_spans.npy"), np.stack([self.starts, self.ends], axis=1))
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = False) -> "CompactChunks":
+        """Load a directory written by ``save``; with ``mmap`` nothing is read until looked up."""
+        spans = np.load(os.path.join(path, "chunk_spans.npy"), mmap_mode="r" if mmap else None)
+        buffer_path = os.path.join(path, "chunks.bin")
+        if os.path.getsize(buffer_path) == 0:
+            buffer = b""  # mmap of an empty file is not allowed
+        elif mmap:
+            buffer = np.memmap(buffer_path, dtype=np.uint8, mode="r")
+        else:
+            with open(buffer_path, "rb") as f:
+                buffer = f.read()
+        return cls(buffer, spans[:, 0], spans[:, 1])
+
+
+def as_compact(chunks: Sequence[str]) -> CompactChunks:
+    return chunks if isinstance(chunks, CompactChunks) else CompactChunks.from_chunks(chunks)
@@ -0,0 +1,55 @@
+# backend/services/extractive.py
+# Extractive answers: the sentence of the retrieved chunks closest to the
+# question in embedding space, with its cosine similarity as the confidence.
+# Used by /api/ask to answer simple lookups without an LLM generation.
+
+import re
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+import logging
+
+from backend.core.embeddings import _EmbeddingModel
+
+logger = logging.getLogger("services.extractive")
+
+# Sentence ends: terminal punctuation followed by whitespace, or a line break
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\n+")
+
+
+def split_sentences(text: str, min_words: int = 3) -> List[str]:
+    """Sentences of ``text`` with at least ``min_words`` words (headings and fragments dropped)."""
+    sentences = (s.strip() for s in _SENTENCE_END.split(text))
+    return [s for s in sentences if len(s.split()) >= min_words]
+
+
+def best_sentence(
+    question: str,
+    chunks: Sequence[str],
+    model_name: str,
+    batch_size: int = 64,
+    qvec: Optional[np.ndarray] = None,
+) -> Optional[Dict]:
+    """
+    Score every sentence of ``chunks`` against ``question`` and return the
+    best as {"answer", "score", "chunk"} (``chunk`` is the position in
+    ``chunks``), or None when there are no sentences. Sentences are embedded
+    in one batched encode call; ``qvec`` is the question's embedding from
+    retrieval (encoded along with the sentences when not given).
+    """
+    # Overlapping chunks repeat sentences; score each once (first chunk wins)
+    owner_of: Dict[str, int] = {}
+    for position, chunk in enumerate(chunks):
+        for sentence in split_sentences(chunk):
+            owner_of.setdefault(sentence, position)
+    sentences = list(owner_of)
+    if not sentences:
+        return None
+    model = _EmbeddingModel.get(model_name)
+    if qvec is None:
+        vectors = model.encode([question] + sentences, batch_size=batch_size)
+    else:
+        vectors = np.vstack([np.asarray(qvec, dtype=np.float32).reshape(1, -1), model.encode(sentences, batch_size=batch_size)])
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    scores = vectors[1:] @ vectors[0]
+    best = int(np.argmax(scores))
+    return {"answer": sentences[best], "score": float(scores[best]), "chunk": owner_of[sentences[best]]}
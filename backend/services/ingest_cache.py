@@ -0,0 +1,251 @@
+# backend/services/ingest_cache.py
+# Whole-document ingest cache: built indices keyed by the PDF content hash,
+# chunking config and embedding model, so re-uploading a document binds the
+# session to the existing index instead of re-chunking and re-embedding.
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Sequence
+import numpy as np
+import logging
+
+from backend.services.chunk_metadata import ChunkMetadata
+from backend.services.chunk_store import CompactChunks, as_compact
+from backend.services.retrieval import build_faiss_index
+
+logger = logging.getLogger("services.ingest_cache")
+
+
+def ingest_key(content_hash: str, chunk_size: int, overlap: int, model_name: str) -> str:
+    """Cache key for a document ingested with a given chunking config and embedding model."""
+    raw = f"{content_hash}|{chunk_size}|{overlap}|{model_name}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def store_nbytes(store: Dict) -> int:
+    chunks = store["chunks"]
+    chunk_bytes = getattr(chunks, "nbytes", None) or sum(len(c.encode("utf-8")) for c in chunks)
+    metadata = store.get("metadata")
+    metadata_bytes = metadata.nbytes if metadata is not None else 0
+    return int(store["vectors"].nbytes + store["faiss"].nbytes + chunk_bytes + metadata_bytes)
+
+
+def make_store(
+    chunks: Sequence[str],
+    vectors: np.ndarray,
+    model_name: str,
+    metadata: Optional[ChunkMetadata] = None,
+) -> Dict:
+    """The per-index dict held in search_router._INDICES (chunks stored compactly)."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    chunks = as_compact(chunks)
+    if metadata is not None and len(metadata) != len(chunks):
+        raise ValueError(f"metadata has {len(metadata)} rows for {len(chunks)} chunks")
+    return {
+        "chunks": chunks,
+        "vectors": vectors,
+        "faiss": build_faiss_index(vectors),
+        "model_name": model_name,
+        "metadata": metadata,
+    }
+
+
+# ==============================
+# On-disk format
+# ==============================
+# <dir>/<entry>/vectors.npy   float32 [n_chunks, dim]
+# <dir>/<entry>/chunks.bin + chunk_spans.npy   CompactChunks (older entries: chunks.json)
+# <dir>/<entry>/meta.json     {"model_name", "n_chunks", "dim", ...}
+# <dir>/<entry>/metadata.npz  per-chunk ChunkMetadata columns (optional)
+def save_store(path: str, store: Dict, meta: Optional[Dict] = None):
+    """Write ``store`` to directory ``path`` atomically (tmp dir + rename)."""
+    tmp = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+    os.makedirs(tmp, exist_ok=True)
+    np.save(os.path.join(tmp, "vectors.npy"), store["vectors"])
+    as_compact(store["chunks"]).save(tmp)
+    if store.get("metadata") is not None:
+        store["metadata"].save(os.path.join(tmp, "metadata.npz"))
+    with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "model_name": store["model_name"],
+            "n_chunks": len(store["chunks"]),
+            "dim": int(store["vectors"].shape[1]),
+            **(meta or {}),
+        }, f)
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp, path)
+
+
+def load_store(path: str) -> Dict:
+    """Load a directory written by ``save_store`` and rebuild its FAISS index."""
+    with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+        meta = json.load(f)
+    if os.path.exists(os.path.join(path, "chunks.json")):
+        with open(os.path.join(path, "chunks.json"), encoding="utf-8") as f:
+            chunks = json.load(f)
+    else:
+        # Memory-mapped: only looked-up chunks are ever read
+        chunks = CompactChunks.load(path, mmap=True)
+    vectors = np.load(os.path.join(path, "vectors.npy"))
+    metadata_path = os.path.join(path, "metadata.npz")
+    metadata = ChunkMetadata.load(metadata_path) if os.path.exists(metadata_path) else None
+    return make_store(chunks, vectors, meta["model_name"], metadata)
+
+
+def _dir_bytes(path: str) -> int:
+    return sum(e.stat().st_size for e in os.scandir(path) if e.is_file())
+
+
+# ==============================
+# Cache
+# ==============================
+class IngestCache:
+    """
+    LRU of ingest key -> index store, bounded by approximate bytes.
+
+    Stores are never mutated after they are built, so every session bound to
+    the same document shares one store object; rebuilding a session's index
+    replaces its _INDICES entry rather than touching the shared one. Evicting
+    an entry only drops the cache's reference, so sessions still bound to it
+    keep working. With ``persist_dir`` set, entries are also written to disk
+    (bounded by the same byte budget) and reloaded after a restart.
+    ``library_dir`` is a read-only directory of prebuilt entries (the
+    ``docs/`` output of backend.services.bulk_ingest) consulted on a miss.
+    """
+
+    def __init__(self, max_bytes: int, persist_dir: Optional[str] = None, library_dir: Optional[str] = None):
+        self.max_bytes = max_bytes
+        self.persist_dir = persist_dir or None
+        self.library_dir = library_dir or None
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if self.persist_dir:
+            os.makedirs(self.persist_dir, exist_ok=True)
+
+    def configure(self, max_bytes: int, persist_dir: Optional[str] = None, library_dir: Optional[str] = None):
+        with self._lock:
+            self.max_bytes = max_bytes
+            self.persist_dir = persist_dir or None
+            self.library_dir = library_dir or None
+            self._evict_locked()
+        if self.persist_dir:
+            os.makedirs(self.persist_dir, exist_ok=True)
+            self._prune_disk()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.persist_dir, key)
+
+    def _load(self, key: str) -> Optional[Dict]:
+        """Load ``key`` from the persist dir, else the library dir."""
+        if self.persist_dir and os.path.isdir(self._path(key)):
+            try:
+                store = load_store(self._path(key))
+            except Exception as e:
+                logger.warning(f"Discarding unreadable ingest cache entry {key}: {e}")
+                shutil.rmtree(self._path(key), ignore_errors=True)
+            else:
+                os.utime(self._path(key))
+                return store
+        if self.library_dir and os.path.isdir(os.path.join(self.library_dir, key)):
+            try:
+                return load_store(os.path.join(self.library_dir, key))
+            except Exception as e:
+                logger.warning(f"Unreadable library entry {key}: {e}")
+        return None
+
+    # -------------------------------------------------------------------------
+    # Lookup / insert
+    # -------------------------------------------------------------------------
+    def get(self, key: str) -> Optional[Dict]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry["store"]
+
+        store = self._load(key)
+        if store is not None:
+            self._insert(key, store)
+            with self._lock:
+                self.disk_hits += 1
+            logger.info(f"Ingest cache entry {key[:12]} loaded from disk ({len(store['chunks'])} chunks)")
+            return store
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, store: Dict, meta: Optional[Dict] = None):
+        if not self.enabled:
+            return
+        self._insert(key, store)
+        if self.persist_dir:
+            try:
+                save_store(self._path(key), store, meta)
+                self._prune_disk()
+            except Exception as e:
+                logger.warning(f"Could not persist ingest cache entry {key}: {e}")
+
+    def _insert(self, key: str, store: Dict):
+        nbytes = store_nbytes(store)
+        if nbytes > self.max_bytes:
+            logger.info(f"Index of {nbytes / 2**20:.1f} MiB exceeds the ingest cache budget; not cached")
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old["nbytes"]
+            self._entries[key] = {"store": store, "nbytes": nbytes}
+            self._bytes += nbytes
+            self._evict_locked()
+
+    def _evict_locked(self):
+        while self._bytes > self.max_bytes and self._entries:
+            key, entry = self._entries.popitem(last=False)
+            self._bytes -= entry["nbytes"]
+            logger.info(f"Evicted ingest cache entry {key[:12]} ({entry['nbytes'] / 2**20:.1f} MiB)")
+
+    def _prune_disk(self):
+        """Remove least recently used persisted entries beyond the byte budget."""
+        entries = []
+        for e in os.scandir(self.persist_dir):
+            if e.is_dir() and ".tmp-" not in e.name:
+                entries.append((e.stat().st_mtime, _dir_bytes(e.path), e.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "persist_dir": self.persist_dir,
+                "library_dir": self.library_dir,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+            }
+
+
+ingest_cache = IngestCache(max_bytes=0)
@@ -0,0 +1,315 @@
+# backend/services/ingest_jobs.py
+# Background ingestion: a bounded pool of worker threads draining a priority
+# queue of PDF ingest jobs (smallest document first), with per-job stage and
+# progress for status polling. With a status directory shared by several
+# processes (uvicorn workers), job status is also written there so any process
+# can report it and cancel a queued job.
+
+import fcntl
+import heapq
+import itertools
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+from typing import Callable, Dict, List, Optional
+import logging
+
+logger = logging.getLogger("services.ingest_jobs")
+
+# Job lifecycle; "stage" additionally names the pipeline step of a running job
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+_FINISHED = (DONE, FAILED, CANCELLED)
+
+_JOB_ID = re.compile(r"[0-9a-f]{32}")
+_STATUS_LOCK = "jobs.lock"
+
+
+class IngestQueueFull(Exception):
+    pass
+
+
+class IngestJob:
+    """One PDF to ingest under ``key``; ``path`` is a spooled copy owned by the job."""
+
+    def __init__(self, key: str, path: str, size: int, filename: Optional[str] = None, doc_id: Optional[str] = None):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.path = path
+        self.size = size
+        self.filename = filename
+        self.doc_id = doc_id or filename
+        self.status = QUEUED
+        self.stage = QUEUED
+        self.progress = 0.0
+        self.result: Dict = {}
+        self.error: Optional[str] = None
+        self.submitted = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        # Called after every update (set by the queue to publish progress)
+        self.on_update: Optional[Callable[["IngestJob"], None]] = None
+
+    def update(self, stage: str, progress: Optional[float] = None):
+        self.stage = stage
+        if progress is not None:
+            self.progress = round(min(max(progress, 0.0), 1.0), 4)
+        if self.on_update is not None:
+            self.on_update(self)
+
+    def as_dict(self) -> Dict:
+        return {
+            "job_id": self.id,
+            "key": self.key,
+            "filename": self.filename,
+            "size": self.size,
+            "status": self.status,
+            "stage": self.stage,
+            "progress": self.progress,
+            "error": self.error,
+            "submitted": self.submitted,
+            "started": self.started,
+            "finished": self.finished,
+            **self.result,
+        }
+
+
+class IngestJobQueue:
+    """
+    Runs ``runner(job)`` for submitted jobs on at most ``max_concurrency``
+    worker threads. Waiting jobs are ordered by size (then submission), so a
+    small upload is not stuck behind a large one. At most ``max_queue`` jobs
+    may wait; ``history`` finished jobs are kept for status lookups.
+
+    The runner reports progress through ``job.update`` and returns a dict
+    merged into the job's status; an exception fails the job. The job's
+    spooled file is removed once it finishes.
+
+    With ``status_dir`` every status change is also written there as
+    ``<job_id>.json``, so processes sharing the directory see each other's
+    jobs (``status``/``statuses``) and can cancel each other's queued jobs:
+    the cancel leaves a ``<job_id>.cancel`` marker and the owning process
+    drops the job instead of starting it. Check-and-mark and check-and-start
+    both run under an flock on the directory.
+    """
+
+    def __init__(
+        self,
+        runner: Callable[[IngestJob], Dict],
+        max_concurrency: int = 1,
+        max_queue: int = 64,
+        history: int = 256,
+        status_dir: Optional[str] = None,
+    ):
+        self._runner = runner
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.history = history
+        self.status_dir = status_dir
+        if status_dir:
+            os.makedirs(status_dir, exist_ok=True)
+        self._cond = threading.Condition()
+        self._waiting: List = []  # heap of (size, seq, job)
+        self._seq = itertools.count()
+        self._jobs: "OrderedDict[str, IngestJob]" = OrderedDict()
+        self._workers: List[threading.Thread] = []
+        self.active = 0
+        self.completed = 0
+        self.failed = 0
+
+    def configure(self, max_concurrency: Optional[int] = None, max_queue: Optional[int] = None, history: Optional[int] = None):
+        with self._cond:
+            if max_concurrency is not None:
+                self.max_concurrency = max_concurrency
+            if max_queue is not None:
+                self.max_queue = max_queue
+            if history is not None:
+                self.history = history
+
+    # -------------------------------------------------------------------------
+    # Submission / lookup
+    # -------------------------------------------------------------------------
+    def submit(self, job: IngestJob) -> IngestJob:
+        with self._cond:
+            if self.queued() >= self.max_queue:
+                raise IngestQueueFull(f"Ingest queue is full ({self.max_queue} jobs waiting)")
+            heapq.heappush(self._waiting, (job.size, next(self._seq), job))
+            self._jobs[job.id] = job
+            job.on_update = self._persist
+            self._persist(job)
+            self._trim_locked()
+            if len(self._workers) < self.max_concurrency:
+                worker = threading.Thread(target=self._work, name=f"ingest-{len(self._workers)}", daemon=True)
+                self._workers.append(worker)
+                worker.start()
+            self._cond.notify()
+        logger.info(f"Queued ingest job {job.id} for key {job.key} ({job.size} bytes, {self.queued()} waiting)")
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        return self._jobs.get(job_id)
+
+    def jobs(self, key: Optional[str] = None) -> List[IngestJob]:
+        return [job for job in list(self._jobs.values()) if key is None or job.key == key]
+
+    def status(self, job_id: str) -> Optional[Dict]:
+        """Status of a job of this queue or, with ``status_dir``, of any process sharing it."""
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job.as_dict()
+        return self._read_status(job_id)
+
+    def statuses(self, key: Optional[str] = None) -> List[Dict]:
+        """Statuses of recent jobs (optionally for one key), oldest submission first."""
+        if self.status_dir is None:
+            return [job.as_dict() for job in self.jobs(key)]
+        found = {job.id: job.as_dict() for job in self.jobs(key)}
+        for name in os.listdir(self.status_dir):
+            job_id, ext = os.path.splitext(name)
+            if ext == ".json" and job_id not in found:
+                status = self._read_status(job_id)
+                if status is not None and (key is None or status["key"] == key):
+                    found[job_id] = status
+        return sorted(found.values(), key=lambda status: status["submitted"])
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a job that has not started yet."""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                if job.status != QUEUED:
+                    return False
+                self._waiting = [entry for entry in self._waiting if entry[2] is not job]
+                heapq.heapify(self._waiting)
+                self._finish_locked(job, CANCELLED)
+                return True
+        if self.status_dir is None or not _JOB_ID.fullmatch(job_id):
+            return False
+        # Queued by another process: its worker finds the marker before starting the job
+        with self._status_lock():
+            status = self._read_status(job_id)
+            if status is None or status["status"] != QUEUED:
+                return False
+            open(self._status_path(job_id, ".cancel"), "w").close()
+            status.update(status=CANCELLED, stage=CANCELLED, finished=time.time())
+            self._write_status(job_id, status)
+        logger.info(f"Cancelled ingest job {job_id} queued by another process")
+        return True
+
+    def queued(self) -> int:
+        return len(self._waiting)
+
+    def stats(self) -> Dict:
+        return {
+            "active": self.active,
+            "queued": self.queued(),
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "completed": self.completed,
+            "failed": self.failed,
+        }
+
+    # -------------------------------------------------------------------------
+    # Workers
+    # -------------------------------------------------------------------------
+    def _work(self):
+        while True:
+            with self._cond:
+                while True:
+                    while not self._waiting:
+                        self._cond.wait()
+                    _, _, job = heapq.heappop(self._waiting)
+                    # Marked running before the lock is released, so cancel() cannot race the start
+                    if self._start_locked(job):
+                        break
+            try:
+                job.result = self._runner(job) or {}
+                status = DONE
+                job.update(DONE, 1.0)
+            except Exception as e:
+                logger.exception(f"Ingest job {job.id} for key {job.key} failed in stage {job.stage}")
+                job.error = f"{type(e).__name__}: {e}"
+                status = FAILED
+            with self._cond:
+                self.active -= 1
+                self._finish_locked(job, status)
+            logger.info(f"Ingest job {job.id} {status} in {job.finished - job.started:.2f}s")
+
+    def _start_locked(self, job: IngestJob) -> bool:
+        """Mark ``job`` running, unless another process cancelled it while it was queued."""
+        with self._status_lock() if self.status_dir else nullcontext():
+            marker = self._status_path(job.id, ".cancel") if self.status_dir else None
+            if marker is not None and os.path.exists(marker):
+                os.remove(marker)
+                self._finish_locked(job, CANCELLED)
+                return False
+            job.status = RUNNING
+            job.started = time.time()
+            self.active += 1
+            self._persist(job)
+        return True
+
+    def _finish_locked(self, job: IngestJob, status: str):
+        job.status = status
+        if status != DONE:
+            job.stage = status
+        job.finished = time.time()
+        if status == DONE:
+            self.completed += 1
+        elif status == FAILED:
+            self.failed += 1
+        try:
+            os.remove(job.path)
+        except OSError:
+            pass
+        self._persist(job)
+        self._trim_locked()
+
+    def _trim_locked(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in _FINISHED]
+        for job_id in finished[:max(0, len(finished) - self.history)]:
+            del self._jobs[job_id]
+            if self.status_dir:
+                try:
+                    os.remove(self._status_path(job_id))
+                except OSError:
+                    pass
+
+    # -------------------------------------------------------------------------
+    # Status shared through status_dir
+    # -------------------------------------------------------------------------
+    def _status_path(self, job_id: str, ext: str = ".json") -> str:
+        return os.path.join(self.status_dir, f"{job_id}{ext}")
+
+    @contextmanager
+    def _status_lock(self):
+        with open(os.path.join(self.status_dir, _STATUS_LOCK), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _persist(self, job: IngestJob):
+        if self.status_dir:
+            self._write_status(job.id, job.as_dict())
+
+    def _write_status(self, job_id: str, status: Dict):
+        # Replaced atomically: readers never see a partial file
+        tmp = self._status_path(job_id, f".tmp-{os.getpid()}-{threading.get_ident()}")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(status, f)
+        os.replace(tmp, self._status_path(job_id))
+
+    def _read_status(self, job_id: str) -> Optional[Dict]:
+        if self.status_dir is None or not _JOB_ID.fullmatch(job_id):
+            return None
+        try:
+            with open(self._status_path(job_id), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
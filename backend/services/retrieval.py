@@ -1,8 +1,10 @@
 # backend/services/retrieval.py
 import faiss
 import numpy as np
-from typing import Tuple, List
+from typing import Optional, Sequence, Tuple, List
 import logging
+import time
+from backend.core.metrics import STAGE_SECONDS
 
 logger = logging.getLogger("services.retrieval")
 
@@ -15,13 +17,194 @@ class FaissIndexWrapper:
         self.index.add(self.vectors)
         logger.info(f"Built FAISS index with {self.vectors.shape[0]} vectors (dim={self.dim})")
 
-    def search(self, qvec: np.ndarray, top_k: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+    def search(self, qvec: np.ndarray, top_k: int = 5, allowed: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """``allowed``: sorted chunk ids to restrict the search to (e.g. a metadata filter)."""
         q = np.asarray(qvec, dtype=np.float32)
         if q.ndim == 1:
             q = q.reshape(1, -1)
-        D, I = self.index.search(q, top_k)
+        start = time.perf_counter()
+        if allowed is None:
+            D, I = self.index.search(q, top_k)
+        else:
+            D, I = self.search_ids(q, top_k, allowed)
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage="search")
         return D, I
 
+    def search_ids(self, q: np.ndarray, top_k: int, ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Search only the vectors in ``ids``; non-members are skipped inside FAISS."""
+        if len(ids) == 0:
+            return no_results(q.shape[0], top_k)
+        # The selector only references ``ids``; keep it alive through the search
+        selector = faiss.IDSelectorArray(ids)
+        return self.index.search(q, top_k, params=faiss.SearchParameters(sel=selector))
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by the index (flat index stores a copy of the vectors)."""
+        return int(self.vectors.nbytes + self.index.ntotal * self.dim * 4)
+
+class HierarchicalIndex(FaissIndexWrapper):
+    """
+    Coarse-to-fine search for very large documents.
+
+    Chunks are grouped into sections of consecutive chunks (``section_starts``,
+    or fixed runs of ``section_size`` chunks since chunks are in page order).
+    A query is first matched against the section centroids, then only the
+    chunks of the ``fan_out`` closest sections are searched, through a FAISS
+    ID selector on the flat chunk index. With ``fan_out`` covering every
+    section the results equal a flat search.
+    """
+
+    def __init__(
+        self,
+        vectors: np.ndarray,
+        section_size: int = 64,
+        fan_out: int = 8,
+        section_starts: Optional[Sequence[int]] = None,
+    ):
+        super().__init__(vectors)
+        n = self.vectors.shape[0]
+        if section_starts is None:
+            section_starts = range(0, n, section_size)
+        starts = np.asarray(section_starts, dtype=np.int64)
+        self.bounds = np.append(starts, n)
+        counts = np.diff(self.bounds).astype(np.float32)
+        centroids = np.add.reduceat(self.vectors, starts, axis=0) / counts[:, None]
+        self.sections = faiss.IndexFlatL2(self.dim)
+        self.sections.add(np.ascontiguousarray(centroids, dtype=np.float32))
+        self.fan_out = fan_out
+        logger.info(f"Built section index with {len(starts)} sections over {n} chunks")
+
+    @property
+    def n_sections(self) -> int:
+        return len(self.bounds) - 1
+
+    def section_ids(self, q: np.ndarray, fan_out: int, candidates: Optional[np.ndarray] = None) -> np.ndarray:
+        """Chunk ids of the ``fan_out`` sections (among ``candidates``) closest to one query row."""
+        if candidates is None:
+            _, S = self.sections.search(q, fan_out)
+        else:
+            selector = faiss.IDSelectorArray(candidates)
+            _, S = self.sections.search(q, fan_out, params=faiss.SearchParameters(sel=selector))
+        S = S[0][S[0] >= 0]
+        return np.concatenate([np.arange(self.bounds[s], self.bounds[s + 1]) for s in S])
+
+    def search(
+        self,
+        qvec: np.ndarray,
+        top_k: int = 5,
+        fan_out: Optional[int] = None,
+        allowed: Optional[np.ndarray] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        fan_out = fan_out or self.fan_out
+        candidates = None
+        if allowed is not None:
+            # Only sections holding at least one allowed chunk are worth visiting
+            candidates = np.unique(np.searchsorted(self.bounds, allowed, side="right") - 1)
+            if len(candidates) <= fan_out:
+                return super().search(qvec, top_k, allowed)
+        elif fan_out >= self.n_sections:
+            return super().search(qvec, top_k)
+        q = np.asarray(qvec, dtype=np.float32)
+        if q.ndim == 1:
+            q = q.reshape(1, -1)
+        start = time.perf_counter()
+        D = np.empty((q.shape[0], top_k), dtype=np.float32)
+        I = np.empty((q.shape[0], top_k), dtype=np.int64)
+        for row in range(q.shape[0]):
+            ids = self.section_ids(q[row:row + 1], fan_out, candidates)
+            if allowed is not None:
+                ids = ids[np.isin(ids, allowed, assume_unique=True)]
+            D[row:row + 1], I[row:row + 1] = self.search_ids(q[row:row + 1], top_k, ids)
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage="search")
+        return D, I
+
+    @property
+    def nbytes(self) -> int:
+        return super().nbytes + self.sections.ntotal * self.dim * 4 + self.bounds.nbytes
+
+
+# ==============================
+# Index construction
+# ==============================
+# Set from config at startup (see backend/core/app_state.py)
+_hierarchy = {"enabled": False, "section_size": 64, "fan_out": 8}
+
+
+def configure_hierarchy(enabled: bool, section_size: int = 64, fan_out: int = 8):
+    _hierarchy.update(enabled=enabled, section_size=section_size, fan_out=fan_out)
+
+
+def build_faiss_index(vectors: np.ndarray) -> FaissIndexWrapper:
+    """
+    Flat index, or a HierarchicalIndex when enabled and the document has more
+    sections than one query would search anyway.
+    """
+    n_sections = -(-vectors.shape[0] // _hierarchy["section_size"])
+    if _hierarchy["enabled"] and n_sections > _hierarchy["fan_out"]:
+        return HierarchicalIndex(vectors, section_size=_hierarchy["section_size"], fan_out=_hierarchy["fan_out"])
+    return FaissIndexWrapper(vectors)
+
+
+def no_results(n_queries: int, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Empty result in FAISS's padding convention (id -1)."""
+    return (
+        np.full((n_queries, top_k), np.finfo(np.float32).max, dtype=np.float32),
+        np.full((n_queries, top_k), -1, dtype=np.int64),
+    )
+
+
+# ==============================
+# Diversity (maximal marginal relevance)
+# ==============================
+def mmr_select(qvec: np.ndarray, candidates: np.ndarray, top_k: int, diversity: float = 0.5) -> np.ndarray:
+    """
+    Positions of ``top_k`` rows of ``candidates`` picked greedily by maximal
+    marginal relevance: each pick maximises
+    ``(1 - diversity) * cos(query, c) - diversity * max cos(c, picked)``.
+    ``diversity`` 0 keeps relevance order; higher values skip near-duplicates
+    (e.g. overlapping neighbouring chunks). One matrix product gives all
+    pairwise similarities; each pick is a vectorised update.
+    """
+    C = np.asarray(candidates, dtype=np.float32)
+    top_k = min(top_k, C.shape[0])
+    C = C / np.maximum(np.linalg.norm(C, axis=1, keepdims=True), 1e-12)
+    q = np.asarray(qvec, dtype=np.float32).reshape(-1)
+    q = q / max(float(np.linalg.norm(q)), 1e-12)
+    relevance = (1.0 - diversity) * (C @ q)
+    similarity = C @ C.T
+    # Highest similarity to anything picked so far (dissimilar counts as 0)
+    redundancy = np.zeros(C.shape[0], dtype=np.float32)
+    picked = np.empty(top_k, dtype=np.int64)
+    score = relevance.copy()
+    for step in range(top_k):
+        best = int(np.argmax(score))
+        picked[step] = best
+        np.maximum(redundancy, similarity[best], out=redundancy)
+        score = relevance - diversity * redundancy
+        score[picked[:step + 1]] = -np.inf
+    return picked
+
+
+def mmr_rerank(
+    vectors: np.ndarray,
+    qvec: np.ndarray,
+    D: np.ndarray,
+    I: np.ndarray,
+    top_k: int,
+    diversity: float,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Diverse ``top_k`` of one over-fetched result row ``(D, I)``, using the index's stored ``vectors``."""
+    valid = I[0] >= 0
+    ids, distances = I[0][valid], D[0][valid]
+    out_D, out_I = no_results(1, top_k)
+    if len(ids):
+        picked = mmr_select(qvec, vectors[ids], top_k, diversity)
+        out_D[0, :len(picked)] = distances[picked]
+        out_I[0, :len(picked)] = ids[picked]
+    return out_D, out_I
+
+
 def get_matches_from_indices(chunks: List[str], indices: np.ndarray) -> List[str]:
     if indices.ndim == 2:
         indices = indices[0]
@@ -0,0 +1,309 @@
+# backend/services/shared_index.py
+# Index store shared by all uvicorn worker processes on a host: vectors and
+# chunk text live in memory-mapped files (e.g. under /dev/shm) and a small
+# JSON catalog maps index keys to them, so an index built by one worker is
+# served by every worker without being copied into each worker's heap.
+
+import fcntl
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Sequence, Tuple
+import faiss
+import numpy as np
+import logging
+
+from backend.core.metrics import STAGE_SECONDS
+from backend.services.chunk_metadata import ChunkMetadata
+from backend.services.chunk_store import CompactChunks, as_compact
+from backend.services.retrieval import HierarchicalIndex, no_results
+
+logger = logging.getLogger("services.shared_index")
+
+_CATALOG = "catalog.json"
+_LOCK = "catalog.lock"
+# Index directories are uuid4 hex names; anything else under root (temporary
+# writes, other shared state such as ingest job status) is never collected
+_INDEX_DIR = re.compile(r"[0-9a-f]{32}")
+
+
+class MmapFlatIndex:
+    """
+    Exact L2 search straight over memory-mapped vectors (same results as
+    IndexFlatL2, but without building a per-process copy of the vectors).
+    """
+
+    def __init__(self, vectors: np.ndarray):
+        self.vectors = vectors
+        self.dim = vectors.shape[1]
+
+    def search(self, qvec: np.ndarray, top_k: int = 5, allowed: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """``allowed``: sorted chunk ids to restrict the search to (only those rows are read)."""
+        q = np.asarray(qvec, dtype=np.float32)
+        if q.ndim == 1:
+            q = q.reshape(1, -1)
+        start = time.perf_counter()
+        D, I = self.search_ids(q, top_k, allowed)
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage="search")
+        return D, I
+
+    def search_ids(self, q: np.ndarray, top_k: int, ids: Optional[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        """Search only the rows in ``ids`` (all rows when None)."""
+        if ids is None:
+            D, I = faiss.knn(q, self.vectors, min(top_k, len(self.vectors)))
+        elif len(ids) == 0:
+            return no_results(q.shape[0], top_k)
+        else:
+            D, I = faiss.knn(q, self.vectors[ids], min(top_k, len(ids)))
+            I = ids[I]
+        if I.shape[1] < top_k:
+            # Match IndexFlatL2, which pads missing neighbours with -1
+            pad = top_k - I.shape[1]
+            D = np.pad(D, ((0, 0), (0, pad)), constant_values=np.finfo(np.float32).max)
+            I = np.pad(I, ((0, 0), (0, pad)), constant_values=-1)
+        return D, I
+
+    @property
+    def nbytes(self) -> int:
+        """Private heap held by the index: none, the vectors are shared pages."""
+        return 0
+
+
+class MmapHierarchicalIndex(MmapFlatIndex):
+    """
+    HierarchicalIndex over memory-mapped vectors: the section centroids are a
+    small per-process FAISS index, and a query reads only the rows of the
+    ``fan_out`` closest sections from the mapping.
+    """
+
+    def __init__(self, vectors: np.ndarray, bounds: np.ndarray, centroids: np.ndarray, fan_out: int):
+        super().__init__(vectors)
+        self.bounds = bounds
+        self.sections = faiss.IndexFlatL2(self.dim)
+        self.sections.add(np.ascontiguousarray(centroids, dtype=np.float32))
+        self.fan_out = fan_out
+
+    n_sections = HierarchicalIndex.n_sections
+    section_ids = HierarchicalIndex.section_ids
+
+    def search(
+        self,
+        qvec: np.ndarray,
+        top_k: int = 5,
+        fan_out: Optional[int] = None,
+        allowed: Optional[np.ndarray] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Same coarse-to-fine search (and flat fallbacks) as HierarchicalIndex.search."""
+        fan_out = fan_out or self.fan_out
+        candidates = None
+        if allowed is not None:
+            candidates = np.unique(np.searchsorted(self.bounds, allowed, side="right") - 1)
+            if len(candidates) <= fan_out:
+                return super().search(qvec, top_k, allowed)
+        elif fan_out >= self.n_sections:
+            return super().search(qvec, top_k)
+        q = np.asarray(qvec, dtype=np.float32)
+        if q.ndim == 1:
+            q = q.reshape(1, -1)
+        start = time.perf_counter()
+        D = np.empty((q.shape[0], top_k), dtype=np.float32)
+        I = np.empty((q.shape[0], top_k), dtype=np.int64)
+        for row in range(q.shape[0]):
+            ids = self.section_ids(q[row:row + 1], fan_out, candidates)
+            if allowed is not None:
+                ids = ids[np.isin(ids, allowed, assume_unique=True)]
+            D[row:row + 1], I[row:row + 1] = self.search_ids(q[row:row + 1], top_k, ids)
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage="search")
+        return D, I
+
+    @property
+    def nbytes(self) -> int:
+        return self.sections.ntotal * self.dim * 4 + self.bounds.nbytes
+
+
+def write_mapped(
+    path: str,
+    chunks: Sequence[str],
+    vectors: np.ndarray,
+    model_name: str,
+    metadata: Optional[ChunkMetadata] = None,
+    index=None,
+):
+    """
+    Write one index in the mapped layout to directory ``path``; the sections
+    of a HierarchicalIndex ``index`` are kept so it is mapped hierarchical too.
+    """
+    os.makedirs(path, exist_ok=True)
+    as_compact(chunks).save(path)
+    np.save(os.path.join(path, "vectors.npy"), np.ascontiguousarray(vectors, dtype=np.float32))
+    if metadata is not None:
+        metadata.save(os.path.join(path, "metadata.npz"))
+    if isinstance(index, (HierarchicalIndex, MmapHierarchicalIndex)):
+        np.savez(
+            os.path.join(path, "sections.npz"),
+            bounds=index.bounds,
+            centroids=index.sections.reconstruct_n(0, index.sections.ntotal),
+            fan_out=index.fan_out,
+        )
+    with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({"model_name": model_name, "n_chunks": len(chunks), "dim": int(vectors.shape[1])}, f)
+
+
+def open_mapped(path: str) -> Dict:
+    """Map an index written by ``write_mapped`` as a search_router store dict."""
+    with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+        meta = json.load(f)
+    vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+    metadata_path = os.path.join(path, "metadata.npz")
+    sections_path = os.path.join(path, "sections.npz")
+    if os.path.exists(sections_path):
+        with np.load(sections_path) as sections:
+            index = MmapHierarchicalIndex(vectors, sections["bounds"], sections["centroids"], int(sections["fan_out"]))
+    else:
+        index = MmapFlatIndex(vectors)
+    return {
+        "chunks": CompactChunks.load(path, mmap=True),
+        "vectors": vectors,
+        "faiss": index,
+        "model_name": meta["model_name"],
+        "metadata": ChunkMetadata.load(metadata_path) if os.path.exists(metadata_path) else None,
+        "shared_dir": os.path.basename(path),
+    }
+
+
+class SharedIndexStore:
+    """
+    Dict-like key -> store mapping backed by ``root`` and shared across processes.
+
+    Assigning a store writes its data once to a new directory and points the
+    key at it in the catalog (under an flock, replaced atomically); assigning
+    a store that is already mapped only repoints the key, so many keys can
+    share one document. Readers re-read the catalog when its file changes and
+    map each directory once per process. Directories no longer referenced
+    are deleted on the next write; processes still mapping them keep valid
+    pages until they move on.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._catalog: Dict[str, Dict] = {}
+        self._catalog_stamp = None
+        self._mapped: Dict[str, Dict] = {}  # directory name -> store
+        self._lock = threading.Lock()
+
+    # -------------------------------------------------------------------------
+    # Catalog
+    # -------------------------------------------------------------------------
+    @contextmanager
+    def _write_lock(self):
+        with open(os.path.join(self.root, _LOCK), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _read_catalog(self) -> Dict[str, Dict]:
+        path = os.path.join(self.root, _CATALOG)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return {}
+        stamp = (st.st_mtime_ns, st.st_size, st.st_ino)
+        if stamp != self._catalog_stamp:
+            with open(path, encoding="utf-8") as f:
+                self._catalog = json.load(f)["keys"]
+            self._catalog_stamp = stamp
+            self._prune_mapped(self._catalog)
+        return self._catalog
+
+    def _prune_mapped(self, keys: Dict[str, Dict]):
+        """Drop this process's mappings of directories ``keys`` no longer references."""
+        live = {entry["dir"] for entry in keys.values()}
+        self._mapped = {d: s for d, s in self._mapped.items() if d in live}
+
+    def _write_catalog(self, keys: Dict[str, Dict]):
+        tmp = os.path.join(self.root, f"{_CATALOG}.tmp-{os.getpid()}")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"keys": keys}, f)
+        os.replace(tmp, os.path.join(self.root, _CATALOG))
+
+    def _collect_garbage(self, keys: Dict[str, Dict]):
+        live = {entry["dir"] for entry in keys.values()}
+        for e in os.scandir(self.root):
+            if e.is_dir() and e.name not in live and _INDEX_DIR.fullmatch(e.name):
+                shutil.rmtree(e.path, ignore_errors=True)
+
+    # -------------------------------------------------------------------------
+    # Mapping interface (what search_router uses on _INDICES)
+    # -------------------------------------------------------------------------
+    def __setitem__(self, key: str, store: Dict):
+        shared_dir, tmp = store.get("shared_dir"), None
+        while True:
+            if tmp is None and (shared_dir is None or not os.path.isdir(os.path.join(self.root, shared_dir))):
+                # Written outside the lock under a .tmp- name, which GC leaves alone
+                shared_dir = uuid.uuid4().hex
+                tmp = os.path.join(self.root, f"{shared_dir}.tmp-{os.getpid()}")
+                write_mapped(
+                    tmp, store["chunks"], store["vectors"], store["model_name"], store.get("metadata"), store.get("faiss")
+                )
+            with self._lock, self._write_lock():
+                if tmp is None and not os.path.isdir(os.path.join(self.root, shared_dir)):
+                    # Collected by another process since the check above (GC only
+                    # runs under this lock): write the data after all
+                    shared_dir = None
+                    continue
+                if tmp is not None:
+                    os.replace(tmp, os.path.join(self.root, shared_dir))
+                    # Later assignments of this same store (e.g. ingest cache binds) just alias it
+                    store["shared_dir"] = shared_dir
+                self._catalog_stamp = None
+                keys = dict(self._read_catalog())
+                keys[key] = {"dir": shared_dir, "model_name": store["model_name"], "n_chunks": len(store["chunks"])}
+                self._write_catalog(keys)
+                self._collect_garbage(keys)
+                self._prune_mapped(keys)
+            break
+        logger.info(f"Shared index {key} -> {shared_dir} ({len(store['chunks'])} chunks)")
+
+    def get(self, key: str, default=None) -> Optional[Dict]:
+        with self._lock:
+            entry = self._read_catalog().get(key)
+            if entry is None:
+                return default
+            store = self._mapped.get(entry["dir"])
+            if store is None:
+                try:
+                    store = self._mapped[entry["dir"]] = open_mapped(os.path.join(self.root, entry["dir"]))
+                except FileNotFoundError:
+                    return default  # replaced and collected concurrently
+            return store
+
+    def __getitem__(self, key: str) -> Dict:
+        store = self.get(key)
+        if store is None:
+            raise KeyError(key)
+        return store
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._read_catalog()
+
+    def keys(self):
+        with self._lock:
+            return list(self._read_catalog())
+
+    def items(self) -> Iterator[Tuple[str, Dict]]:
+        for key in self.keys():
+            store = self.get(key)
+            if store is not None:
+                yield key, store
+
+    def __len__(self) -> int:
+        return len(self.keys())
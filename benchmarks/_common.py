@@ -0,0 +1,165 @@
+# benchmarks/_common.py
+"""Shared helpers for the benchmark scripts: timing stats and synthetic data."""
+import json
+import random
+import subprocess
+import time
+import zlib
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+_WORDS = (
+    "agreement party effective date term payment invoice section clause liability "
+    "warranty notice termination confidential schedule appendix service delivery "
+    "customer supplier obligation period renewal amount fee law court dispute "
+    "data security policy report annual review budget revenue cost quarter"
+).split()
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """Summarise latency samples (seconds) as milliseconds."""
+    arr = np.asarray(samples, dtype=np.float64) * 1000.0
+    return {
+        "n": int(arr.size),
+        "mean_ms": round(float(arr.mean()), 4),
+        "p50_ms": round(float(np.percentile(arr, 50)), 4),
+        "p95_ms": round(float(np.percentile(arr, 95)), 4),
+        "p99_ms": round(float(np.percentile(arr, 99)), 4),
+    }
+
+
+def time_repeated(fn: Callable[[], object], repeat: int, warmup: int = 1) -> List[float]:
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def synthetic_text(n_words: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    sentences = []
+    remaining = n_words
+    while remaining > 0:
+        n = min(remaining, rng.randint(8, 20))
+        words = [rng.choice(_WORDS) for _ in range(n)]
+        sentences.append(" ".join(words).capitalize() + ".")
+        remaining -= n
+    return " ".join(sentences)
+
+
+def synthetic_pdf(n_pages: int, words_per_page: int = 400, seed: int = 0) -> bytes:
+    """
+    Build a minimal text-only PDF (Helvetica, one content stream per page)
+    without any third-party writer, so benchmarks run with only pypdf installed.
+    """
+    objects: List[bytes] = []
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    font_id = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    pages_id = add(b"")  # placeholder, filled in once page ids are known
+    page_ids = []
+    for p in range(n_pages):
+        text = synthetic_text(words_per_page, seed=seed * 100003 + p)
+        words = text.split()
+        lines = [" ".join(words[i:i + 12]) for i in range(0, len(words), 12)]
+        ops = [b"BT /F1 10 Tf 14 TL 40 800 Td"]
+        for line in lines:
+            safe = line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+            ops.append(b"(" + safe.encode("latin-1") + b") Tj T*")
+        ops.append(b"ET")
+        stream = zlib.compress(b"\n".join(ops))
+        content_id = add(
+            b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(stream) + stream + b"\nendstream"
+        )
+        page_ids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 842] "
+            b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>" % (pages_id, font_id, content_id)
+        ))
+    kids = b" ".join(b"%d 0 R" % i for i in page_ids)
+    objects[pages_id - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, n_pages)
+    catalog_id = add(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % i + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for off in offsets:
+        out += b"%010d 00000 n \n" % off
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1, catalog_id, xref
+    )
+    return bytes(out)
+
+
+def git_revision() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except Exception:
+        return None
+
+
+def write_json(result: dict, path: Optional[str]):
+    text = json.dumps(result, indent=2, sort_keys=True)
+    if path:
+        with open(path, "w") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+def build_tiny_causal_lm(
+    path: str, hidden: int = 256, layers: int = 4, heads: int = 4, seed: int = 0, arch: str = "gpt2"
+) -> str:
+    """
+    Save a randomly initialised GPT-2 (or, with ``arch="llama"``, Llama) style
+    model with a word-level tokenizer over the synthetic vocabulary to
+    ``path``, so LLM benchmarks run offline without downloading weights.
+    Returns ``path``.
+    """
+    import torch
+    from tokenizers import Tokenizer, models, pre_tokenizers, decoders
+    from transformers import GPT2Config, GPT2LMHeadModel, LlamaConfig, LlamaForCausalLM, PreTrainedTokenizerFast
+
+    specials = ["<pad>", "<unk>", "<bos>", "<eos>"]
+    vocab = specials + sorted(set(w.lower() for w in _WORDS)) + [w.capitalize() for w in sorted(set(_WORDS))]
+    vocab += list(".,:;?!-0123456789") + ["Q", "A", "Context", "Answer", "based", "only", "on", "the", "provided"]
+    vocab = list(dict.fromkeys(vocab))
+    tok = Tokenizer(models.WordLevel({v: i for i, v in enumerate(vocab)}, unk_token="<unk>"))
+    tok.pre_tokenizer = pre_tokenizers.WhitespaceSplit()
+    tok.decoder = decoders.WordPiece(prefix="##")  # joins word tokens with spaces
+    tokenizer = PreTrainedTokenizerFast(
+        tokenizer_object=tok, pad_token="<pad>", unk_token="<unk>", bos_token="<bos>", eos_token="<eos>",
+        model_input_names=["input_ids", "attention_mask"],
+    )
+
+    torch.manual_seed(seed)
+    special_ids = dict(
+        bos_token_id=tokenizer.bos_token_id, eos_token_id=tokenizer.eos_token_id,
+        pad_token_id=tokenizer.pad_token_id,
+    )
+    if arch == "llama":
+        # nn.Linear projections, like most current local checkpoints
+        model = LlamaForCausalLM(LlamaConfig(
+            vocab_size=len(vocab), hidden_size=hidden, intermediate_size=hidden * 8 // 3,
+            num_hidden_layers=layers, num_attention_heads=heads, num_key_value_heads=heads,
+            max_position_embeddings=2048, **special_ids,
+        ))
+    else:
+        model = GPT2LMHeadModel(GPT2Config(
+            vocab_size=len(vocab), n_embd=hidden, n_layer=layers, n_head=heads, n_positions=2048,
+            **special_ids,
+        ))
+    model.save_pretrained(path)
+    tokenizer.save_pretrained(path)
+    return path
@@ -0,0 +1,222 @@
+# benchmarks/cancellation.py
+"""
+Client-disconnect cancellation check.
+
+Opens streaming /api/llm/answer requests, reads a few chunks, drops the
+connection and then polls /metrics until the backend stops producing
+tokens (pdfchat_llm_stream_chunks_total stops moving), no generation is
+active and no backend stream is left open (pdfchat_llm_open_streams; a
+consumer stuck waiting for tokens stays open). Reports time-to-stop and the
+tokens generated after the disconnect; exits non-zero if generation kept
+going past --max-stop-s or a stream never finished.
+
+Use a slow mock backend so an uncancelled generation is obvious:
+
+    python -m benchmarks.cancellation --spawn --mock-tps 20 --mock-tokens 400
+
+``--local`` instead checks LocalModel's continuous-batching path in process
+(no server): a tiny random GPT-2 with one batch row, --concurrency streams,
+all cancelled after --cancel-after-s while all but one are still queued in
+the scheduler. Every stream must end within --max-stop-s:
+
+    python -m benchmarks.cancellation --local --concurrency 4
+"""
+import argparse
+import asyncio
+import re
+import sys
+import tempfile
+import threading
+import time
+
+import httpx
+
+from benchmarks._common import build_tiny_causal_lm, percentiles, synthetic_text, write_json, git_revision
+from benchmarks.load_test import _spawn_backend, _wait_ready
+
+_SAMPLE = re.compile(
+    r"^(pdfchat_llm_stream_chunks_total|pdfchat_llm_active_generations|pdfchat_llm_cancelled_total"
+    r"|pdfchat_llm_open_streams)\{[^}]*\} (\S+)$"
+)
+
+
+async def _scrape(client: httpx.AsyncClient, base: str) -> dict:
+    r = await client.get(f"{base}/metrics")
+    r.raise_for_status()
+    totals = {"pdfchat_llm_stream_chunks_total": 0.0, "pdfchat_llm_active_generations": 0.0,
+              "pdfchat_llm_cancelled_total": 0.0, "pdfchat_llm_open_streams": 0.0}
+    for line in r.text.splitlines():
+        m = _SAMPLE.match(line)
+        if m:
+            totals[m.group(1)] += float(m.group(2))
+    return totals
+
+
+async def _disconnect_after(client: httpx.AsyncClient, base: str, question: str, n_chunks: int):
+    payload = {"context": synthetic_text(200, seed=3), "question": question}
+    async with client.stream("POST", f"{base}/api/llm/answer", json=payload) as r:
+        r.raise_for_status()
+        seen = 0
+        async for chunk in r.aiter_raw():
+            if chunk:
+                seen += 1
+                if seen >= n_chunks:
+                    break
+    # Leaving the context manager closes the connection mid-stream
+
+
+async def _one_trial(client: httpx.AsyncClient, args, trial: int) -> dict:
+    before = await _scrape(client, args.url)
+    await asyncio.gather(*(
+        _disconnect_after(client, args.url, f"cancel trial {trial} user {u}", args.read_chunks)
+        for u in range(args.concurrency)
+    ))
+    disconnected_at = time.perf_counter()
+    at_disconnect = await _scrape(client, args.url)
+
+    last, last_change = at_disconnect, disconnected_at
+    deadline = disconnected_at + args.timeout
+    while time.perf_counter() < deadline:
+        await asyncio.sleep(args.poll_s)
+        now = await _scrape(client, args.url)
+        if now["pdfchat_llm_stream_chunks_total"] != last["pdfchat_llm_stream_chunks_total"]:
+            last_change = time.perf_counter()
+        last = now
+        idle = now["pdfchat_llm_active_generations"] == 0 and now["pdfchat_llm_open_streams"] == 0
+        if idle and time.perf_counter() - last_change >= args.settle_s:
+            break
+
+    return {
+        "stop_seconds": last_change - disconnected_at,
+        "tokens_after_disconnect": last["pdfchat_llm_stream_chunks_total"] - at_disconnect["pdfchat_llm_stream_chunks_total"],
+        "tokens_total": last["pdfchat_llm_stream_chunks_total"] - before["pdfchat_llm_stream_chunks_total"],
+        "cancelled": last["pdfchat_llm_cancelled_total"] - before["pdfchat_llm_cancelled_total"],
+        "active_after": last["pdfchat_llm_active_generations"],
+        "open_streams_after": last["pdfchat_llm_open_streams"],
+    }
+
+
+async def run(args) -> dict:
+    async with httpx.AsyncClient(timeout=args.timeout) as client:
+        await _wait_ready(client, args.url, args.ready_timeout)
+        trials = [await _one_trial(client, args, t) for t in range(args.trials)]
+
+    stop = [t["stop_seconds"] for t in trials]
+    return {
+        "benchmark": "cancellation",
+        "revision": git_revision(),
+        "trials": args.trials,
+        "concurrency": args.concurrency,
+        "read_chunks": args.read_chunks,
+        "mock_tokens": args.mock_tokens if args.spawn else None,
+        "stop_seconds": percentiles(stop),
+        "tokens_after_disconnect": sum(t["tokens_after_disconnect"] for t in trials),
+        "tokens_total": sum(t["tokens_total"] for t in trials),
+        "cancelled": sum(t["cancelled"] for t in trials),
+        "active_after": max(t["active_after"] for t in trials),
+        "open_streams_after": max(t["open_streams_after"] for t in trials),
+        "max_stop_s": args.max_stop_s,
+        "passed": max(stop) <= args.max_stop_s
+                  and all(t["active_after"] == 0 and t["open_streams_after"] == 0 for t in trials),
+    }
+
+
+def run_local(args) -> dict:
+    """Cancel LocalModel streams while they wait in the batch scheduler's queue."""
+    from backend.api.llm_router import build_optimized_prompt
+    from backend.core.cancellation import CancellationToken
+    from backend.core.config import ChatBotEnvConfig
+    from backend.models.local_model import LocalModel
+
+    model = LocalModel(ChatBotEnvConfig(
+        model_id=build_tiny_causal_lm(tempfile.mkdtemp(prefix="tiny_lm_")),
+        embedding_model_id=args.embedding_model,
+        max_tokens=args.local_max_tokens,
+        local_max_batch_size=1,  # one row: every other stream waits in the queue
+        local_prefix_cache_mb=0,
+    ))
+    context = synthetic_text(200, seed=3)
+    trials = []
+    for trial in range(args.trials):
+        tokens = [CancellationToken() for _ in range(args.concurrency)]
+        chunks = [0] * args.concurrency
+        ended_at = [None] * args.concurrency
+
+        def consume(u: int):
+            prompt = build_optimized_prompt(context, f"cancel trial {trial} user {u}")
+            for _ in model.generate_stream(prompt, tokens[u]):
+                chunks[u] += 1
+            ended_at[u] = time.perf_counter()
+
+        threads = [threading.Thread(target=consume, args=(u,), daemon=True) for u in range(args.concurrency)]
+        for t in threads:
+            t.start()
+        time.sleep(args.cancel_after_s)
+        queued = model.scheduler.queue_length
+        cancelled_at = time.perf_counter()
+        for token in tokens:
+            token.cancel()
+        for t in threads:
+            t.join(timeout=max(0.0, cancelled_at + args.max_stop_s - time.perf_counter()))
+        trials.append({
+            "queued_at_cancel": queued,
+            "ended": sum(1 for e in ended_at if e is not None),
+            "stop_seconds": max((e - cancelled_at for e in ended_at if e is not None), default=0.0),
+            "tokens_total": sum(chunks),
+        })
+        # Let streams that missed the deadline finish before the next trial
+        for t in threads:
+            t.join(timeout=args.timeout)
+
+    return {
+        "benchmark": "cancellation_local",
+        "revision": git_revision(),
+        "trials": trials,
+        "concurrency": args.concurrency,
+        "cancel_after_s": args.cancel_after_s,
+        "max_stop_s": args.max_stop_s,
+        "stop_seconds": percentiles([t["stop_seconds"] for t in trials]),
+        "passed": all(t["ended"] == args.concurrency for t in trials),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8094")
+    parser.add_argument("--trials", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=2)
+    parser.add_argument("--read-chunks", type=int, default=5)
+    parser.add_argument("--max-stop-s", type=float, default=1.0, help="allowed time from disconnect to last token")
+    parser.add_argument("--poll-s", type=float, default=0.1)
+    parser.add_argument("--settle-s", type=float, default=1.0)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--spawn", action="store_true", help="start a mock backend on --url")
+    parser.add_argument("--local", action="store_true", help="check LocalModel's batching scheduler in process instead")
+    parser.add_argument("--cancel-after-s", type=float, default=0.2, help="--local: cancel this long after starting")
+    parser.add_argument("--local-max-tokens", type=int, default=1500, help="--local: MAX_TOKENS, longer than --cancel-after-s")
+    parser.add_argument("--embedding-model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--mock-ttft-ms", type=float, default=100)
+    parser.add_argument("--mock-tps", type=float, default=20)
+    parser.add_argument("--mock-tokens", type=int, default=400)
+    parser.add_argument("--ready-timeout", type=float, default=300.0)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    if args.local:
+        result = run_local(args)
+        write_json(result, args.output)
+        sys.exit(0 if result["passed"] else 1)
+
+    proc = _spawn_backend(args) if args.spawn else None
+    try:
+        result = asyncio.run(run(args))
+        write_json(result, args.output)
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=10)
+    sys.exit(0 if result["passed"] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+# benchmarks/chunk_store_memory.py
+"""
+Memory of chunk texts as a Python list[str] versus CompactChunks (the
+document text once as a UTF-8 buffer, with start/end offsets per chunk),
+per 100k chunks.
+
+Splits synthetic text with the production splitter (lc_split_spans) and
+measures the list as the list object plus every str object, and
+CompactChunks as its buffer plus offset arrays. Also times materialising a
+top-k lookup.
+
+    python -m benchmarks.chunk_store_memory --chunks 100000 --chunk-size 1000 --overlap 100
+"""
+import argparse
+import random
+import sys
+
+from benchmarks._common import git_revision, percentiles, synthetic_text, time_repeated, write_json
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=100000)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--overlap", type=int, default=100)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    from backend.services.chunk_and_vectorize import lc_split_spans
+    from backend.services.chunk_store import CompactChunks
+
+    # Roughly 7.9 characters of chunk text per synthetic word (incl. separators)
+    words = int(args.chunks * (args.chunk_size - args.overlap) / 7.9)
+    text = synthetic_text(words, seed=0)
+    chunks, starts = lc_split_spans(text, chunk_size=args.chunk_size, overlap=args.overlap)
+    compact = CompactChunks.from_text(text, starts, [len(c) for c in chunks])
+    assert all(compact[i] == chunks[i] for i in range(len(chunks)))
+
+    list_bytes = sys.getsizeof(chunks) + sum(sys.getsizeof(c) for c in chunks)
+    text_bytes = sum(len(c.encode("utf-8")) for c in chunks)
+    scale = 100000 / len(chunks)
+    rng = random.Random(0)
+    ids = [[rng.randrange(len(chunks)) for _ in range(args.top_k)] for _ in range(200)]
+    it = iter(range(10**9))
+
+    def lookup(store):
+        return lambda: [store[i] for i in ids[next(it) % len(ids)]]
+
+    write_json({
+        "revision": git_revision(),
+        "params": vars(args),
+        "n_chunks": len(chunks),
+        "per_100k_chunks_mb": {
+            "list": round(list_bytes * scale / 2**20, 1),
+            "compact": round(compact.nbytes * scale / 2**20, 1),
+            "chunk_text_utf8": round(text_bytes * scale / 2**20, 1),
+        },
+        "compact_vs_list": round(compact.nbytes / list_bytes, 3),
+        "top_k_lookup": {
+            "list": percentiles(time_repeated(lookup(chunks), 200)),
+            "compact": percentiles(time_repeated(lookup(compact), 200)),
+        },
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
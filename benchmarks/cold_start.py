@@ -0,0 +1,94 @@
+# benchmarks/cold_start.py
+"""
+Measure backend cold-start time.
+
+Reports, over several fresh processes:
+  - import_s: time to `import backend.main`
+  - live_s:   time from process launch until /health/live answers 200
+  - ready_s:  time from process launch until /health/ready answers 200
+
+Usage:
+    python -m benchmarks.cold_start --runs 3 --port 8091
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def time_import() -> float:
+    code = "import time; t=time.perf_counter(); import backend.main; print(time.perf_counter()-t)"
+    out = subprocess.run(
+        [sys.executable, "-c", code], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+    )
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def _status(url: str) -> int:
+    try:
+        with urllib.request.urlopen(url, timeout=1) as resp:
+            return resp.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except (urllib.error.URLError, ConnectionError, TimeoutError):
+        return 0
+
+
+def time_server(port: int, timeout: float) -> dict:
+    base = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=REPO_ROOT,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    live_s = ready_s = None
+    try:
+        while time.perf_counter() - start < timeout:
+            if live_s is None and _status(f"{base}/health/live") == 200:
+                live_s = time.perf_counter() - start
+            if live_s is not None and _status(f"{base}/health/ready") == 200:
+                ready_s = time.perf_counter() - start
+                break
+            time.sleep(0.05)
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+    return {"live_s": live_s, "ready_s": ready_s}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--port", type=int, default=8091)
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--skip-server", action="store_true", help="only time the import")
+    args = parser.parse_args()
+
+    results = {"import_s": [], "live_s": [], "ready_s": []}
+    for _ in range(args.runs):
+        results["import_s"].append(time_import())
+        if not args.skip_server:
+            timings = time_server(args.port, args.timeout)
+            for k, v in timings.items():
+                if v is not None:
+                    results[k].append(v)
+
+    summary = {
+        k: {"median": round(statistics.median(v), 4), "min": round(min(v), 4), "runs": len(v)}
+        for k, v in results.items() if v
+    }
+    summary["model_type"] = os.getenv("MODEL_TYPE", "api")
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
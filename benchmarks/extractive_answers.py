@@ -0,0 +1,131 @@
+# benchmarks/extractive_answers.py
+"""
+Extractive fast path of /api/ask: the fraction of questions it serves
+without the LLM and the latency saved.
+
+Indexes a synthetic document with planted facts ("The effective date of the
+agreement is ...") and asks two kinds of question through /api/ask (in
+process): lookups that paraphrase a planted fact, and open questions that
+need generation. Every question is asked with ``extractive`` off and on.
+Reports, per kind, the fast-path fraction, how many fast-path answers are the
+planted sentence, and latency with and without the fast path; ``saved_s`` is
+the total time saved over all questions.
+
+Uses the configured embedding model (EMBEDDING_MODEL) and MODEL_TYPE=mock
+unless MODEL_TYPE is set (MOCK_TTFT_MS / MOCK_TOKENS_PER_SECOND shape the
+simulated generation). Answers are returned as JSON (STREAM_MESSAGE=false).
+
+    python -m benchmarks.extractive_answers --threshold 0.7
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+from benchmarks._common import git_revision, percentiles, synthetic_text, write_json
+
+# (planted sentence, paraphrased lookup question)
+FACTS = [
+    ("The effective date of the agreement is 1 March 2024.", "What is the effective date of the agreement?"),
+    ("The supplier must deliver the goods within 14 days of an order.", "How many days does the supplier have to deliver an order?"),
+    ("Invoices are payable within 30 days of receipt.", "When are invoices payable?"),
+    ("Either party may terminate the agreement with 90 days written notice.", "How much notice is needed to terminate the agreement?"),
+    ("The total liability of the supplier is capped at the annual fees.", "What is the cap on the supplier's liability?"),
+    ("This agreement is governed by the laws of England and Wales.", "Which law governs the agreement?"),
+    ("The initial term of the agreement is three years.", "How long is the initial term?"),
+    ("Confidential information must be kept secret for five years after termination.", "How long must confidential information be kept secret?"),
+]
+OPEN_QUESTIONS = [
+    "Summarise the main obligations of both parties.",
+    "What are the risks for the customer under this agreement?",
+    "Explain how disputes between the parties are handled.",
+    "Compare the payment and termination provisions.",
+]
+
+
+def _document(words_between: int) -> str:
+    parts = []
+    for i, (fact, _) in enumerate(FACTS):
+        parts.append(synthetic_text(words_between, seed=i))
+        parts.append(fact)
+    parts.append(synthetic_text(words_between, seed=len(FACTS)))
+    return "\n".join(parts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threshold", type=float, help="EXTRACTIVE_THRESHOLD (default: configured)")
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--words-between", type=int, default=400, help="filler words between planted facts")
+    parser.add_argument("--repeat", type=int, default=1, help="times each question is asked per mode")
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    os.environ.setdefault("MODEL_TYPE", "mock")
+    os.environ["STREAM_MESSAGE"] = "false"
+    from fastapi.testclient import TestClient
+    from backend.api import search_router
+    from backend.core.app_state import config
+    from backend.core.embeddings import embed_texts
+    from backend.main import app
+    from backend.services.chunk_and_vectorize import lc_split
+    from backend.services.ingest_cache import make_store
+
+    if args.threshold is not None:
+        config.extractive_threshold = args.threshold
+    chunks = lc_split(_document(args.words_between), chunk_size=config.chunk_size, overlap=config.overlap)
+    vectors = embed_texts(chunks, config.embedding_model_id)
+    search_router.publish_index("bench/extractive", make_store(chunks, vectors, config.embedding_model_id))
+    client = TestClient(app)
+
+    def ask(question: str, extractive: bool):
+        start = time.perf_counter()
+        r = client.post("/api/ask", json={
+            "key": "bench/extractive", "question": question, "top_k": args.top_k, "extractive": extractive,
+        })
+        r.raise_for_status()
+        return time.perf_counter() - start, r.json()
+
+    ask("warm-up", False)
+    result = {
+        "revision": git_revision(),
+        "params": vars(args) | {
+            "embedding_model": config.embedding_model_id,
+            "model_type": os.environ["MODEL_TYPE"],
+            "threshold": config.extractive_threshold,
+            "chunks": len(chunks),
+        },
+    }
+    saved = 0.0
+    n_questions = n_fast = 0
+    for kind, questions in (("lookup", FACTS), ("open", [(None, q) for q in OPEN_QUESTIONS])):
+        llm_s, fast_s, fast, correct, scores = [], [], 0, 0, []
+        for expected, question in questions * args.repeat:
+            without, _ = ask(question, False)
+            with_fast_path, body = ask(question, True)
+            llm_s.append(without)
+            fast_s.append(with_fast_path)
+            saved += without - with_fast_path
+            if "extractive" in body:
+                fast += 1
+                scores.append(body["extractive"]["score"])
+                correct += int(expected is not None and body["answer"] == expected)
+        n_questions += len(llm_s)
+        n_fast += fast
+        result[kind] = {
+            "questions": len(llm_s),
+            "fast_path_fraction": round(fast / len(llm_s), 4),
+            "fast_path_correct": correct,
+            "mean_fast_path_score": round(float(np.mean(scores)), 4) if scores else None,
+            "without_fast_path": percentiles(llm_s),
+            "with_fast_path": percentiles(fast_s),
+        }
+    result["fast_path_fraction"] = round(n_fast / n_questions, 4)
+    result["saved_s"] = round(saved, 3)
+    result["saved_per_question_ms"] = round(saved / n_questions * 1000, 2)
+    write_json(result, args.output)
+
+
+if __name__ == "__main__":
+    main()
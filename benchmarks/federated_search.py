@@ -0,0 +1,84 @@
+# benchmarks/federated_search.py
+"""
+Latency of one federated query over many index keys versus querying each
+key separately.
+
+Registers synthetic indices (random unit vectors, ``--chunks`` per key) in
+search_router's index table and, for each key count, times
+``retrieve_many`` (one embedding, parallel searches, heap merge) against
+sequential ``retrieve`` calls per key, as a client looping over its PDFs
+would do. Uses the configured embedding model (EMBEDDING_MODEL).
+
+    python -m benchmarks.federated_search --keys 1,2,4,8,16 --chunks 20000
+"""
+import argparse
+import asyncio
+import time
+
+import numpy as np
+
+from benchmarks._common import git_revision, percentiles, synthetic_text, write_json
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--keys", default="1,2,4,8,16", help="comma-separated key counts")
+    parser.add_argument("--chunks", type=int, default=20000, help="chunks per key")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    from backend.api import search_router
+    from backend.core.app_state import config
+    from backend.core.embeddings import embed_text
+    from backend.services.ingest_cache import make_store
+
+    key_counts = [int(x) for x in args.keys.split(",") if x]
+    dim = embed_text("warm-up", config.embedding_model_id).shape[-1]
+    rng = np.random.default_rng(0)
+    chunks = [f"chunk {i}" for i in range(args.chunks)]
+    all_keys = [f"bench/{i}" for i in range(max(key_counts))]
+    for key in all_keys:
+        vectors = rng.standard_normal((args.chunks, dim), dtype=np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        search_router._INDICES[key] = make_store(chunks, vectors, config.embedding_model_id)
+    queries = [synthetic_text(12, seed=i) for i in range(args.repeat)]
+
+    async def sequential(keys, query):
+        return [await search_router.retrieve(key, query, args.top_k) for key in keys]
+
+    async def timed(fn, keys):
+        await fn(keys, "warm-up")
+        samples = []
+        for query in queries:
+            start = time.perf_counter()
+            await fn(keys, query)
+            samples.append(time.perf_counter() - start)
+        return percentiles(samples)
+
+    async def run():
+        rows = []
+        for n in key_counts:
+            keys = all_keys[:n]
+            rows.append({
+                "keys": n,
+                "federated": await timed(lambda k, q: search_router.retrieve_many(k, q, args.top_k), keys),
+                "sequential": await timed(sequential, keys),
+            })
+        return rows
+
+    rows = asyncio.run(run())
+    base = rows[0]["federated"]["p50_ms"]
+    for row in rows:
+        row["federated_p50_vs_one_key"] = round(row["federated"]["p50_ms"] / base, 2)
+    write_json({
+        "revision": git_revision(),
+        "params": vars(args) | {"embedding_model": config.embedding_model_id, "dim": dim},
+        "search_threads": search_router.search_executor._max_workers,
+        "results": rows,
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
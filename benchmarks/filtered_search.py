@@ -0,0 +1,83 @@
+# benchmarks/filtered_search.py
+"""
+Cost of metadata-filtered search pushed into FAISS versus unfiltered search
+and versus over-fetching then discarding non-matching results.
+
+Builds one synthetic index (random unit vectors, ``--pages`` pages of equal
+size) with ChunkMetadata columns, then times queries restricted to page
+ranges covering different fractions of the document. The over-fetch
+baseline searches ``--overfetch`` x top_k and keeps the matching hits;
+its recall is how many of the exact filtered top-k it still finds.
+
+    python -m benchmarks.filtered_search --chunks 100000 --fractions 0.01,0.1,0.5
+"""
+import argparse
+
+import numpy as np
+
+from benchmarks._common import git_revision, percentiles, time_repeated, write_json
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--pages", type=int, default=2000)
+    parser.add_argument("--fractions", default="0.01,0.1,0.5", help="fraction of pages matched by the filter")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--overfetch", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    from backend.services.chunk_metadata import ChunkMetadata
+    from backend.services.retrieval import FaissIndexWrapper
+
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((args.chunks, args.dim), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    pages = (np.arange(args.chunks) * args.pages // args.chunks + 1).astype(np.int32)
+    metadata = ChunkMetadata.for_document("bench.pdf", args.chunks, pages=pages)
+    index = FaissIndexWrapper(vectors)
+    queries = rng.standard_normal((args.queries, args.dim), dtype=np.float32)
+    it = iter(range(10**9))
+
+    def next_query():
+        return queries[next(it) % len(queries)]
+
+    result = {
+        "revision": git_revision(),
+        "params": vars(args),
+        "unfiltered": percentiles(time_repeated(lambda: index.search(next_query(), args.top_k), args.queries)),
+        "filters": [],
+    }
+    for fraction in (float(x) for x in args.fractions.split(",") if x):
+        last_page = max(1, int(args.pages * fraction))
+        filters = {"pages": [(1, last_page)]}
+
+        def pushed_down():
+            return index.search(next_query(), args.top_k, allowed=metadata.select(**filters))
+
+        def overfetch(q=None):
+            q = next_query() if q is None else q
+            keep = metadata.mask(**filters)
+            _, I = index.search(q, args.top_k * args.overfetch)
+            return [i for i in I[0] if i >= 0 and keep[i]][:args.top_k]
+
+        recall = []
+        for q in queries:
+            _, exact = index.search(q, args.top_k, allowed=metadata.select(**filters))
+            recall.append(len(set(exact[0]) & set(overfetch(q))) / args.top_k)
+        result["filters"].append({
+            "pages": [1, last_page],
+            "matching_chunks": int(metadata.mask(**filters).sum()),
+            "pushed_down": percentiles(time_repeated(pushed_down, args.queries)),
+            "overfetch": percentiles(time_repeated(overfetch, args.queries)),
+            "overfetch_recall": round(float(np.mean(recall)), 4),
+        })
+
+    write_json(result, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# benchmarks/hierarchical_retrieval.py
+"""
+Query latency and recall of HierarchicalIndex versus the flat FaissIndexWrapper.
+
+Builds synthetic corpora shaped like a long document: sections of
+consecutive chunks share a topic (chunk vectors are a section topic plus
+noise, L2-normalised like sentence embeddings), and queries are noisy
+copies of random chunks. Recall@k is the overlap of each hierarchical
+result with the exact flat top-k.
+
+    python -m benchmarks.hierarchical_retrieval --chunks 20000,100000 --fan-out 4,8,16,32
+"""
+import argparse
+
+import numpy as np
+
+from benchmarks._common import git_revision, percentiles, time_repeated, write_json
+
+
+def _ints(raw: str):
+    return [int(x) for x in raw.split(",") if x]
+
+
+def synthetic_corpus(n_chunks: int, dim: int, section_size: int, noise: float, seed: int):
+    rng = np.random.default_rng(seed)
+    n_sections = -(-n_chunks // section_size)
+    topics = rng.standard_normal((n_sections, dim), dtype=np.float32)
+    vectors = np.repeat(topics, section_size, axis=0)[:n_chunks]
+    vectors += noise * rng.standard_normal(vectors.shape, dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def noisy_queries(vectors: np.ndarray, n: int, noise: float, seed: int):
+    rng = np.random.default_rng(seed + 1)
+    q = vectors[rng.integers(0, len(vectors), n)].copy()
+    q += noise * rng.standard_normal(q.shape, dtype=np.float32) / np.sqrt(q.shape[1])
+    q /= np.linalg.norm(q, axis=1, keepdims=True)
+    return q
+
+
+def _latency(search, queries) -> dict:
+    it = iter(range(len(queries) * 2))
+    return percentiles(time_repeated(lambda: search(queries[next(it) % len(queries)]), repeat=len(queries)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", default="20000,100000", help="comma-separated corpus sizes")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--section-size", type=int, default=64)
+    parser.add_argument("--fan-out", default="4,8,16,32", help="comma-separated fan-outs to compare")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--noise", type=float, default=2.5, help="chunk spread around its section topic")
+    parser.add_argument("--query-noise", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    from backend.services.retrieval import FaissIndexWrapper, HierarchicalIndex
+
+    result = {"revision": git_revision(), "params": vars(args), "corpora": []}
+    for n_chunks in _ints(args.chunks):
+        vectors = synthetic_corpus(n_chunks, args.dim, args.section_size, args.noise, args.seed)
+        queries = noisy_queries(vectors, args.queries, args.query_noise, args.seed)
+        flat = FaissIndexWrapper(vectors)
+        hier = HierarchicalIndex(vectors, section_size=args.section_size)
+        _, truth = flat.search(queries, args.top_k)
+
+        corpus = {
+            "chunks": n_chunks,
+            "sections": hier.n_sections,
+            "flat": {"latency": _latency(lambda q: flat.search(q, args.top_k), queries)},
+            "hierarchical": [],
+        }
+        for fan_out in _ints(args.fan_out):
+            _, found = hier.search(queries, args.top_k, fan_out=fan_out)
+            recall = np.mean([len(set(t) & set(f)) / args.top_k for t, f in zip(truth, found)])
+            corpus["hierarchical"].append({
+                "fan_out": fan_out,
+                "searched_fraction": round(min(fan_out * args.section_size, n_chunks) / n_chunks, 5),
+                "recall_at_k": round(float(recall), 4),
+                "latency": _latency(lambda q: hier.search(q, args.top_k, fan_out=fan_out), queries),
+            })
+        result["corpora"].append(corpus)
+        del flat, hier, vectors
+
+    write_json(result, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+# benchmarks/load_test.py
+"""
+HTTP load test: concurrent virtual users asking questions against a backend.
+
+Each virtual user loops until --duration elapses, asking either with one
+fused POST /api/ask (--mode ask, the default) or with POST /api/search/query
+followed by POST /api/llm/answer with the matched context (--mode two-step);
+answers are streamed when the backend has STREAM_MESSAGE=true. Reports throughput and search latency, TTFT and
+end-to-end latency percentiles as JSON.
+
+Fully offline with --spawn, which starts uvicorn with MODEL_TYPE=mock
+(see backend/models/mock_model.py) and ingests a synthetic document first:
+
+    python -m benchmarks.load_test --spawn --users 32 --duration 30 \\
+        --embedding-model all-MiniLM-L6-v2 --mock-ttft-ms 200 --mock-tps 50
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+from backend.core.streaming import NDJSON_MEDIA_TYPE, EventStreamDecoder
+from benchmarks._common import percentiles, synthetic_text, write_json, git_revision
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+async def _wait_ready(client: httpx.AsyncClient, base: str, timeout: float):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            r = await client.get(f"{base}/health/ready")
+            if r.status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise TimeoutError(f"backend at {base} not ready after {timeout}s")
+
+
+async def _ingest(client: httpx.AsyncClient, base: str, key: str, words: int):
+    text = synthetic_text(words, seed=7)
+    r = await client.post(f"{base}/api/chunk", json={"text": text})
+    r.raise_for_status()
+    data = r.json()
+    r = await client.post(f"{base}/api/search/build_index", json={
+        "key": key, "chunks": data["chunks"], "vectors": data["vectors"], "model_name": data.get("model_name"),
+    })
+    r.raise_for_status()
+    return len(data["chunks"])
+
+
+async def _virtual_user(uid: int, client: httpx.AsyncClient, args, stats: dict, stop_at: float):
+    i = 0
+    while time.perf_counter() < stop_at:
+        question = synthetic_text(10, seed=uid * 10007 + i)
+        i += 1
+        start = time.perf_counter()
+        try:
+            if args.mode == "ask":
+                url, payload = f"{args.url}/api/ask", {"key": args.key, "question": question, "top_k": args.top_k}
+            else:
+                r = await client.post(f"{args.url}/api/search/query",
+                                      json={"key": args.key, "query": question, "top_k": args.top_k})
+                r.raise_for_status()
+                searched = time.perf_counter()
+                stats["search"].append(searched - start)
+                context = "\n\n---\n\n".join(r.json().get("matches", []))
+                url, payload = f"{args.url}/api/llm/answer", {"context": context, "question": question}
+
+            first = None
+            n_bytes = 0
+            async with client.stream("POST", url, json=payload) as resp:
+                resp.raise_for_status()
+                # NDJSON streams start with a meta event: TTFT is the first delta
+                decoder = EventStreamDecoder() if resp.headers.get("content-type", "").startswith(NDJSON_MEDIA_TYPE) else None
+                async for chunk in resp.aiter_bytes():
+                    if chunk and first is None:
+                        if decoder is None or any(e["type"] == "delta" for e in decoder.feed(chunk)):
+                            first = time.perf_counter()
+                    n_bytes += len(chunk)
+            end = time.perf_counter()
+            if first is not None:
+                stats["ttft"].append(first - start)
+            stats["e2e"].append(end - start)
+            stats["bytes"] += n_bytes
+        except Exception as e:
+            stats["errors"] += 1
+            stats["last_error"] = repr(e)
+
+
+async def run(args) -> dict:
+    limits = httpx.Limits(max_connections=args.users * 2, max_keepalive_connections=args.users * 2)
+    async with httpx.AsyncClient(timeout=args.request_timeout, limits=limits) as client:
+        await _wait_ready(client, args.url, args.ready_timeout)
+        n_chunks = await _ingest(client, args.url, args.key, args.doc_words) if args.ingest else None
+
+        stats = {"search": [], "ttft": [], "e2e": [], "bytes": 0, "errors": 0, "last_error": None}
+        start = time.perf_counter()
+        stop_at = start + args.duration
+        await asyncio.gather(*(_virtual_user(u, client, args, stats, stop_at) for u in range(args.users)))
+        elapsed = time.perf_counter() - start
+
+    completed = len(stats["e2e"])
+    return {
+        "revision": git_revision(),
+        "params": {
+            "mode": args.mode,
+            "users": args.users,
+            "duration_s": args.duration,
+            "top_k": args.top_k,
+            "mock_ttft_ms": args.mock_ttft_ms,
+            "mock_tps": args.mock_tps,
+            "doc_chunks": n_chunks,
+        },
+        "completed": completed,
+        "errors": stats["errors"],
+        "last_error": stats["last_error"],
+        "throughput_rps": round(completed / elapsed, 3),
+        "answer_bytes_per_s": round(stats["bytes"] / elapsed, 1),
+        "search": percentiles(stats["search"]) if stats["search"] else None,
+        "ttft": percentiles(stats["ttft"]) if stats["ttft"] else None,
+        "e2e": percentiles(stats["e2e"]) if stats["e2e"] else None,
+    }
+
+
+def _spawn_backend(args) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "MODEL_TYPE": "mock",
+        "STREAM_MESSAGE": "true",
+        "MOCK_TTFT_MS": str(args.mock_ttft_ms),
+        "MOCK_TOKENS_PER_SECOND": str(args.mock_tps),
+        "MOCK_OUTPUT_TOKENS": str(args.mock_tokens),
+        "EMBEDDING_MODEL": args.embedding_model,
+        "HF_HUB_OFFLINE": "1",
+        "TRANSFORMERS_OFFLINE": "1",
+        "CUDA_VISIBLE_DEVICES": "",
+    }
+    port = args.url.rsplit(":", 1)[-1]
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app", "--host", "127.0.0.1", "--port", port,
+         "--log-level", "warning"],
+        cwd=REPO_ROOT, env=env,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8092")
+    parser.add_argument("--users", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--mode", choices=("ask", "two-step"), default="ask")
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--key", default="loadtest")
+    parser.add_argument("--doc-words", type=int, default=20_000)
+    parser.add_argument("--no-ingest", dest="ingest", action="store_false")
+    parser.add_argument("--spawn", action="store_true", help="start a mock backend on --url")
+    parser.add_argument("--embedding-model", default=os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2"))
+    parser.add_argument("--mock-ttft-ms", type=float, default=200)
+    parser.add_argument("--mock-tps", type=float, default=50)
+    parser.add_argument("--mock-tokens", type=int, default=64)
+    parser.add_argument("--request-timeout", type=float, default=120.0)
+    parser.add_argument("--ready-timeout", type=float, default=300.0)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    proc = _spawn_backend(args) if args.spawn else None
+    try:
+        write_json(asyncio.run(run(args)), args.output)
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=10)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+# benchmarks/local_batching.py
+"""
+Aggregate tokens/second of LocalModel with continuous batching versus the
+per-request generate path, for N concurrent streaming clients on CPU.
+
+By default a tiny random GPT-2 is built locally (no download), which keeps
+the benchmark offline; pass --model to use a real checkpoint.
+
+Also checks that scheduler failure paths end their streams instead of
+hanging: a request cancelled while still queued, and a prompt longer than
+the model's context (its prefill fails) next to a normal one. Exits
+non-zero if either check fails.
+
+    python -m benchmarks.local_batching --clients 8 --max-tokens 64
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks._common import build_tiny_causal_lm, synthetic_text, write_json, git_revision
+
+
+def _run_clients(model, prompts):
+    results = [None] * len(prompts)
+    ttfts = [None] * len(prompts)
+
+    def client(i):
+        start = time.perf_counter()
+        pieces = []
+        for piece in model.generate_stream(prompts[i]):
+            if not pieces:
+                ttfts[i] = time.perf_counter() - start
+            pieces.append(piece)
+        results[i] = "".join(pieces)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(len(prompts))]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results, ttfts, time.perf_counter() - start
+
+
+def _finishes(stream, timeout: float) -> dict:
+    """Consume ``stream`` in a thread; report whether it ended (or raised) within ``timeout``."""
+    outcome = {"ended": False, "error": None}
+
+    def consume():
+        try:
+            for _ in stream:
+                pass
+        except Exception as e:
+            outcome["error"] = type(e).__name__
+        outcome["ended"] = True
+
+    thread = threading.Thread(target=consume, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    return outcome
+
+
+def _check_failure_paths(model, prompts, max_batch_size: int, timeout: float) -> dict:
+    scheduler = model.scheduler
+    max_tokens, temperature = model.config.max_tokens, model.config.temperature
+    # Fill every row so the next request has to wait in the queue
+    running = [scheduler.submit(prompts[i % len(prompts)], max_tokens, temperature) for i in range(max_batch_size)]
+    queued = scheduler.submit(prompts[0], max_tokens, temperature)
+    queued.cancel()
+    cancelled = _finishes(scheduler.stream(queued), timeout)
+    for request in running:
+        _finishes(scheduler.stream(request), timeout)
+
+    n_positions = getattr(model.model.config, "n_positions", None) or model.model.config.max_position_embeddings
+    overlong = scheduler.submit(synthetic_text(n_positions * 2, seed=99), max_tokens, temperature)
+    normal = scheduler.submit(prompts[0], max_tokens, temperature)
+    failed = _finishes(scheduler.stream(overlong), timeout)
+    alongside = _finishes(scheduler.stream(normal), timeout)
+    return {
+        "cancelled_in_queue": cancelled,
+        "overlong_prompt": failed,
+        "normal_alongside_overlong": alongside,
+        "passed": cancelled["ended"] and failed["ended"] and failed["error"] is not None
+                  and alongside["ended"] and alongside["error"] is None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", help="model id or path (default: tiny random GPT-2)")
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--max-tokens", type=int, default=64)
+    parser.add_argument("--prompt-words", type=int, default=120)
+    parser.add_argument("--max-batch-size", type=int, default=8)
+    parser.add_argument("--threads", type=int, default=0, help="torch intra-op threads (0 = default)")
+    parser.add_argument("--check-timeout", type=float, default=60.0, help="seconds before a failure-path stream counts as hung")
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    os.environ.setdefault("CUDA_VISIBLE_DEVICES", "")
+    import torch
+    from backend.core.config import ChatBotEnvConfig
+    from backend.models.local_model import LocalModel
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    model_path = args.model or build_tiny_causal_lm(tempfile.mkdtemp(prefix="tiny_lm_"))
+    prompts = [synthetic_text(args.prompt_words + 7 * i, seed=i) + " Q: what is the term? A:" for i in range(args.clients)]
+
+    result = {"revision": git_revision(), "params": vars(args) | {"model": model_path}}
+    outputs = {}
+    for batching in (False, True):
+        config = ChatBotEnvConfig(
+            model_id=model_path, embedding_model_id="unused", max_tokens=args.max_tokens,
+            temperature=0.7, local_batching=batching, local_max_batch_size=args.max_batch_size,
+        )
+        model = LocalModel(config)
+        model.generate_stream(prompts[0]).__next__()  # warm-up
+        texts, ttfts, elapsed = _run_clients(model, prompts)
+        n_tokens = sum(len(model.tokenizer(t, add_special_tokens=False)["input_ids"]) for t in texts)
+        outputs[batching] = texts
+        result["batched" if batching else "per_request"] = {
+            "wall_s": round(elapsed, 3),
+            "tokens": n_tokens,
+            "aggregate_tokens_per_s": round(n_tokens / elapsed, 2),
+            "mean_ttft_ms": round(sum(ttfts) / len(ttfts) * 1000, 2),
+        }
+        if model.scheduler is not None:
+            result["batched"]["decode_steps"] = model.scheduler.steps
+            result["failure_paths"] = _check_failure_paths(model, prompts, args.max_batch_size, args.check_timeout)
+        del model
+
+    base = result["per_request"]["aggregate_tokens_per_s"]
+    result["speedup"] = round(result["batched"]["aggregate_tokens_per_s"] / base, 2) if base else None
+    write_json(result, args.output)
+    sys.exit(0 if result["failure_paths"]["passed"] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+# benchmarks/local_quantization.py
+"""
+LocalModel on CPU in float32 versus dynamic int8 quantization (LOCAL_CPU_MODE).
+
+Each mode runs in its own process, so resident memory is not shared between
+them. Reports load time, resident memory held by the model (process growth
+over loading and generating), peak resident memory, single-stream decode
+tokens/second, and greedy-output agreement with float32: the fraction of
+generated tokens that match until the first divergence.
+
+By default a tiny random Llama-style model is built locally (no download);
+its outputs are near-ties, so agreement is pessimistic. Pass --model to use
+a real checkpoint.
+
+    python -m benchmarks.local_quantization --max-tokens 64 --threads 4
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks._common import build_tiny_causal_lm, synthetic_text, write_json, git_revision
+
+
+def _proc_status_kb(field: str) -> int:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    return 0
+
+
+def _prompts(n: int, words: int):
+    return [synthetic_text(words, seed=i) + " Q: what is the term? A:" for i in range(n)]
+
+
+def run_mode(args) -> dict:
+    """Child process: load one mode, generate greedily, report numbers and token ids."""
+    os.environ["CUDA_VISIBLE_DEVICES"] = ""
+    from backend.core.config import ChatBotEnvConfig
+    from backend.models.local_model import LocalModel
+
+    rss_before = _proc_status_kb("VmRSS")
+    config = ChatBotEnvConfig(
+        model_id=args.model, embedding_model_id="unused", max_tokens=args.max_tokens, temperature=0.0,
+        local_batching=True, local_max_batch_size=1, local_prefix_cache_mb=0,
+        local_cpu_mode=args.child, local_threads=args.threads, local_interop_threads=args.threads,
+    )
+    start = time.perf_counter()
+    model = LocalModel(config)
+    load_s = time.perf_counter() - start
+    model.warm_up()
+
+    outputs, n_tokens, elapsed = [], 0, 0.0
+    for prompt in _prompts(args.prompts, args.prompt_words):
+        start = time.perf_counter()
+        text = model.generate(prompt) or ""
+        elapsed += time.perf_counter() - start
+        ids = model.tokenizer(text, add_special_tokens=False)["input_ids"]
+        n_tokens += len(ids)
+        outputs.append(ids)
+    # After generation, so lazily mapped weight pages have all been touched
+    rss_loaded = _proc_status_kb("VmRSS")
+    return {
+        "load_s": round(load_s, 3),
+        "model_rss_mb": round((rss_loaded - rss_before) / 1024, 1),
+        "peak_rss_mb": round(_proc_status_kb("VmHWM") / 1024, 1),
+        "tokens": n_tokens,
+        "tokens_per_s": round(n_tokens / elapsed, 2) if elapsed else None,
+        "outputs": outputs,
+    }
+
+
+def _agreement(reference, other) -> float:
+    matched = total = 0
+    for a, b in zip(reference, other):
+        n = 0
+        while n < min(len(a), len(b)) and a[n] == b[n]:
+            n += 1
+        matched += n
+        total += max(len(a), 1)
+    return round(matched / total, 4) if total else 1.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", help="model id or path (default: tiny random Llama)")
+    parser.add_argument("--prompts", type=int, default=5)
+    parser.add_argument("--prompt-words", type=int, default=120)
+    parser.add_argument("--max-tokens", type=int, default=64)
+    parser.add_argument("--threads", type=int, default=0, help="LOCAL_THREADS / LOCAL_INTEROP_THREADS (0 = default)")
+    parser.add_argument("--child", choices=("float32", "int8"), help=argparse.SUPPRESS)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_mode(args)))
+        return
+
+    model_path = args.model or build_tiny_causal_lm(
+        tempfile.mkdtemp(prefix="tiny_lm_"), hidden=512, layers=8, heads=8, arch="llama"
+    )
+    result = {"revision": git_revision(), "params": vars(args) | {"model": model_path}}
+    outputs = {}
+    for mode in ("float32", "int8"):
+        cmd = [sys.executable, "-m", "benchmarks.local_quantization", "--child", mode, "--model", model_path,
+               "--prompts", str(args.prompts), "--prompt-words", str(args.prompt_words),
+               "--max-tokens", str(args.max_tokens), "--threads", str(args.threads)]
+        proc = subprocess.run(cmd, capture_output=True, text=True, check=True)
+        stats = json.loads(proc.stdout.strip().splitlines()[-1])
+        outputs[mode] = stats.pop("outputs")
+        result[mode] = stats
+    result["int8_vs_float32"] = {
+        "speedup": round(result["int8"]["tokens_per_s"] / result["float32"]["tokens_per_s"], 2),
+        "model_memory_ratio": round(result["int8"]["model_rss_mb"] / max(result["float32"]["model_rss_mb"], 1e-6), 3),
+        "output_agreement": _agreement(outputs["float32"], outputs["int8"]),
+    }
+    write_json(result, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# benchmarks/metrics_overhead.py
+"""
+Measure the hot-path cost of backend.core.metrics instrumentation.
+
+Times Histogram.observe, Histogram.time() and Counter.inc in a tight loop
+and, for context, an instrumented FaissIndexWrapper.search against the raw
+faiss call on the same index.
+
+    python -m benchmarks.metrics_overhead --iterations 200000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from backend.core.metrics import MetricsRegistry
+from backend.services.retrieval import FaissIndexWrapper
+from benchmarks._common import write_json
+
+
+def _per_op_ns(fn, iterations: int) -> float:
+    start = time.perf_counter_ns()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter_ns() - start) / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200_000)
+    parser.add_argument("--vectors", type=int, default=2_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    registry = MetricsRegistry()
+    hist = registry.histogram("bench_seconds", "bench", labelnames=("stage",))
+    counter = registry.counter("bench_total", "bench", labelnames=("router",))
+
+    def timed():
+        with hist.time(stage="search"):
+            pass
+
+    baseline = _per_op_ns(lambda: None, args.iterations)
+    result = {
+        "baseline_call_ns": round(baseline, 1),
+        "histogram_observe_ns": round(_per_op_ns(lambda: hist.observe(0.003, stage="search"), args.iterations) - baseline, 1),
+        "histogram_time_ctx_ns": round(_per_op_ns(timed, args.iterations) - baseline, 1),
+        "counter_inc_ns": round(_per_op_ns(lambda: counter.inc(router="search"), args.iterations) - baseline, 1),
+    }
+
+    rng = np.random.default_rng(0)
+    index = FaissIndexWrapper(rng.standard_normal((args.vectors, args.dim), dtype=np.float32))
+    q = rng.standard_normal((1, args.dim), dtype=np.float32)
+    n = max(1, args.iterations // 100)
+    raw = _per_op_ns(lambda: index.index.search(q, 3), n)
+    wrapped = _per_op_ns(lambda: index.search(q, 3), n)
+    result["faiss_search_raw_ns"] = round(raw, 1)
+    result["faiss_search_instrumented_ns"] = round(wrapped, 1)
+    result["faiss_search_overhead_pct"] = round((wrapped - raw) / raw * 100, 2)
+    write_json(result, args.output)
+
+
+if __name__ == "__main__":
+    main()
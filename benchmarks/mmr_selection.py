@@ -0,0 +1,131 @@
+# benchmarks/mmr_selection.py
+"""
+Redundancy in the retrieved top-k with and without maximal marginal
+relevance (MMR) re-ranking, and the cost of the re-ranking step.
+
+Chunks a synthetic document with overlap (as the backend does), embeds it
+with the configured model (EMBEDDING_MODEL) and, for each diversity value,
+reports per query:
+  duplicate_chars  characters of the top-k context that repeat text already
+                   in another selected chunk (overlap sent to the LLM twice)
+  context_chars    total characters of the top-k context
+  relevance        mean cosine similarity of the picks to the query
+  pairwise_cos     mean cosine similarity between the picks
+  rerank           time for mmr_rerank over the over-fetched candidates
+Also times mmr_select for growing candidate sets against a pairwise Python loop.
+
+    python -m benchmarks.mmr_selection --top-k 5 --fetch-factor 4 --diversity 0,0.3,0.5,0.7
+"""
+import argparse
+
+import numpy as np
+
+from benchmarks._common import git_revision, percentiles, synthetic_text, time_repeated, write_json
+
+
+def _mmr_pairwise(qvec, candidates, top_k, diversity):
+    """Reference MMR with a Python loop over (candidate, picked) pairs."""
+    C = candidates / np.linalg.norm(candidates, axis=1, keepdims=True)
+    q = qvec / np.linalg.norm(qvec)
+    picked = []
+    while len(picked) < min(top_k, len(C)):
+        best, best_score = -1, -np.inf
+        for i in range(len(C)):
+            if i in picked:
+                continue
+            redundancy = max([float(C[i] @ C[j]) for j in picked] + [0.0])
+            score = (1 - diversity) * float(C[i] @ q) - diversity * redundancy
+            if score > best_score:
+                best, best_score = i, score
+        picked.append(best)
+    return picked
+
+
+def _duplicate_chars(starts, ends, ids) -> int:
+    """Characters of the selected spans that are covered more than once."""
+    spans = sorted((starts[i], ends[i]) for i in ids)
+    total = sum(e - s for s, e in spans)
+    covered, reach = 0, -1
+    for s, e in spans:
+        if e > reach:
+            covered += e - max(s, reach)
+            reach = e
+    return total - covered
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--words", type=int, default=40000, help="document length")
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--overlap", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--fetch-factor", type=int, default=4)
+    parser.add_argument("--diversity", default="0,0.3,0.5,0.7")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--candidates", default="20,50,100,200", help="candidate set sizes for the selection timing")
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    from backend.core.app_state import config
+    from backend.core.embeddings import embed_text, embed_texts
+    from backend.services.chunk_and_vectorize import lc_split_spans
+    from backend.services.retrieval import FaissIndexWrapper, mmr_rerank, mmr_select
+
+    text = synthetic_text(args.words, seed=0)
+    chunks, starts = lc_split_spans(text, chunk_size=args.chunk_size, overlap=args.overlap)
+    ends = [s + len(c) for s, c in zip(starts, chunks)]
+    vectors = embed_texts(chunks, config.embedding_model_id)
+    unit = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    index = FaissIndexWrapper(vectors)
+    queries = [embed_text(synthetic_text(12, seed=1000 + i), config.embedding_model_id) for i in range(args.queries)]
+
+    result = {
+        "revision": git_revision(),
+        "params": vars(args) | {"embedding_model": config.embedding_model_id, "chunks": len(chunks)},
+        "diversity": [],
+        "selection": [],
+    }
+    fetch_k = args.top_k * args.fetch_factor
+    for diversity in (float(x) for x in args.diversity.split(",") if x):
+        rows = {"duplicate_chars": [], "context_chars": [], "relevance": [], "pairwise_cos": []}
+        rerank_s = []
+        for q in queries:
+            D, I = index.search(q, fetch_k if diversity > 0 else args.top_k)
+            if diversity > 0:
+                rerank_s += time_repeated(lambda: mmr_rerank(vectors, q, D, I, args.top_k, diversity), 3)
+                D, I = mmr_rerank(vectors, q, D, I, args.top_k, diversity)
+            ids = [int(i) for i in I[0] if i >= 0]
+            picks = unit[ids]
+            sims = picks @ picks.T
+            rows["duplicate_chars"].append(_duplicate_chars(starts, ends, ids))
+            rows["context_chars"].append(sum(ends[i] - starts[i] for i in ids))
+            rows["relevance"].append(float(np.mean(picks @ (q / np.linalg.norm(q)))))
+            rows["pairwise_cos"].append(float(sims[np.triu_indices(len(ids), 1)].mean()))
+        entry = {"diversity": diversity, **{k: round(float(np.mean(v)), 4) for k, v in rows.items()}}
+        if rerank_s:
+            entry["rerank"] = percentiles(rerank_s)
+        result["diversity"].append(entry)
+
+    base = result["diversity"][0]
+    for entry in result["diversity"]:
+        entry["unique_context_chars"] = round(entry["context_chars"] - entry["duplicate_chars"], 1)
+        entry["relevance_vs_first"] = round(entry["relevance"] / base["relevance"], 4) if base["relevance"] else None
+
+    rng = np.random.default_rng(0)
+    q = queries[0]
+    for n in (int(x) for x in args.candidates.split(",") if x):
+        candidates = vectors[rng.choice(len(vectors), size=min(n, len(vectors)), replace=False)]
+        vectorised = percentiles(time_repeated(lambda: mmr_select(q, candidates, args.top_k, 0.5), 20))
+        pairwise = percentiles(time_repeated(lambda: _mmr_pairwise(q, candidates, args.top_k, 0.5), 5))
+        result["selection"].append({
+            "candidates": len(candidates),
+            "vectorised": vectorised,
+            "pairwise_loop": pairwise,
+            "speedup_p50": round(pairwise["p50_ms"] / vectorised["p50_ms"], 1),
+        })
+
+    write_json(result, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+# benchmarks/pipeline_stages.py
+"""
+Stage-level micro-benchmarks for the ingest and query pipeline.
+
+Each stage is timed separately on a synthetic PDF:
+  extract  - pypdf PdfReader text extraction
+  chunk    - lc_split (RecursiveCharacterTextSplitter)
+  embed    - embed_texts over all chunks (batch) and per query (single)
+  build    - FaissIndexWrapper construction
+  search   - FaissIndexWrapper.search for one query vector
+  prompt   - build_optimized_prompt
+
+Runs offline on CPU (HF_HUB_OFFLINE=1, CUDA hidden) with a small embedding
+model that must already be in the local HF cache. Results are JSON so two
+runs can be compared:
+
+    python -m benchmarks.pipeline_stages --pages 50 --output before.json
+    python -m benchmarks.pipeline_stages --pages 50 --output after.json
+    python -m benchmarks.pipeline_stages --compare before.json after.json
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import sys
+
+
+def _configure_offline_cpu(online: bool):
+    os.environ.setdefault("CUDA_VISIBLE_DEVICES", "")
+    if not online:
+        os.environ.setdefault("HF_HUB_OFFLINE", "1")
+        os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+
+
+def run(args) -> dict:
+    _configure_offline_cpu(args.online)
+
+    # Imported after the environment is set so offline/CPU flags take effect
+    import numpy as np
+    from pypdf import PdfReader
+    from backend.core.embeddings import embed_texts
+    from backend.services.chunk_and_vectorize import lc_split
+    from backend.services.retrieval import FaissIndexWrapper
+    from backend.api.llm_router import build_optimized_prompt
+    from benchmarks._common import percentiles, synthetic_pdf, synthetic_text, time_repeated, git_revision
+
+    pdf_bytes = synthetic_pdf(args.pages, words_per_page=args.words_per_page, seed=args.seed)
+    queries = [synthetic_text(12, seed=args.seed + 1000 + i) for i in range(args.queries)]
+    stages = {}
+
+    # extract
+    def extract():
+        reader = PdfReader(io.BytesIO(pdf_bytes))
+        return "".join((page.extract_text() or "") + "\n" for page in reader.pages)
+
+    text = extract()
+    samples = time_repeated(extract, args.repeat)
+    stages["extract"] = {**percentiles(samples), "pages_per_s": round(args.pages / np.median(samples), 2)}
+
+    # chunk
+    chunks = lc_split(text, chunk_size=args.chunk_size, overlap=args.overlap)
+    samples = time_repeated(lambda: lc_split(text, chunk_size=args.chunk_size, overlap=args.overlap), args.repeat)
+    stages["chunk"] = {**percentiles(samples), "chars_per_s": round(len(text) / np.median(samples), 2)}
+
+    # embed (batch over chunks, then one query at a time)
+    vectors = embed_texts(chunks, model_name=args.embedding_model)
+    samples = time_repeated(lambda: embed_texts(chunks, model_name=args.embedding_model), args.embed_repeat)
+    stages["embed_chunks"] = {**percentiles(samples), "chunks_per_s": round(len(chunks) / np.median(samples), 2)}
+    query_vectors = [embed_texts([q], model_name=args.embedding_model)[0] for q in queries]
+    samples = []
+    for q in queries:
+        samples.extend(time_repeated(lambda: embed_texts([q], model_name=args.embedding_model), 1, warmup=0))
+    stages["embed_query"] = {**percentiles(samples), "queries_per_s": round(1 / np.median(samples), 2)}
+
+    # index build + search
+    samples = time_repeated(lambda: FaissIndexWrapper(vectors), args.repeat)
+    stages["build"] = {**percentiles(samples), "vectors_per_s": round(len(chunks) / np.median(samples), 2)}
+    index = FaissIndexWrapper(vectors)
+    samples = []
+    for qv in query_vectors:
+        samples.extend(time_repeated(lambda: index.search(qv, args.top_k), 5, warmup=0))
+    stages["search"] = {**percentiles(samples), "queries_per_s": round(1 / np.median(samples), 2)}
+
+    # prompt
+    samples = []
+    for qv, q in zip(query_vectors, queries):
+        _, idx = index.search(qv, args.top_k)
+        context = "\n\n---\n\n".join(chunks[i] for i in idx[0] if 0 <= i < len(chunks))
+        samples.extend(time_repeated(lambda: build_optimized_prompt(context, q), 5, warmup=0))
+    stages["prompt"] = percentiles(samples)
+
+    return {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "params": {
+            "pages": args.pages,
+            "words_per_page": args.words_per_page,
+            "chunk_size": args.chunk_size,
+            "overlap": args.overlap,
+            "embedding_model": args.embedding_model,
+            "top_k": args.top_k,
+            "queries": args.queries,
+        },
+        "corpus": {"chars": len(text), "chunks": len(chunks), "dim": int(vectors.shape[1])},
+        "stages": stages,
+    }
+
+
+def compare(old_path: str, new_path: str):
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    print(f"{'stage':<14}{'metric':<10}{'old':>12}{'new':>12}{'change':>10}")
+    for stage, new_stats in new["stages"].items():
+        old_stats = old["stages"].get(stage)
+        if not old_stats:
+            continue
+        for metric in ("p50_ms", "p95_ms", "p99_ms"):
+            a, b = old_stats[metric], new_stats[metric]
+            change = (b - a) / a * 100 if a else 0.0
+            print(f"{stage:<14}{metric:<10}{a:>12.3f}{b:>12.3f}{change:>9.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--words-per-page", type=int, default=400)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--overlap", type=int, default=100)
+    parser.add_argument("--embedding-model", default=os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2"))
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--embed-repeat", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--online", action="store_true", help="allow downloading the embedding model")
+    parser.add_argument("--output", help="write JSON results to this path")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="diff two result files")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    from benchmarks._common import write_json
+    write_json(run(args), args.output)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
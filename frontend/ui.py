@@ -13,7 +13,10 @@ if __name__ == "__main__":
             pdf_input = gr.File(label="Upload your PDF", file_types=[".pdf"])
             upload_output = gr.Textbox(label="Upload status", interactive=False)
             upload_btn = gr.Button("Upload")
+            status_btn = gr.Button("Check status")
             upload_btn.click(pdf_processor.upload_pdf, inputs=pdf_input, outputs=upload_output)
+            # Indexing runs as a background job on the backend
+            status_btn.click(pdf_processor.ingest_status, outputs=upload_output)
         
         # Ask question tab
         with gr.Tab("Ask Question"):